@@ -0,0 +1,241 @@
+import argparse
+import http.client
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from threading import Thread
+
+from connection_manager import SERIAL_LINES
+from gcs_emulator import GcsEmulator, read_log
+from load_test import percentile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Metrics compared between reports, and whether a higher value is better
+COMPARED_METRICS = {
+    'ingest_lines_per_sec': True,
+    'log_lines_per_sec': True,
+    'log_mb_per_sec': True,
+    'terminal_p50_ms': False,
+    'terminal_p99_ms': False,
+    'cpu_us_per_line': False,
+}
+
+
+def parse_speed(value):
+    """'1', '10' or 'max' (as fast as possible, 0)"""
+    return 0.0 if value == 'max' else float(value)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def follow_terminal(port, start_seq, target, received, deadline):
+    """Long-poll /esp-terminal like the UI and stamp the arrival of every line.
+
+    Runs until the cursor reaches ``target[0]``, which is set once the
+    backend has ingested the whole replay.
+    """
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    cursor = start_seq
+    missed = 0
+    try:
+        while (target[0] is None or cursor < target[0]) and time.monotonic() < deadline:
+            connection.request('GET', f'/esp-terminal?after={cursor}&wait=1&limit=5000')
+            data = json.loads(connection.getresponse().read())
+            now = time.monotonic()
+            received.extend((now, line) for line in data['lines'])
+            missed += data['missed']
+            cursor = data['cursor']
+    finally:
+        connection.close()
+    target.append(missed)
+
+
+def match_latencies(lines, sent_at, received):
+    """Latency of every received line, matched in order to the line it was sent as.
+
+    Heartbeat compaction means the terminal sees an ordered subset of the
+    replay; lines it never saw sent (liveness changes) are skipped.
+    """
+    latencies = []
+    position = 0
+    for received_at, line in received:
+        try:
+            index = lines.index(line, position)
+        except ValueError:
+            continue
+        latencies.append(received_at - sent_at[index])
+        position = index + 1
+    return sorted(latencies)
+
+
+def benchmark_logbook(logbook_class, lines, batch=64):
+    """Lines and bytes per second through ``LogbookManager`` into a scratch log"""
+    logbook = logbook_class()
+    stamp = datetime.now()
+    started = time.perf_counter()
+    for i in range(0, len(lines), batch):
+        logbook.log_data(lines[i:i + batch], stamp)
+    logbook.close(timeout=60)
+    elapsed = time.perf_counter() - started
+    written = logbook.log_bytes
+    return len(lines) / elapsed, written / elapsed / 1e6
+
+
+def replay_log(handler, emulator, server_port, path, speed, timeout):
+    """Replay one log through the emulator and measure the backend"""
+    records = list(read_log(path))
+    lines = [line for _, line in records]
+    stream = handler.telemetry_stream
+    lines_read = SERIAL_LINES.labels(emulator.device)
+    start_seq = stream.last_seq
+    start_read = lines_read.value
+    target = [None]
+    received = []
+    duration = records[-1][0] / speed if records and speed else 0
+    deadline = time.monotonic() + duration + timeout
+    follower = Thread(target=follow_terminal,
+                      args=(server_port, start_seq, target, received, deadline), daemon=True)
+    follower.start()
+
+    cpu_started = time.process_time()
+    started = time.monotonic()
+    sent_at = emulator.replay(records, speed)
+    while lines_read.value - start_read < len(records) and time.monotonic() < deadline:
+        time.sleep(0.001)
+    ingested = time.monotonic()
+    cpu = time.process_time() - cpu_started
+    target[0] = stream.last_seq
+    follower.join(timeout=max(0.0, deadline - time.monotonic()) + 1)
+    missed = target[1] if len(target) > 1 else None
+
+    latencies = match_latencies(lines, sent_at, received)
+    lines_in = int(lines_read.value - start_read)
+    log_lines_per_sec, log_mb_per_sec = benchmark_logbook(type(handler.logbook_manager), lines)
+    return {
+        'log': os.path.basename(path),
+        'lines': len(records),
+        'lines_ingested': lines_in,
+        'terminal_lines': len(received),
+        'terminal_missed': missed,
+        'replay_seconds': round(ingested - started, 3),
+        'ingest_lines_per_sec': round(lines_in / max(ingested - started, 1e-9), 1),
+        'log_lines_per_sec': round(log_lines_per_sec, 1),
+        'log_mb_per_sec': round(log_mb_per_sec, 2),
+        'terminal_p50_ms': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        'terminal_p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        'terminal_max_ms': round(latencies[-1] * 1000, 2) if latencies else None,
+        # Whole process: backend, emulator and terminal client together
+        'cpu_us_per_line': round(cpu / max(1, lines_in) * 1e6, 2),
+    }
+
+
+def compare(report, baseline):
+    """Per-log change of every compared metric against an earlier report, in percent"""
+    previous = {run['log']: run for run in baseline.get('runs', [])}
+    changes = {}
+    for run in report['runs']:
+        old = previous.get(run['log'])
+        if not old:
+            continue
+        changes[run['log']] = {}
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if run.get(metric) is None or not old.get(metric):
+                continue
+            change = (run[metric] - old[metric]) / old[metric] * 100
+            changes[run['log']][metric] = {
+                'before': old[metric],
+                'after': run[metric],
+                'change_pct': round(change, 1),
+                'better': change > 0 if higher_is_better else change < 0,
+            }
+    return changes
+
+
+def run(logs, speed, timeout=30.0, compact_heartbeats=True):
+    # Keep the backend's own logs out of logs/ while benchmarking
+    scratch = tempfile.mkdtemp(prefix='esp-bench-')
+    os.environ['ESP_LOGS_DIR'] = scratch
+    from http.server import ThreadingHTTPServer
+    import run_app
+
+    class Handler(run_app.DroneSerialHandler):
+        def log_message(self, format, *args):
+            pass
+
+    run_app.DroneSerialHandler.compact_heartbeats = compact_heartbeats
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    server_port = server.server_address[1]
+    emulator = GcsEmulator()
+    emulator.start()
+    try:
+        connection = http.client.HTTPConnection('127.0.0.1', server_port, timeout=10)
+        connection.request('POST', '/verify_port', json.dumps({'port': emulator.device}),
+                           {'Content-Type': 'application/json'})
+        verified = json.loads(connection.getresponse().read())
+        connection.close()
+        if not verified.get('verified'):
+            raise RuntimeError(f"Backend did not connect to the emulator: {verified}")
+        runs = [replay_log(run_app.DroneSerialHandler, emulator, server_port, path, speed, timeout)
+                for path in logs]
+    finally:
+        server.shutdown()
+        run_app.DroneSerialHandler.connections.close_all()
+        run_app.DroneSerialHandler.logbook_manager.close()
+        emulator.close()
+        shutil.rmtree(scratch, ignore_errors=True)
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'speed': speed or 'max',
+        'compact_heartbeats': run_app.DroneSerialHandler.compact_heartbeats,
+        'runs': runs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay ESP logs into the backend through a pty GCS emulator")
+    parser.add_argument('--log', action='append', help="Log file to replay (repeatable); default the largest in logs/")
+    parser.add_argument('--speed', default='max', type=parse_speed, help="1, 10, ... or max")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Seconds to wait for a replay to drain")
+    parser.add_argument('--raw-heartbeats', action='store_true', help="Stream and log every heartbeat")
+    parser.add_argument('--output', help="Write the JSON report here")
+    parser.add_argument('--compare', help="Earlier report to compare against")
+    args = parser.parse_args()
+
+    logs = args.log
+    if not logs:
+        logs_dir = os.path.join(BASE_DIR, 'logs')
+        candidates = [os.path.join(logs_dir, name) for name in os.listdir(logs_dir) if name.endswith('.txt')]
+        if not candidates:
+            sys.exit("No logs to replay")
+        logs = [max(candidates, key=os.path.getsize)]
+
+    report = run(logs, args.speed, args.timeout, not args.raw_heartbeats)
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            report['comparison'] = compare(report, json.load(f))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
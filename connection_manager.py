@@ -0,0 +1,264 @@
+import itertools
+import time
+from collections import deque
+from threading import Lock
+
+from metrics import REGISTRY
+from serial_io import SerialReader, CommandWriter, DEFAULT_RATE, DEFAULT_DRONE_RATE
+from telemetry import parse_frame
+
+# Targets addressed to the dongle itself rather than to a drone behind it
+LINK_TARGETS = {'GCS'}
+
+ROUND_ROBIN = 'round_robin'
+LEAST_LOADED = 'least_loaded'
+
+# The dongle reports each ESP-NOW send with one of these lines, in order
+DELIVERY_STATUS = 'Last Packet Send Status: '
+DELIVERY_SUCCESS = 'Delivery Success'
+# ...except for an unknown drone, where it answers "Target<ID>Invalid target specified" instead
+INVALID_TARGET = 'Invalid target specified'
+# A send with no status after this long is written off (e.g. an unknown target)
+DELIVERY_TIMEOUT = 2.0
+
+SERIAL_LINES = REGISTRY.counter('gcs_serial_lines_total', "Lines read from a GCS link", ['port'])
+SERIAL_BYTES = REGISTRY.counter('gcs_serial_bytes_total', "Bytes of lines read from a GCS link", ['port'])
+COMMANDS_WRITTEN = REGISTRY.counter('gcs_commands_written_total', "Commands written to a GCS link", ['port'])
+DELIVERY_SECONDS = REGISTRY.histogram('gcs_command_delivery_seconds',
+                                      "Time from writing a command to its delivery status", ['drone'])
+DELIVERIES = REGISTRY.counter('gcs_command_deliveries_total', "Command delivery outcomes", ['drone', 'result'])
+
+
+class GcsLink:
+    """One GCS dongle: its port plus a reader and a writer thread"""
+
+    def __init__(self, port, on_lines, writer_options):
+        self.name = port.port
+        self.port = port
+        self.reader = SerialReader(lambda lines, timestamp: on_lines(self, lines, timestamp),
+                                   name=f"serial-reader-{self.name}")
+        self.writer = CommandWriter(name=f"serial-writer-{self.name}", on_write=self._sent, **writer_options)
+        self.frames_in = 0
+        self.in_flight = deque()  # (drone_id, written_at) awaiting a delivery status
+        self.delivery_lock = Lock()
+        self.lines_metric = SERIAL_LINES.labels(self.name)
+        self.bytes_metric = SERIAL_BYTES.labels(self.name)
+        self.written_metric = COMMANDS_WRITTEN.labels(self.name)
+
+    def _sent(self, lines, written_at):
+        self.written_metric.inc(len(lines))
+        with self.delivery_lock:
+            for line in lines:
+                frame = parse_frame(line)
+                if frame and frame.drone not in LINK_TARGETS:
+                    self.in_flight.append((frame.drone, written_at))
+
+    def delivery_status(self, lines, now):
+        """Match the dongle's delivery status lines to the oldest commands written"""
+        with self.delivery_lock:
+            in_flight = self.in_flight
+            while in_flight and now - in_flight[0][1] > DELIVERY_TIMEOUT:
+                DELIVERIES.labels(in_flight.popleft()[0], 'timeout').inc()
+            for line in lines:
+                if line.startswith('Target') and line.endswith(INVALID_TARGET):
+                    # Nothing was sent, so no status follows for that drone's latest command
+                    target = line[len('Target'):-len(INVALID_TARGET)]
+                    for index in range(len(in_flight) - 1, -1, -1):
+                        if in_flight[index][0] == target:
+                            del in_flight[index]
+                            DELIVERIES.labels(target, 'invalid').inc()
+                            break
+                    continue
+                if not line.startswith(DELIVERY_STATUS) or not in_flight:
+                    continue
+                drone_id, written_at = in_flight.popleft()
+                if line.endswith(DELIVERY_SUCCESS):
+                    DELIVERY_SECONDS.labels(drone_id).observe(now - written_at)
+                    DELIVERIES.labels(drone_id, 'success').inc()
+                else:
+                    DELIVERIES.labels(drone_id, 'fail').inc()
+
+    def start(self):
+        self.reader.start()
+        self.writer.start()
+        self.reader.attach(self.port)
+        self.writer.attach(self.port)
+
+    def close(self):
+        self.reader.detach()
+        self.writer.detach()
+        self.reader.stop()
+        self.writer.stop()
+        if self.port.is_open:
+            self.port.close()
+
+
+class ConnectionManager:
+    """Spread the swarm over several GCS dongles.
+
+    Every connected dongle is a ``GcsLink`` with its own reader and writer
+    threads. Drone IDs are routed to the link they were last heard on;
+    drones not heard yet are assigned round-robin or to the least loaded
+    link. Commands for the dongle itself (``T:GCS``) go to every link.
+    Lines read on any link are handed to ``on_lines(lines, timestamp, link)``
+    one batch at a time, so they form a single ordered feed with
+    non-decreasing timestamps.
+    """
+
+    def __init__(self, on_lines, strategy=LEAST_LOADED, **writer_options):
+        self.on_lines = on_lines
+        self.strategy = strategy
+        self.writer_options = writer_options
+        self.links = {}  # port name -> GcsLink, in connection order
+        self.routes = {}  # drone_id -> port name
+        self.learned = set()  # drone IDs whose route came from inbound traffic
+        self.lock = Lock()
+        self.feed_lock = Lock()
+        self.last_timestamp = None
+        self._next_link = itertools.count()
+
+    def add(self, port):
+        """Start serving an open, verified port"""
+        link = GcsLink(port, self._handle_lines, self.writer_options)
+        with self.lock:
+            old = self.links.pop(link.name, None)
+            self.links[link.name] = link
+        if old:
+            old.close()
+        link.start()
+        return link
+
+    def remove(self, name):
+        """Stop serving and close the port ``name``; returns whether it was connected"""
+        with self.lock:
+            link = self.links.pop(name, None)
+            for drone_id in [d for d, port in self.routes.items() if port == name]:
+                del self.routes[drone_id]
+                self.learned.discard(drone_id)
+        if link:
+            link.close()
+        return link is not None
+
+    def close_all(self):
+        for name in list(self.links):
+            self.remove(name)
+
+    def port_names(self):
+        with self.lock:
+            return list(self.links)
+
+    def configure(self, strategy=None, routes=None, **writer_options):
+        """Change assignment, pin routes (``{drone: port}``) or writer rate limits"""
+        with self.lock:
+            if strategy is not None:
+                if strategy not in (ROUND_ROBIN, LEAST_LOADED):
+                    raise ValueError(f"Unknown strategy: {strategy}")
+                self.strategy = strategy
+            for drone_id, name in (routes or {}).items():
+                if name not in self.links:
+                    raise ValueError(f"Port not connected: {name}")
+                self.routes[drone_id] = name
+                self.learned.add(drone_id)
+            options = {key: value for key, value in writer_options.items() if value is not None}
+            self.writer_options.update(options)
+            links = list(self.links.values())
+        for link in links:
+            link.writer.configure(**options)
+
+    def command_budget(self, drone_ids):
+        """``(link_share, per_drone)`` commands per second each of ``drone_ids`` can be sent (0 = unlimited).
+
+        ``link_share`` is a link's global rate split over the drones routed
+        to it, taken on the busiest link; drones without a route yet are
+        counted on the links with the fewest drones, as they would be
+        assigned.
+        """
+        with self.lock:
+            rate = self.writer_options.get('rate', DEFAULT_RATE)
+            drone_rate = self.writer_options.get('drone_rate', DEFAULT_DRONE_RATE)
+            if not rate or rate <= 0 or not drone_ids:
+                return 0, drone_rate
+            drones = {name: 0 for name in self.links} or {None: 0}
+            unrouted = 0
+            for drone_id in drone_ids:
+                name = self.routes.get(drone_id)
+                if name in drones:
+                    drones[name] += 1
+                else:
+                    unrouted += 1
+            for _ in range(unrouted):
+                drones[min(drones, key=drones.get)] += 1
+            return min(rate / count for count in drones.values() if count), drone_rate
+
+    def _load(self, link):
+        drones = sum(1 for name in self.routes.values() if name == link.name)
+        return drones + sum(len(queue) for queue in link.writer.queues)
+
+    def _route(self, drone_id):
+        """Link for ``drone_id``, assigning one if needed (lock held)"""
+        link = self.links.get(self.routes.get(drone_id))
+        if link:
+            return link
+        links = list(self.links.values())
+        if self.strategy == ROUND_ROBIN:
+            link = links[next(self._next_link) % len(links)]
+        else:
+            link = min(links, key=self._load)
+        self.routes[drone_id] = link.name
+        return link
+
+    def submit(self, commands, priority=None):
+        """Queue commands on the links their targets are routed to; the commands queued as new entries"""
+        batches = {}
+        with self.lock:
+            if not self.links:
+                raise Exception("Serial port not connected")
+            for command in commands:
+                frame = parse_frame(command)
+                if frame is None or frame.drone in LINK_TARGETS:
+                    targets = self.links.values()
+                else:
+                    targets = [self._route(frame.drone)]
+                for link in targets:
+                    batches.setdefault(link.name, (link, []))[1].append(command)
+        queued = set()
+        for link, batch in batches.values():
+            queued.update(link.writer.submit(batch, priority))
+        return [command for command in commands if command in queued]
+
+    def learn_routes(self, link, frames):
+        """Route each drone to the link its frames arrive on"""
+        with self.lock:
+            if link.name not in self.links:
+                return
+            for frame in frames:
+                if frame.direction == 'S' and frame.drone not in LINK_TARGETS:
+                    self.routes[frame.drone] = link.name
+                    self.learned.add(frame.drone)
+            link.frames_in += len(frames)
+
+    def _handle_lines(self, link, lines, timestamp):
+        link.lines_metric.inc(len(lines))
+        link.bytes_metric.inc(sum(map(len, lines)) + len(lines))
+        link.delivery_status(lines, time.monotonic())
+        self.in_order(lambda stamp: self.on_lines(lines, stamp, link), timestamp)
+
+    def in_order(self, callback, timestamp):
+        """Call ``callback(timestamp)`` as part of the feed, stamped no earlier than the lines before it"""
+        with self.feed_lock:
+            # Batches from different readers may be stamped out of order
+            if self.last_timestamp and timestamp < self.last_timestamp:
+                timestamp = self.last_timestamp
+            self.last_timestamp = timestamp
+            callback(timestamp)
+
+    def status(self):
+        """Links, routing table and per-link writer state"""
+        with self.lock:
+            return {
+                'strategy': self.strategy,
+                'routes': {drone_id: {'port': name, 'learned': drone_id in self.learned}
+                           for drone_id, name in sorted(self.routes.items())},
+                'links': [{'port': name, 'frames_in': link.frames_in, 'writer': link.writer.status()}
+                          for name, link in self.links.items()],
+            }
@@ -0,0 +1,136 @@
+import gzip
+import os
+import select
+import time
+import tty
+from threading import Thread, Lock, Event
+
+from log_index import TIMESTAMP_LEN, stamp_seconds
+from port_inventory import VERIFY_COMMAND
+
+
+def read_log(path):
+    """``(seconds, line)`` for every timestamped line of an ESP log, from its first line"""
+    opener = gzip.open if path.endswith('.gz') else open
+    dates = {}
+    start = None
+    with opener(path, 'rt', errors='replace') as f:
+        for raw in f:
+            # "[2025-01-23 17:33:18.884] {T:CD2;C:REQ;P:LOC}"
+            if not raw.startswith('[') or raw[TIMESTAMP_LEN + 1:TIMESTAMP_LEN + 3] != '] ':
+                continue
+            try:
+                stamp = stamp_seconds(raw[1:1 + TIMESTAMP_LEN], dates)
+            except ValueError:
+                continue
+            line = raw[TIMESTAMP_LEN + 3:].rstrip('\r\n')
+            if not line:
+                continue
+            if start is None:
+                start = stamp
+            yield stamp - start, line
+
+
+class GcsEmulator:
+    """ESP32 GCS dongle on a pseudo-terminal.
+
+    ``device`` is the slave end of a pty and can be opened with pyserial
+    like a real COM port. Lines written with ``write_lines`` or ``replay``
+    arrive there as if sent by the dongle; lines the backend writes are
+    handed to ``handle_command``, which answers the verify handshake with
+    OK. Subclasses override ``handle_command`` to emulate more. Linux and
+    macOS only.
+    """
+
+    def __init__(self):
+        self.master, self.slave = os.openpty()
+        # No echo or newline translation, like a USB serial bridge
+        tty.setraw(self.slave)
+        self.device = os.ttyname(self.slave)
+        self.write_lock = Lock()
+        self.commands_received = 0
+        self.thread = None
+        self._stop = Event()
+
+    def start(self):
+        """Start answering commands from the backend"""
+        if self.thread and self.thread.is_alive():
+            return
+        self._stop.clear()
+        self.thread = Thread(target=self._read_loop, name="gcs-emulator", daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self._stop.set()
+        if self.thread:
+            self.thread.join(timeout=1.0)
+        # The slave stays open until here so the pty survives the backend
+        # closing and reopening the port
+        os.close(self.master)
+        os.close(self.slave)
+
+    def _read_loop(self):
+        pending = b''
+        while not self._stop.is_set():
+            ready, _, _ = select.select([self.master], [], [], 0.1)
+            if not ready:
+                continue
+            try:
+                data = os.read(self.master, 4096)
+            except OSError:
+                continue
+            pending += data
+            *lines, pending = pending.split(b'\n')
+            for line in lines:
+                line = line.decode(errors='replace').strip()
+                if line:
+                    self.commands_received += 1
+                    self.handle_command(line)
+
+    def handle_command(self, line):
+        """React to one line written by the backend"""
+        if line == VERIFY_COMMAND:
+            self.write_lines(["OK"])
+
+    def write_lines(self, lines):
+        """Send lines to the backend in one write"""
+        data = ''.join(f"{line}\r\n" for line in lines).encode()
+        with self.write_lock:
+            view = memoryview(data)
+            while view:
+                written = os.write(self.master, view)
+                view = view[written:]
+
+    def replay(self, records, speed=1.0):
+        """Send ``(seconds, line)`` records on their original schedule.
+
+        ``speed`` scales time (10 plays ten times faster); 0 sends as fast as
+        the backend reads. Lines due at the same moment go out in one write.
+        Returns the monotonic send time of every line.
+        """
+        sent_at = []
+        origin = time.monotonic()
+        batch = []
+        batch_due = None
+        for seconds, line in records:
+            due = origin + seconds / speed if speed else origin
+            if batch and due > batch_due:
+                self._send_batch(batch, batch_due, sent_at)
+                batch = []
+            if not batch:
+                batch_due = due
+            batch.append(line)
+            if not speed and len(batch) >= 64:
+                self._send_batch(batch, batch_due, sent_at)
+                batch = []
+        if batch:
+            self._send_batch(batch, batch_due, sent_at)
+        return sent_at
+
+    def _send_batch(self, batch, due, sent_at):
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        now = time.monotonic()
+        self.write_lines(batch)
+        sent_at.extend([now] * len(batch))
@@ -0,0 +1,166 @@
+import re
+import time
+from datetime import datetime
+from threading import Thread, Lock, Event
+
+# A line that is nothing but a drone heartbeat, e.g. "{S:CD1;C:HB;P:1}"
+HEARTBEAT_PATTERN = re.compile(r'\{\s*S\s*:\s*([^;{}]*?)\s*;\s*C\s*:\s*HB\s*(?:;\s*P\s*:[^{}]*)?\}')
+# Log record standing in for a run of heartbeats
+SUMMARY_PATTERN = re.compile(r'x(\d+) over ([\d.]+)s, max gap ([\d.]+)s$')
+
+
+def heartbeat_sender(line):
+    """Drone ID if ``line`` is a bare heartbeat, else None"""
+    if 'HB' not in line:
+        return None
+    match = HEARTBEAT_PATTERN.fullmatch(line)
+    return match.group(1) if match else None
+
+
+def heartbeat_line(drone_id):
+    return f"{{S:{drone_id};C:HB;P:1}}"
+
+
+def link_down_line(drone_id):
+    return f"{{S:{drone_id};C:LINK;P:DOWN}}"
+
+
+class LivenessTable:
+    """Per-drone link health built from heartbeats.
+
+    Tracks when each drone was first and last heard, its heartbeat rate,
+    and the gaps between heartbeats longer than ``gap_threshold``. A drone
+    silent for ``timeout`` seconds is marked down. ``heartbeat`` reports
+    whether a drone has just come up; going down is detected by a
+    background thread and reported through ``on_change(lines, timestamp)``
+    as a ``{S:ID;C:LINK;P:DOWN}`` line. Every ``summary_interval`` seconds
+    the heartbeats of each drone since the last summary are handed to
+    ``on_summary(line, timestamp)`` as one record stamped with the time of
+    its last heartbeat, e.g.
+    ``{S:CD1;C:HB;P:1} x10 over 9.98s, max gap 1.02s``.
+    """
+
+    def __init__(self, on_change=None, on_summary=None, timeout=3.0, gap_threshold=1.5,
+                 summary_interval=10.0, check_interval=0.5):
+        self.on_change = on_change
+        self.on_summary = on_summary
+        self.timeout = timeout
+        self.gap_threshold = gap_threshold
+        self.summary_interval = summary_interval
+        self.check_interval = check_interval
+        self.drones = {}
+        self.lock = Lock()
+        self.thread = None
+        self._stop = Event()
+        self.last_summary = time.time()
+
+    def start(self):
+        """Start watching for drones going silent"""
+        if self.thread and self.thread.is_alive():
+            return
+        self._stop.clear()
+        self.thread = Thread(target=self._run, name="liveness", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=1.0):
+        """Stop watching and write out the pending summaries"""
+        self._stop.set()
+        if self.thread:
+            self.thread.join(timeout=timeout)
+        self.summarize()
+
+    def _run(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.check()
+                if time.time() - self.last_summary >= self.summary_interval:
+                    self.summarize()
+            except Exception as e:
+                print(f"Error checking drone liveness: {e}")
+
+    def heartbeat(self, drone_id, now):
+        """Record a heartbeat at ``now`` (epoch seconds); True if the drone just came up"""
+        with self.lock:
+            drone = self.drones.get(drone_id)
+            if drone is None:
+                drone = self.drones[drone_id] = {
+                    'alive': False, 'first_seen': now, 'last_seen': None, 'count': 0, 'rate': None,
+                    'gaps': 0, 'max_gap': 0.0, 'downs': 0, 'window': None,
+                }
+            last = drone['last_seen']
+            if last is not None and now >= last:
+                interval = now - last
+                if interval > self.gap_threshold:
+                    drone['gaps'] += 1
+                drone['max_gap'] = max(drone['max_gap'], interval)
+                if interval > 0:
+                    rate = 1.0 / interval
+                    drone['rate'] = rate if drone['rate'] is None else drone['rate'] + (rate - drone['rate']) / 8
+            drone['last_seen'] = now
+            drone['count'] += 1
+            if not drone['alive']:
+                drone['alive'] = True
+                # The heartbeat announcing the drone is passed on as it is
+                drone['window'] = None
+                return True
+            window = drone['window']
+            if window is None:
+                drone['window'] = [1, last, now, now - last]
+            else:
+                window[0] += 1
+                window[3] = max(window[3], now - window[2])
+                window[2] = now
+            return False
+
+    def check(self, now=None):
+        """Mark drones silent for longer than ``timeout`` as down"""
+        now = time.time() if now is None else now
+        down = []
+        with self.lock:
+            for drone_id, drone in self.drones.items():
+                if drone['alive'] and now - drone['last_seen'] > self.timeout:
+                    drone['alive'] = False
+                    drone['downs'] += 1
+                    down.append(drone_id)
+        for drone_id in down:
+            self._summarize_drone(drone_id)
+        if down and self.on_change:
+            self.on_change([link_down_line(drone_id) for drone_id in down], datetime.fromtimestamp(now))
+        return down
+
+    def summarize(self):
+        """Hand out one summary record per drone for the heartbeats since the last one"""
+        self.last_summary = time.time()
+        with self.lock:
+            drone_ids = list(self.drones)
+        for drone_id in drone_ids:
+            self._summarize_drone(drone_id)
+
+    def _summarize_drone(self, drone_id):
+        with self.lock:
+            drone = self.drones[drone_id]
+            window, drone['window'] = drone['window'], None
+        if window and self.on_summary:
+            count, start, end, max_gap = window
+            line = f"{heartbeat_line(drone_id)} x{count} over {end - start:.2f}s, max gap {max_gap:.2f}s"
+            # Stamped with the last heartbeat it covers, which was read alongside the lines around it
+            self.on_summary(line, datetime.fromtimestamp(end))
+
+    def snapshot(self):
+        """JSON-ready liveness of every drone"""
+        now = time.time()
+        with self.lock:
+            return {
+                drone_id: {
+                    'alive': drone['alive'],
+                    'first_seen': drone['first_seen'],
+                    'last_seen': drone['last_seen'],
+                    'silent_for': round(now - drone['last_seen'], 3),
+                    'heartbeats': drone['count'],
+                    'rate': round(drone['rate'], 3) if drone['rate'] else None,
+                    'gaps': drone['gaps'],
+                    'max_gap': round(drone['max_gap'], 3),
+                    'downs': drone['downs'],
+                }
+                for drone_id, drone in sorted(self.drones.items())
+            }
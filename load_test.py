@@ -0,0 +1,106 @@
+import argparse
+import http.client
+import json
+import threading
+import time
+
+# Endpoints the UI polls while flying; a slow /verify_port can run alongside
+DEFAULT_PATHS = ['/esp-terminal?after=0', '/drone_state', '/mission/status', '/connections']
+
+
+def percentile(values, fraction):
+    """Value below which ``fraction`` of the sorted ``values`` fall"""
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+def worker(host, port, paths, deadline, keep_alive, latencies, errors):
+    """Issue GET requests round-robin over ``paths`` until ``deadline``"""
+    connection = None
+    i = 0
+    while time.monotonic() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        if connection is None:
+            connection = http.client.HTTPConnection(host, port, timeout=10)
+        started = time.perf_counter()
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 500:
+                errors.append(response.status)
+            latencies.append(time.perf_counter() - started)
+            if not keep_alive or response.will_close:
+                connection.close()
+                connection = None
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            connection.close()
+            connection = None
+    if connection:
+        connection.close()
+
+
+def slow_verify(host, port, serial_port, deadline):
+    """Keep a port verification running to show it does not block polling"""
+    while time.monotonic() < deadline:
+        connection = http.client.HTTPConnection(host, port, timeout=10)
+        try:
+            body = json.dumps({'port': serial_port, 'command': '{T:GCS;C:SERIAL;P:HB}'})
+            connection.request('POST', '/verify_port', body, {'Content-Type': 'application/json'})
+            connection.getresponse().read()
+        except (OSError, http.client.HTTPException):
+            time.sleep(0.1)
+        finally:
+            connection.close()
+
+
+def run(host, port, paths, clients, duration, keep_alive, verify_port=None):
+    latencies = []
+    errors = []
+    deadline = time.monotonic() + duration
+    threads = [threading.Thread(target=worker, args=(host, port, paths, deadline, keep_alive, latencies, errors))
+               for _ in range(clients)]
+    if verify_port:
+        threads.append(threading.Thread(target=slow_verify, args=(host, port, verify_port, deadline)))
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+    return {
+        'clients': clients,
+        'keep_alive': keep_alive,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the GCS HTTP backend")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--path', action='append', help="Endpoint to poll (repeatable)")
+    parser.add_argument('--no-keep-alive', action='store_true', help="Open a new connection per request")
+    parser.add_argument('--verify-port', help="Serial port to verify in a loop during the test")
+    args = parser.parse_args()
+
+    result = run(args.host, args.port, args.path or DEFAULT_PATHS, args.clients, args.duration,
+                 not args.no_keep_alive, args.verify_port)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
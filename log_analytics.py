@@ -0,0 +1,386 @@
+import argparse
+import gzip
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+
+from liveness import SUMMARY_PATTERN
+from log_catalog import ARCHIVE_DIR, is_log_name
+from log_index import TIMESTAMP_LEN, stamp_seconds
+from telemetry import TELEMETRY_TYPES, decode_telemetry, parse_frame
+from telemetry_poller import ACK_PATTERN
+
+CACHE_VERSION = 2
+CACHE_NAME = '.analytics.json'
+
+DELIVERY_STATUS = 'Last Packet Send Status: '
+INVALID_TARGET = 'Invalid target specified'
+# Sends or requests with no reply after this long are counted as unanswered
+REPLY_TIMEOUT = 5.0
+GAP_THRESHOLD = 1.5  # seconds between heartbeats that count as a gap
+
+# Latency histogram edges in milliseconds, 1 ms to 10 s in steps of ~12%;
+# histograms from different sessions add up, so totals need no raw samples
+LATENCY_EDGES_MS = [round(10 ** (i / 20), 3) for i in range(81)]
+
+
+def _histogram(samples):
+    counts = [0] * (len(LATENCY_EDGES_MS) + 1)
+    for sample in samples:
+        ms = sample * 1000
+        low, high = 0, len(LATENCY_EDGES_MS)
+        while low < high:
+            middle = (low + high) // 2
+            if LATENCY_EDGES_MS[middle] < ms:
+                low = middle + 1
+            else:
+                high = middle
+        counts[low] += 1
+    return counts
+
+
+def _distribution(counts, total_ms, maximum_ms):
+    """Count, mean, percentiles (bucket upper edges) and max of a latency histogram"""
+    count = sum(counts)
+    if not count:
+        return {'count': 0}
+
+    def percentile(fraction):
+        rank = fraction * count
+        seen = 0
+        for index, bucket in enumerate(counts):
+            seen += bucket
+            if seen >= rank:
+                return LATENCY_EDGES_MS[index] if index < len(LATENCY_EDGES_MS) else maximum_ms
+        return maximum_ms
+
+    return {
+        'count': count,
+        'mean_ms': round(total_ms / count, 2),
+        'p50_ms': round(min(percentile(0.5), maximum_ms), 2),
+        'p90_ms': round(min(percentile(0.9), maximum_ms), 2),
+        'p99_ms': round(min(percentile(0.99), maximum_ms), 2),
+        'max_ms': round(maximum_ms, 2),
+    }
+
+
+def _new_drone():
+    return {
+        'commands': 0, 'delivered': 0, 'failed': 0, 'invalid': 0, 'unacknowledged': 0,
+        'requests': 0, 'responses': 0, 'unanswered': 0, 'unsolicited': 0,
+        'messages': 0, 'heartbeats': 0, 'heartbeat_gaps': 0, 'max_heartbeat_gap': 0.0,
+        'ack': {'samples': []}, 'response': {'samples': []},
+    }
+
+
+def analyze_log(path):
+    """Link-quality figures of one session log, per drone and in total.
+
+    Relies on the dongle echoing every command before sending it and then
+    reporting "Last Packet Send Status" for each send in order. Replies
+    are matched like the telemetry poller does: to the oldest outstanding
+    REQ of the drone whose type the payload decodes as (or of the reply's
+    type, for typed replies); requests skipped over were not answered.
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    dates = {}
+    drones = {}
+    sends = deque()  # (drone_id, sent_at) waiting for a delivery status
+    requests = {}  # drone_id -> deque of (data_type, sent_at)
+    last_heartbeat = {}
+    lines = 0
+    first = last = None
+
+    def drone(drone_id):
+        stats = drones.get(drone_id)
+        if stats is None:
+            stats = drones[drone_id] = _new_drone()
+        return stats
+
+    with opener(path, 'rt', errors='replace') as f:
+        for raw in f:
+            if not raw.startswith('[') or raw[TIMESTAMP_LEN + 1:TIMESTAMP_LEN + 3] != '] ':
+                continue
+            try:
+                now = stamp_seconds(raw[1:1 + TIMESTAMP_LEN], dates)
+            except ValueError:
+                continue
+            line = raw[TIMESTAMP_LEN + 3:].rstrip('\r\n')
+            lines += 1
+            if first is None:
+                first = now
+            last = now
+
+            while sends and now - sends[0][1] > REPLY_TIMEOUT:
+                drone(sends.popleft()[0])['unacknowledged'] += 1
+
+            if line.startswith(DELIVERY_STATUS):
+                if sends:
+                    drone_id, sent_at = sends.popleft()
+                    stats = drone(drone_id)
+                    if line.endswith('Success'):
+                        stats['delivered'] += 1
+                        stats['ack']['samples'].append(now - sent_at)
+                    else:
+                        stats['failed'] += 1
+                continue
+            if line.endswith(INVALID_TARGET):
+                # No send happened, so no status will come for the latest command
+                for index in range(len(sends) - 1, -1, -1):
+                    if line.startswith(f"Target{sends[index][0]}"):
+                        drone(sends[index][0])['invalid'] += 1
+                        del sends[index]
+                        break
+                continue
+
+            frame = parse_frame(line)
+            if frame is None:
+                continue
+            if frame.direction == 'T':
+                if frame.drone == 'GCS':
+                    continue
+                stats = drone(frame.drone)
+                stats['commands'] += 1
+                sends.append((frame.drone, now))
+                if frame.command == 'REQ':
+                    stats['requests'] += 1
+                    requests.setdefault(frame.drone, deque()).append((frame.payload, now))
+                continue
+
+            stats = drone(frame.drone)
+            stats['messages'] += 1
+            if frame.command == 'HB':
+                summary = SUMMARY_PATTERN.search(line)
+                count = int(summary.group(1)) if summary else 1
+                # A summary record stands for ``count`` heartbeats on the link
+                stats['messages'] += count - 1
+                previous = last_heartbeat.get(frame.drone)
+                gap = float(summary.group(3)) if summary else (now - previous if previous else 0.0)
+                if gap > GAP_THRESHOLD:
+                    stats['heartbeat_gaps'] += 1
+                stats['max_heartbeat_gap'] = max(stats['max_heartbeat_gap'], gap)
+                stats['heartbeats'] += count
+                last_heartbeat[frame.drone] = now
+            elif frame.command in TELEMETRY_TYPES or (frame.command == 'RES'
+                                                       and not ACK_PATTERN.match(frame.payload)):
+                pending = requests.get(frame.drone)
+                while pending and now - pending[0][1] > REPLY_TIMEOUT:
+                    pending.popleft()
+                    stats['unanswered'] += 1
+                match = None
+                for index, (data_type, _) in enumerate(pending or ()):
+                    if frame.command == 'RES':
+                        try:
+                            decode_telemetry(data_type, frame.payload)
+                        except ValueError:
+                            continue
+                    elif data_type != frame.command:
+                        continue
+                    match = index
+                    break
+                if match is None:
+                    stats['unsolicited'] += 1
+                    continue
+                if frame.command == 'RES':
+                    # Replies arrive in order, so anything before this one was lost
+                    for _ in range(match):
+                        pending.popleft()
+                        stats['unanswered'] += 1
+                    match = 0
+                _, sent_at = pending[match]
+                del pending[match]
+                stats['responses'] += 1
+                stats['response']['samples'].append(now - sent_at)
+
+    for drone_id, _ in sends:
+        drone(drone_id)['unacknowledged'] += 1
+    for drone_id, pending in requests.items():
+        drone(drone_id)['unanswered'] += len(pending)
+
+    duration = (last - first) if first is not None else 0.0
+    for stats in drones.values():
+        for key in ('ack', 'response'):
+            samples = stats[key].pop('samples')
+            stats[key] = {
+                'histogram': _histogram(samples),
+                'total_ms': sum(samples) * 1000,
+                'max_ms': max(samples) * 1000 if samples else 0.0,
+            }
+        stats['max_heartbeat_gap'] = round(stats['max_heartbeat_gap'], 3)
+    return {
+        'log': os.path.basename(path),
+        'lines': lines,
+        'start': first,
+        'end': last,
+        'duration': round(duration, 3),
+        'drones': drones,
+    }
+
+
+def _merge(into, stats):
+    for key, value in stats.items():
+        if key in ('ack', 'response'):
+            target = into[key]
+            if 'histogram' not in target:
+                target.update(histogram=[0] * len(value['histogram']), total_ms=0.0, max_ms=0.0)
+            target['histogram'] = [a + b for a, b in zip(target['histogram'], value['histogram'])]
+            target['total_ms'] += value['total_ms']
+            target['max_ms'] = max(target['max_ms'], value['max_ms'])
+        elif key == 'max_heartbeat_gap':
+            into[key] = max(into[key], value)
+        else:
+            into[key] += value
+
+
+def _present(stats, duration):
+    """Raw counters and histograms of one drone turned into report figures"""
+    sent = stats['delivered'] + stats['failed']
+    return {
+        'commands': stats['commands'],
+        'delivered': stats['delivered'],
+        'failed': stats['failed'],
+        'invalid': stats['invalid'],
+        'unacknowledged': stats['unacknowledged'],
+        'delivery_ratio': round(stats['delivered'] / sent, 4) if sent else None,
+        'ack_latency': _distribution(stats['ack'].get('histogram', []), stats['ack'].get('total_ms', 0),
+                                     stats['ack'].get('max_ms', 0)),
+        'requests': stats['requests'],
+        'responses': stats['responses'],
+        'unanswered': stats['unanswered'],
+        'unsolicited': stats['unsolicited'],
+        'response_latency': _distribution(stats['response'].get('histogram', []),
+                                          stats['response'].get('total_ms', 0),
+                                          stats['response'].get('max_ms', 0)),
+        'heartbeats': stats['heartbeats'],
+        'heartbeat_gaps': stats['heartbeat_gaps'],
+        'max_heartbeat_gap': stats['max_heartbeat_gap'],
+        'messages': stats['messages'],
+        'message_rate': round(stats['messages'] / duration, 3) if duration else None,
+    }
+
+
+def summarize(results):
+    """Report for analyzed sessions: each session per drone, and all sessions per drone"""
+    totals = {}
+    duration = 0.0
+    sessions = []
+    for result in results:
+        duration += result['duration']
+        for drone_id, stats in result['drones'].items():
+            _merge(totals.setdefault(drone_id, _new_drone()), stats)
+        sessions.append({
+            'log': result['log'],
+            'lines': result['lines'],
+            'start': result['start'],
+            'duration': result['duration'],
+            'line_rate': round(result['lines'] / result['duration'], 3) if result['duration'] else None,
+            'drones': {drone_id: _present(stats, result['duration'])
+                       for drone_id, stats in sorted(result['drones'].items())},
+        })
+    return {
+        'sessions': sessions,
+        'drones': {drone_id: _present(stats, duration) for drone_id, stats in sorted(totals.items())},
+        'duration': round(duration, 3),
+    }
+
+
+class LogAnalytics:
+    """Link-quality analytics over every log in a directory.
+
+    Logs are analyzed in a process pool, one file per task, and each result
+    is cached in ``<logs>/.analytics.json`` under the file's mtime and
+    size, so a re-run only reads logs that are new or still growing.
+    """
+
+    def __init__(self, logs_dir, max_workers=None):
+        self.logs_dir = logs_dir
+        self.max_workers = max_workers
+        self.cache_path = os.path.join(logs_dir, CACHE_NAME)
+        self.cache = None
+        self.lock = Lock()
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') == CACHE_VERSION:
+                return data['files']
+        except (OSError, ValueError, KeyError):
+            pass
+        return {}
+
+    def _save_cache(self):
+        temp = self.cache_path + '.tmp'
+        try:
+            with open(temp, 'w') as f:
+                json.dump({'version': CACHE_VERSION, 'files': self.cache}, f)
+            os.replace(temp, self.cache_path)
+        except OSError as e:
+            print(f"Error saving log analytics cache: {e}")
+
+    def logs(self):
+        """``{name: ([mtime_ns, size], path)}`` of every session log, archived ones included"""
+        found = {}
+        for directory in (os.path.join(self.logs_dir, ARCHIVE_DIR), self.logs_dir):
+            if not os.path.isdir(directory):
+                continue
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if is_log_name(entry.name) and entry.is_file():
+                        stat = entry.stat()
+                        found[entry.name] = ([stat.st_mtime_ns, stat.st_size], entry.path)
+        return found
+
+    def analyze(self, names=None):
+        """Report over ``names`` (default every log), analyzing only what changed"""
+        started = time.perf_counter()
+        with self.lock:
+            if self.cache is None:
+                self.cache = self._load_cache()
+            found = self.logs()
+            if names is not None:
+                found = {name: log for name, log in found.items() if name in names}
+            stale = [name for name, (key, _) in found.items()
+                     if self.cache.get(name, {}).get('key') != key]
+            if stale:
+                paths = [found[name][1] for name in stale]
+                if len(paths) == 1:
+                    results = [analyze_log(paths[0])]
+                else:
+                    with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                        results = list(pool.map(analyze_log, paths))
+                for name, result in zip(stale, results):
+                    self.cache[name] = {'key': found[name][0], 'result': result}
+            removed = set(self.cache) - set(found) if names is None else set()
+            for name in removed:
+                del self.cache[name]
+            if stale or removed:
+                self._save_cache()
+            results = [self.cache[name]['result'] for name in sorted(found)]
+
+        report = summarize(results)
+        report['analyzed'] = len(stale)
+        report['cached'] = len(found) - len(stale)
+        report['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Link-quality analytics over the ESP session logs")
+    parser.add_argument('--logs-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs'))
+    parser.add_argument('--log', action='append', help="Only this log (repeatable)")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument('--totals', action='store_true', help="Leave out the per-session breakdown")
+    args = parser.parse_args()
+
+    report = LogAnalytics(args.logs_dir, args.workers).analyze(args.log)
+    if args.totals:
+        del report['sessions']
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+import bisect
+import gzip
+import json
+import os
+import re
+import shutil
+import time
+from datetime import datetime, timedelta
+from threading import Lock
+
+from log_index import index_path_for
+
+CATALOG_VERSION = 2
+CATALOG_NAME = '.catalog.json'
+ARCHIVE_DIR = 'archive'
+# "esp_log_2025-01-21_12-52-43_1.txt.gz" - the session start is in the name
+LOG_NAME_PATTERN = re.compile(r'esp_log_(\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})(?:_\d+)?\.txt(?:\.gz)?$')
+
+# Every limit is off until set through /log_retention; None disables a limit
+DEFAULT_POLICY = {
+    'compress_after_days': None,  # Gzip closed logs older than this
+    'archive_after_days': None,  # Move logs older than this to the archive
+    'max_total_bytes': None,  # Archive the oldest logs while the rest exceed this
+    'max_archive_bytes': None,  # Delete the oldest archived logs past this
+}
+
+
+def is_log_name(name):
+    return name.startswith('esp_log_') and name.endswith(('.txt', '.txt.gz'))
+
+
+def compress_log(file_path):
+    """Gzip a closed log segment next to the original, then remove it; the new path or None"""
+    try:
+        tmp_path = file_path + '.gz.tmp'
+        with open(file_path, 'rb') as src, gzip.open(tmp_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp_path, file_path + '.gz')
+        os.remove(file_path)
+        if os.path.exists(index_path_for(file_path)):
+            os.remove(index_path_for(file_path))
+        return file_path + '.gz'
+    except Exception as e:
+        print(f"Error compressing log file: {e}")
+        return None
+
+
+def parse_time(value, end=False):
+    """Epoch seconds from '2025-01-21', '2025-01-21 12:52:43' or a number.
+
+    With ``end`` a bare date means the end of that day, so it works as an
+    exclusive upper bound.
+    """
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    text = str(value).strip().replace('T', ' ')
+    moment = datetime.fromisoformat(text)
+    if end and len(text) == 10:
+        moment += timedelta(days=1)
+    return moment.timestamp()
+
+
+def session_start(name, stat):
+    """When a session began, from its file name (falling back to the file's ctime)"""
+    match = LOG_NAME_PATTERN.match(name)
+    if match:
+        try:
+            return datetime.strptime(match.group(1), "%Y-%m-%d_%H-%M-%S").timestamp()
+        except ValueError:
+            pass
+    return stat.st_ctime
+
+
+class LogCatalog:
+    """Persistent listing of the session logs in a directory.
+
+    Entries (name, size, session start) are kept in ``<logs>/.catalog.json``
+    and in memory sorted by session start, so pages and date ranges are
+    answered with a binary search instead of stat-ing every log. Closed logs
+    never change in place - rotation and compression create new names - so
+    a refresh only lists the directory and stats names it has not seen,
+    plus the log currently being written.
+
+    ``enforce`` applies the retention policy: closed logs past
+    ``compress_after_days`` are gzipped, and logs past ``archive_after_days``
+    or beyond ``max_total_bytes`` (oldest first) move to ``<logs>/archive``,
+    which is itself trimmed to ``max_archive_bytes`` when that is set.
+    Every limit is off by default, so nothing is moved or deleted until a
+    policy is configured.
+    """
+
+    def __init__(self, logs_dir, rescan_interval=1.0, policy=None):
+        self.logs_dir = logs_dir
+        self.archive_dir = os.path.join(logs_dir, ARCHIVE_DIR)
+        self.catalog_path = os.path.join(logs_dir, CATALOG_NAME)
+        self.rescan_interval = rescan_interval
+        self.policy = dict(DEFAULT_POLICY)
+        self.entries = {}  # name -> {'name', 'size', 'mtime_ns', 'started'}
+        self.order = []  # (started, name), oldest first
+        self.active = None
+        self.scanned_at = None
+        self.last_enforced = None
+        self.lock = Lock()
+        self._load()
+        if policy:
+            self.policy.update(policy)
+
+    def _load(self):
+        try:
+            with open(self.catalog_path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') != CATALOG_VERSION:
+                return
+            self.policy.update(data.get('policy') or {})
+            for entry in data['logs']:
+                self.entries[entry['name']] = entry
+        except (OSError, ValueError, KeyError, TypeError):
+            self.entries = {}
+        self.order = sorted((entry['started'], name) for name, entry in self.entries.items())
+
+    def _save(self):
+        temp = self.catalog_path + '.tmp'
+        try:
+            with open(temp, 'w') as f:
+                json.dump({'version': CATALOG_VERSION, 'policy': self.policy,
+                           'logs': [self.entries[name] for _, name in self.order]}, f)
+            os.replace(temp, self.catalog_path)
+        except OSError as e:
+            print(f"Error saving log catalog: {e}")
+
+    def _add(self, name):
+        """Stat one log into the catalog; False if it has gone"""
+        try:
+            stat = os.stat(os.path.join(self.logs_dir, name))
+        except OSError:
+            self._remove(name)
+            return False
+        entry = self.entries.get(name)
+        if entry is not None:
+            entry['size'] = stat.st_size
+            entry['mtime_ns'] = stat.st_mtime_ns
+            return True
+        entry = self.entries[name] = {
+            'name': name, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'started': session_start(name, stat),
+        }
+        bisect.insort(self.order, (entry['started'], name))
+        return True
+
+    def _remove(self, name):
+        entry = self.entries.pop(name, None)
+        if entry is not None:
+            index = bisect.bisect_left(self.order, (entry['started'], name))
+            if index < len(self.order) and self.order[index][1] == name:
+                del self.order[index]
+
+    def refresh(self, force=False):
+        """Pick up logs that were created, compressed or removed"""
+        with self.lock:
+            now = time.monotonic()
+            if not force and self.scanned_at is not None and now - self.scanned_at < self.rescan_interval:
+                if self.active in self.entries:
+                    self._add(self.active)
+                return
+            first_scan = self.scanned_at is None
+            self.scanned_at = now
+            try:
+                names = {name for name in os.listdir(self.logs_dir) if is_log_name(name)}
+            except OSError as e:
+                print(f"Error listing log files: {e}")
+                return
+
+            changed = False
+            for name in set(self.entries) - names:
+                self._remove(name)
+                changed = True
+            for name in names:
+                # A log left uncompressed by an earlier run may have grown after it was saved
+                stale = first_scan and name.endswith('.txt')
+                if name not in self.entries or stale:
+                    before = self.entries.get(name, {}).get('size')
+                    if self._add(name) and self.entries[name]['size'] != before:
+                        changed = True
+            if self.active in self.entries:
+                self._add(self.active)
+            if changed:
+                self._save()
+
+    def set_active(self, path):
+        """Record the log now being written; it is never compressed or archived"""
+        with self.lock:
+            self.active = os.path.basename(path)
+            self._add(self.active)
+            self._save()
+
+    def _present(self, entry):
+        return {
+            'name': entry['name'],
+            'path': os.path.join(self.logs_dir, entry['name']),
+            'size': entry['size'],
+            'date': datetime.fromtimestamp(entry['started']).strftime("%Y-%m-%d %H:%M:%S"),
+            'started': entry['started'],
+            'compressed': entry['name'].endswith('.gz'),
+            'active': entry['name'] == self.active,
+        }
+
+    def list(self, offset=0, limit=None, since=None, until=None):
+        """``(total, page)`` of logs newest first, optionally within [since, until) epoch seconds"""
+        if offset < 0 or (limit is not None and limit < 0):
+            raise ValueError("offset and limit must not be negative")
+        self.refresh()
+        with self.lock:
+            low = 0 if since is None else bisect.bisect_left(self.order, (since, ''))
+            high = len(self.order) if until is None else bisect.bisect_left(self.order, (until, ''))
+            total = max(0, high - low)
+            # Newest first: the page ends ``offset`` entries below the top of the range
+            end = max(low, high - offset)
+            start = low if limit is None else max(low, end - limit)
+            page = [self._present(self.entries[name]) for _, name in reversed(self.order[start:end])]
+        return total, page
+
+    def find(self, name):
+        """Path of a log by name, looking in the archive too; None if there is no such log"""
+        name = os.path.basename(name or '')
+        for directory in (self.logs_dir, self.archive_dir):
+            path = os.path.join(directory, name)
+            if is_log_name(name) and os.path.isfile(path):
+                return path
+        return None
+
+    def total_bytes(self):
+        with self.lock:
+            return sum(entry['size'] for entry in self.entries.values())
+
+    def retention_enabled(self):
+        """Whether any retention limit is set"""
+        with self.lock:
+            return any(value is not None for value in self.policy.values())
+
+    def set_policy(self, **changes):
+        """Update retention limits; None turns a limit off"""
+        for key, value in changes.items():
+            if key not in DEFAULT_POLICY:
+                raise ValueError(f"Unknown retention setting: {key}")
+            if value is not None and (not isinstance(value, (int, float)) or value < 0):
+                raise ValueError(f"{key} must be a non-negative number or null")
+        with self.lock:
+            self.policy.update(changes)
+            self._save()
+
+    def status(self):
+        """Retention policy, disk usage and the last enforcement"""
+        self.refresh()
+        with self.lock:
+            return {
+                'policy': dict(self.policy),
+                'logs': len(self.entries),
+                'total_bytes': sum(entry['size'] for entry in self.entries.values()),
+                'archive_bytes': self._archive_usage()[0],
+                'last_enforced': self.last_enforced,
+            }
+
+    def _archive_usage(self):
+        """``(total bytes, [(mtime, size, path)] oldest first)`` of the archive"""
+        files = []
+        if os.path.isdir(self.archive_dir):
+            with os.scandir(self.archive_dir) as entries:
+                for entry in entries:
+                    if is_log_name(entry.name) and entry.is_file():
+                        stat = entry.stat()
+                        files.append((stat.st_mtime, stat.st_size, entry.path))
+        files.sort()
+        return sum(size for _, size, _ in files), files
+
+    def enforce(self, now=None):
+        """Compress, archive and trim logs per the retention policy"""
+        now = time.time() if now is None else now
+        self.refresh(force=True)
+        with self.lock:
+            policy = dict(self.policy)
+            closed = [self.entries[name] for _, name in self.order if name != self.active]
+        result = {'compressed': 0, 'archived': 0, 'deleted': 0}
+
+        compress_after = policy['compress_after_days']
+        if compress_after is not None:
+            for entry in closed:
+                if entry['name'].endswith('.txt') and now - entry['started'] > compress_after * 86400:
+                    path = compress_log(os.path.join(self.logs_dir, entry['name']))
+                    if path:
+                        with self.lock:
+                            self._remove(entry['name'])
+                            self._add(os.path.basename(path))
+                        result['compressed'] += 1
+
+        with self.lock:
+            closed = [self.entries[name] for _, name in self.order if name != self.active]
+            total = sum(entry['size'] for entry in self.entries.values())
+        archive_after = policy['archive_after_days']
+        max_total = policy['max_total_bytes']
+        for entry in closed:
+            too_old = archive_after is not None and now - entry['started'] > archive_after * 86400
+            too_big = max_total is not None and total > max_total
+            if not too_old and not too_big:
+                # Oldest first, so nothing newer can qualify either
+                break
+            if self._archive(entry['name']):
+                total -= entry['size']
+                result['archived'] += 1
+
+        max_archive = policy['max_archive_bytes']
+        if max_archive is not None:
+            archived, files = self._archive_usage()
+            for _, size, path in files:
+                if archived <= max_archive:
+                    break
+                try:
+                    os.remove(path)
+                    archived -= size
+                    result['deleted'] += 1
+                except OSError as e:
+                    print(f"Error deleting archived log: {e}")
+
+        with self.lock:
+            if any(result.values()):
+                self._save()
+            self.last_enforced = dict(result, at=now)
+        return result
+
+    def _archive(self, name):
+        path = os.path.join(self.logs_dir, name)
+        try:
+            os.makedirs(self.archive_dir, exist_ok=True)
+            os.replace(path, os.path.join(self.archive_dir, name))
+            if os.path.exists(index_path_for(path)):
+                os.remove(index_path_for(path))
+        except OSError as e:
+            print(f"Error archiving log file: {e}")
+            return False
+        with self.lock:
+            self._remove(name)
+        return True
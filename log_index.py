@@ -0,0 +1,283 @@
+import bisect
+import gzip
+import json
+import mmap
+import os
+import re
+from collections import deque
+from datetime import datetime
+from threading import Lock
+
+# "[2025-01-23 17:32:49.263] {S:CD1;C:HB;P:1}" - the timestamp is fixed width,
+# so timestamps compare correctly as plain strings and never need parsing.
+TIMESTAMP_LEN = 23
+FRAME_PATTERN = re.compile(rb'\{\s*[TS]\s*:\s*([^;}]*?)\s*;\s*C\s*:\s*([^;}]*?)\s*[;}]')
+
+INDEX_VERSION = 2
+CHECKPOINT_LINES = 256
+
+
+def stamp_seconds(stamp, dates):
+    """'2025-01-23 17:32:49.263' as epoch seconds, parsing each date only once"""
+    day = dates.get(stamp[:10])
+    if day is None:
+        day = dates[stamp[:10]] = datetime.strptime(stamp[:10], '%Y-%m-%d').timestamp()
+    return day + int(stamp[11:13]) * 3600 + int(stamp[14:16]) * 60 + float(stamp[17:23])
+
+
+def index_path_for(log_path):
+    """Path of the sidecar index file for a log"""
+    return log_path + '.idx.json'
+
+
+def normalize_timestamp(value):
+    """Turn '2025-01-23T17:33' style input into a comparable log timestamp string"""
+    if not value:
+        return None
+    return value.strip().replace('T', ' ')
+
+
+class LogIndex:
+    """Sidecar index over one ESP log file.
+
+    The index is built once and stored next to the log as ``<log>.idx.json``.
+    It records a checkpoint (line number, byte offset, timestamp) every
+    ``CHECKPOINT_LINES`` lines and the byte offset of every line per drone ID
+    and per command type. Queries use it to seek straight to the lines they
+    need instead of reading the whole file. Logs that are still being written
+    are indexed incrementally from where the previous pass stopped.
+    """
+
+    def __init__(self, log_path):
+        self.log_path = log_path
+        self.index_path = index_path_for(log_path)
+        self.compressed = log_path.endswith('.gz')
+        self.size = 0  # indexed bytes (of the uncompressed stream for .gz logs)
+        self.file_size = 0  # on-disk size and mtime the index was built from
+        self.mtime = 0
+        self.lines = 0
+        self.last_timestamp = None
+        self.checkpoints = []  # [line_no, offset, timestamp]
+        self.drones = {}
+        self.commands = {}
+        self.lock = Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') != INDEX_VERSION:
+                return
+            self.size = data['size']
+            self.file_size = data['file_size']
+            self.mtime = data['mtime']
+            self.lines = data['lines']
+            self.last_timestamp = data['last_timestamp']
+            self.checkpoints = data['checkpoints']
+            self.drones = data['drones']
+            self.commands = data['commands']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _save(self):
+        if not os.path.exists(self.log_path):
+            # The log was compressed or moved meanwhile; its sidecar went with it
+            return
+        data = {
+            'version': INDEX_VERSION,
+            'size': self.size,
+            'file_size': self.file_size,
+            'mtime': self.mtime,
+            'lines': self.lines,
+            'last_timestamp': self.last_timestamp,
+            'checkpoints': self.checkpoints,
+            'drones': self.drones,
+            'commands': self.commands,
+        }
+        tmp_path = self.index_path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print(f"Error saving log index: {e}")
+
+    def _reset(self):
+        self.size = 0
+        self.lines = 0
+        self.last_timestamp = None
+        self.checkpoints = []
+        self.drones = {}
+        self.commands = {}
+
+    def _open(self):
+        return gzip.open(self.log_path, 'rb') if self.compressed else open(self.log_path, 'rb')
+
+    def refresh(self):
+        """Bring the index up to date with the log file"""
+        with self.lock:
+            self._refresh()
+
+    def _refresh(self):
+        stat = os.stat(self.log_path)
+        if stat.st_size == self.file_size and stat.st_mtime == self.mtime:
+            return
+        # Plain logs only ever grow; anything else means a different file
+        if self.compressed or stat.st_size < self.file_size:
+            self._reset()
+
+        with self._open() as f:
+            f.seek(self.size)
+            offset = self.size
+            line_no = self.lines
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    # Partially written line, pick it up on the next pass
+                    break
+                if raw.startswith(b'['):
+                    timestamp = raw[1:1 + TIMESTAMP_LEN].decode('ascii', errors='replace')
+                    if line_no % CHECKPOINT_LINES == 0 or not self.checkpoints:
+                        self.checkpoints.append([line_no, offset, timestamp])
+                    self.last_timestamp = timestamp
+                    match = FRAME_PATTERN.search(raw, TIMESTAMP_LEN + 2)
+                    if match:
+                        drone = match.group(1).decode('utf-8', errors='replace')
+                        command = match.group(2).decode('utf-8', errors='replace')
+                        self.drones.setdefault(drone, []).append(offset)
+                        self.commands.setdefault(command, []).append(offset)
+                offset += len(raw)
+                line_no += 1
+
+        self.size = offset
+        self.lines = line_no
+        self.file_size = stat.st_size
+        self.mtime = stat.st_mtime
+        self._save()
+
+    def summary(self):
+        """Small description of the log for listings"""
+        return {
+            'lines': self.lines,
+            'start': self.checkpoints[0][2] if self.checkpoints else None,
+            'end': self.last_timestamp,
+            'drones': {drone: len(offsets) for drone, offsets in self.drones.items()},
+            'commands': {command: len(offsets) for command, offsets in self.commands.items()},
+        }
+
+    def _checkpoint_before_time(self, timestamp):
+        """Byte offset of the last checkpoint strictly before ``timestamp``"""
+        times = [checkpoint[2] for checkpoint in self.checkpoints]
+        i = bisect.bisect_left(times, timestamp) - 1
+        return self.checkpoints[i][1] if i >= 0 else 0
+
+    def _checkpoint_before_line(self, line_no):
+        """``(line_no, offset)`` of the last checkpoint at or before ``line_no``"""
+        lines = [checkpoint[0] for checkpoint in self.checkpoints]
+        i = bisect.bisect_right(lines, line_no) - 1
+        if i < 0:
+            return 0, 0
+        return self.checkpoints[i][0], self.checkpoints[i][1]
+
+    def _offset_for_time(self, f, timestamp):
+        """Byte offset of the first line stamped at or after ``timestamp``"""
+        offset = self._checkpoint_before_time(timestamp)
+        f.seek(offset)
+        while offset < self.size:
+            raw = f.readline()
+            if not raw:
+                break
+            if raw.startswith(b'[') and raw[1:1 + TIMESTAMP_LEN].decode('ascii', errors='replace') >= timestamp:
+                return offset
+            offset += len(raw)
+        return offset
+
+    def offset_for_time(self, timestamp):
+        """Byte offset of the first line stamped at or after ``timestamp``"""
+        self.refresh()
+        with self._open() as f:
+            return self._offset_for_time(f, normalize_timestamp(timestamp))
+
+    def query(self, start=None, end=None, drone=None, command=None, offset=0, limit=None, tail=None):
+        """Yield matching log lines (without line terminators).
+
+        ``start``/``end`` bound the timestamp range (end exclusive),
+        ``drone``/``command`` keep only frames from/to that drone or with
+        that command, ``offset``/``limit`` page through the matches and
+        ``tail`` returns only the last N matches (``offset`` is ignored).
+        """
+        self.refresh()
+        start = normalize_timestamp(start)
+        end = normalize_timestamp(end)
+
+        with self._open() as f:
+            if self.compressed:
+                reader = f
+            else:
+                if self.size == 0:
+                    return
+                reader = mmap.mmap(f.fileno(), self.size, access=mmap.ACCESS_READ)
+            try:
+                if drone or command:
+                    lines = self._query_indexed(reader, start, end, drone, command, offset, tail)
+                elif tail and not start and not end:
+                    # Only the last lines are needed, so start near them
+                    lines = self._query_sequential(reader, None, None, max(0, self.lines - tail))
+                else:
+                    lines = self._query_sequential(reader, start, end, 0 if tail else offset)
+                    if tail:
+                        lines = deque(lines, maxlen=tail)
+
+                for count, line in enumerate(lines):
+                    if limit is not None and count >= limit:
+                        break
+                    yield line
+            finally:
+                if not self.compressed:
+                    reader.close()
+
+    def _read_line_at(self, reader, offset):
+        if self.compressed:
+            reader.seek(offset)
+            return reader.readline().rstrip(b'\r\n')
+        end = reader.find(b'\n', offset)
+        return reader[offset:end if end >= 0 else self.size].rstrip(b'\r')
+
+    def _query_indexed(self, reader, start, end, drone, command, skip, tail):
+        candidates = None
+        for key, table in ((drone, self.drones), (command, self.commands)):
+            if key:
+                offsets = table.get(key, [])
+                candidates = offsets if candidates is None else sorted(set(candidates).intersection(offsets))
+
+        lo, hi = 0, len(candidates)
+        if start:
+            lo = bisect.bisect_left(candidates, self._offset_for_time(reader, start))
+        if end:
+            hi = bisect.bisect_left(candidates, self._offset_for_time(reader, end))
+
+        lo = max(lo, hi - tail) if tail else lo + skip
+        for offset in candidates[lo:hi]:
+            yield self._read_line_at(reader, offset).decode('utf-8', errors='replace')
+
+    def _query_sequential(self, reader, start, end, skip_lines):
+        if start:
+            offset = self._offset_for_time(reader, start)
+        else:
+            # Jump to the nearest checkpoint before the requested page
+            line_no, offset = self._checkpoint_before_line(skip_lines)
+            skip_lines -= line_no
+
+        reader.seek(offset)
+        position = offset
+        while position < self.size:
+            raw = reader.readline()
+            if not raw:
+                break
+            position += len(raw)
+            if skip_lines > 0:
+                skip_lines -= 1
+                continue
+            if end and raw.startswith(b'[') and raw[1:1 + TIMESTAMP_LEN].decode('ascii', errors='replace') >= end:
+                break
+            yield raw.rstrip(b'\r\n').decode('utf-8', errors='replace')
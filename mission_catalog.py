@@ -0,0 +1,133 @@
+import os
+import time
+from threading import Lock
+
+import numpy as np
+
+from mission_decoder import compile_mission, forget_compiled_mission
+from mission_format import FrameView, MISSION_EXTENSIONS, POSITION_COLUMNS, RESTORE
+
+
+def mission_bounds(drones):
+    """``(low, high)`` of the drones' frame positions per axis; binary missions are read by column"""
+    low = {'x': None, 'y': None, 'z': None}
+    high = {'x': None, 'y': None, 'z': None}
+
+    def extend(axis, value):
+        if low[axis] is None or value < low[axis]:
+            low[axis] = value
+        if high[axis] is None or value > high[axis]:
+            high[axis] = value
+
+    for drone in drones.values():
+        frames = drone.get('frames', [])
+        if isinstance(frames, FrameView):
+            columns = frames.columns(POSITION_COLUMNS)
+            for i, axis in enumerate(POSITION_COLUMNS):
+                column = columns[:, i][~np.isnan(columns[:, i])]
+                if column.size:
+                    restore = RESTORE[frames.kinds[axis]]
+                    extend(axis, restore(float(column.min())))
+                    extend(axis, restore(float(column.max())))
+            # Only frames with a position kept outside the columns need reading
+            frames = [frames[int(index)] for index, extra in frames.extras.items() if 'position' in extra]
+        for frame in frames:
+            position = frame.get('position') or {}
+            for axis in POSITION_COLUMNS:
+                value = position.get(axis)
+                if value is not None:
+                    extend(axis, value)
+    return low, high
+
+
+def summarize_mission(plan):
+    """Metadata of a compiled mission for listings"""
+    drones = plan.mission_data['drones']
+    low, high = mission_bounds(drones)
+    return {
+        'drones': list(drones),
+        'frames': len(plan.frames),
+        'commands': sum(len(frame['lines']) for frame in plan.frames),
+        'duration': sum(frame['delay'] for frame in plan.frames) / 1000.0,
+        'bounds': {'min': low, 'max': high},
+        'version': plan.mission_data.get('version'),
+        'timestamp': plan.mission_data.get('timestamp'),
+    }
+
+
+class MissionCatalog:
+    """Cached metadata for every mission in a directory.
+
+    Each mission is parsed once and its summary (drone IDs, frame count,
+    duration, bounding box) kept until the file's mtime or size changes;
+    the compiled plan itself is not kept.
+    The directory itself is rescanned at most every ``rescan_interval``
+    seconds, and a rescan only stats files, so listings stay cheap with
+    hundreds of missions.
+    """
+
+    def __init__(self, missions_dir, rescan_interval=1.0):
+        self.missions_dir = missions_dir
+        self.rescan_interval = rescan_interval
+        self.entries = {}  # file name -> ((mtime_ns, size), summary)
+        self.scanned_at = None
+        self.lock = Lock()
+
+    def refresh(self, force=False):
+        """Pick up added, changed and removed mission files"""
+        with self.lock:
+            now = time.monotonic()
+            if not force and self.scanned_at is not None and now - self.scanned_at < self.rescan_interval:
+                return
+            self.scanned_at = now
+
+            found = {}
+            if os.path.isdir(self.missions_dir):
+                with os.scandir(self.missions_dir) as entries:
+                    for entry in entries:
+                        if entry.name.endswith(MISSION_EXTENSIONS) and entry.is_file():
+                            stat = entry.stat()
+                            found[entry.name] = (stat.st_mtime_ns, stat.st_size)
+
+            for name in set(self.entries) - set(found):
+                del self.entries[name]
+                forget_compiled_mission(os.path.join(self.missions_dir, name))
+            for name, key in found.items():
+                cached = self.entries.get(name)
+                if cached is None or cached[0] != key:
+                    if cached is not None:
+                        forget_compiled_mission(os.path.join(self.missions_dir, name))
+                    self.entries[name] = (key, self._summarize(name, key))
+
+    def _summarize(self, name, key):
+        summary = {
+            'name': name,
+            'path': f'/Missions/{name}',
+            'size': key[1],
+            'modified': key[0] / 1e9,
+        }
+        try:
+            # Only the summary is kept; plans are cached for missions that get loaded
+            plan = compile_mission(os.path.join(self.missions_dir, name), cache=False)
+            summary.update(summarize_mission(plan))
+        except (OSError, ValueError, KeyError, TypeError, AttributeError, StopIteration) as e:
+            summary['error'] = str(e)
+        return summary
+
+    def list(self, offset=0, limit=None, search=None):
+        """``(total, page)`` of mission summaries sorted by name"""
+        self.refresh()
+        with self.lock:
+            summaries = [summary for _, (_, summary) in sorted(self.entries.items())]
+        if search:
+            search = search.lower()
+            summaries = [summary for summary in summaries if search in summary['name'].lower()]
+        end = None if limit is None else offset + limit
+        return len(summaries), summaries[offset:end]
+
+    def get(self, name):
+        """Summary of one mission, or None if there is no such file"""
+        self.refresh()
+        with self.lock:
+            cached = self.entries.get(name)
+        return cached[1] if cached else None
@@ -1,20 +1,152 @@
-import json
 import time
 from datetime import datetime
 import os
+import math
+from collections import OrderedDict
+from threading import Lock
+
+from mission_format import read_mission, FrameView, MISSION_EXTENSIONS
+
+MISSIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Missions')
+
+# Compiled missions keyed by path, reused while (mtime, size) is unchanged;
+# least recently used first, and only the last few are kept
+MAX_COMPILED_MISSIONS = 4
+_compiled_missions = OrderedDict()
+_compiled_missions_lock = Lock()
+
+
+def format_command(cmd):
+    """Format command into ESP-NOW protocol string"""
+    return f"{{T:{cmd['target']};C:{cmd['command']};P:{cmd['payload']}}}"
+
+
+def mtl_payload(frame):
+    """MTL (Move To Location) payload of a frame: distance, altitude, heading"""
+    return f"{math.hypot(frame['dx'], frame['dy']):.2f},{frame['position']['z']:.2f},{frame['heading']:.1f}"
+
+
+def mtl_payloads(frames):
+    """MTL payload of every frame; binary missions are read a column at a time"""
+    if not isinstance(frames, FrameView):
+        return [mtl_payload(frame) for frame in frames]
+    columns = zip(*(frames.column_values(name) for name in ('dx', 'dy', 'z', 'heading')))
+    return [mtl_payload(frames[k]) if None in values
+            else f"{math.hypot(values[0], values[1]):.2f},{values[2]:.2f},{values[3]:.1f}"
+            for k, values in enumerate(columns)]
+
+
+def is_hold_payload(payload):
+    """True for an MTL that asks for no horizontal movement"""
+    try:
+        return float(payload.split(',')[0]) == 0
+    except ValueError:
+        return False
+
+
+class CompiledMission:
+    """Send-ready plan of a mission with redundant commands removed.
+
+    Each frame holds its commands pre-formatted as protocol strings so
+    playback does no formatting. An MTL that repeats a drone's previous MTL
+    and asks for no horizontal movement is dropped, as is any command
+    repeated within one frame; both are no-ops for the drone and only cost
+    airtime. The protocol addresses one drone per frame, so a frame's
+    commands are merged into a single serial write rather than one payload.
+    ``full_lines`` gives the complete command set of a frame for seeking,
+    where the drones' previous targets cannot be assumed.
+    """
+
+    def __init__(self, mission_data, commands_queue):
+        self.mission_data = mission_data
+        self.commands_queue = commands_queue
+        self.drones = list(mission_data['drones'])
+        self.frames = []
+        self.eliminated = 0
+
+        last_mtl = {}
+        for frame in commands_queue:
+            lines = []
+            seen = set()
+            for cmd in frame['commands']:
+                line = format_command(cmd)
+                if line in seen:
+                    self.eliminated += 1
+                    continue
+                seen.add(line)
+                if cmd['command'] == 'MTL':
+                    if last_mtl.get(cmd['target']) == cmd['payload'] and is_hold_payload(cmd['payload']):
+                        self.eliminated += 1
+                        continue
+                    last_mtl[cmd['target']] = cmd['payload']
+                lines.append(line)
+            self.frames.append({
+                'frame_index': frame['frame_index'],
+                'delay': frame['delay'],
+                'lines': tuple(lines),
+            })
+
+    def full_lines(self, frame_index):
+        """All distinct commands of a frame, without delta elimination"""
+        lines = []
+        for cmd in self.commands_queue[frame_index]['commands']:
+            line = format_command(cmd)
+            if line not in lines:
+                lines.append(line)
+        return lines
+
+
+def compile_mission(mission_file, cache=True):
+    """Compile a mission file, reusing the cached plan while the file is unchanged.
+
+    The returned plan and its ``mission_data``/``commands_queue`` are shared
+    between callers and must be treated as read-only. With ``cache`` False
+    a plan that is not cached already is compiled without being kept.
+    """
+    path = os.path.abspath(mission_file)
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _compiled_missions_lock:
+        cached = _compiled_missions.get(path)
+        if cached and cached[0] == key:
+            _compiled_missions.move_to_end(path)
+            return cached[1]
+
+    mission_data = read_mission(path)
+    decoder = MissionDecoder()
+    decoder.mission_data = mission_data
+    decoder.organize_commands_by_keyframe()
+    compiled = CompiledMission(mission_data, decoder.commands_queue)
+
+    if cache:
+        with _compiled_missions_lock:
+            _compiled_missions[path] = (key, compiled)
+            _compiled_missions.move_to_end(path)
+            while len(_compiled_missions) > MAX_COMPILED_MISSIONS:
+                _compiled_missions.popitem(last=False)
+    return compiled
+
+
+def forget_compiled_mission(mission_file):
+    """Drop the cached plan of a mission file that was changed or removed"""
+    with _compiled_missions_lock:
+        _compiled_missions.pop(os.path.abspath(mission_file), None)
+
 
 class MissionDecoder:
     def __init__(self):
         self.mission_data = None
         self.current_frame = 0
         self.commands_queue = []
+        self.compiled = None
         
     def load_mission(self, mission_file):
-        """Load and parse mission file"""
+        """Load and parse mission file (cached until the file changes)"""
         try:
-            with open(mission_file, 'r') as f:
-                self.mission_data = json.load(f)
-            self.organize_commands_by_keyframe()
+            self.compiled = compile_mission(mission_file)
+            self.mission_data = self.compiled.mission_data
+            self.commands_queue = self.compiled.commands_queue
+            self.current_frame = 0
             return True
         except Exception as e:
             print(f"Error loading mission: {e}")
@@ -24,35 +156,27 @@ class MissionDecoder:
         """Organize all commands (position and custom) by keyframe"""
         if not self.mission_data:
             return
-            
-        max_frames = 0
-        # Find maximum number of frames
-        for drone_data in self.mission_data['drones'].values():
-            max_frames = max(max_frames, len(drone_data['frames']))
-            
+
+        # Position commands of each drone, one per frame
+        payloads = {drone_id: mtl_payloads(drone_data['frames'])
+                    for drone_id, drone_data in self.mission_data['drones'].items()}
+        max_frames = max((len(drone_payloads) for drone_payloads in payloads.values()), default=0)
+
         # Convert custom commands list to dict for easier access
         custom_commands_dict = {}
         if 'customCommands' in self.mission_data:
             for frame_idx, commands in self.mission_data['customCommands']:
                 custom_commands_dict[frame_idx] = commands
-        
+
+        delays = self.get_frame_delays(max_frames)
+
         # Organize commands frame by frame
         self.commands_queue = []
         for frame_idx in range(max_frames):
-            frame_commands = []
-            
-            # Add position commands for each drone
-            for drone_id, drone_data in self.mission_data['drones'].items():
-                if frame_idx < len(drone_data['frames']):
-                    frame = drone_data['frames'][frame_idx]
-                    # Create MTL (Move To Location) command
-                    mtl_cmd = {
-                        'target': drone_id,
-                        'command': 'MTL',
-                        'payload': f"{frame['position']['x']},{frame['position']['z']},{frame['heading']}"
-                    }
-                    frame_commands.append(mtl_cmd)
-            
+            frame_commands = [{'target': drone_id, 'command': 'MTL', 'payload': drone_payloads[frame_idx]}
+                              for drone_id, drone_payloads in payloads.items()
+                              if frame_idx < len(drone_payloads)]
+
             # Add custom commands for this frame
             if frame_idx in custom_commands_dict:
                 for cmd in custom_commands_dict[frame_idx]:
@@ -62,17 +186,40 @@ class MissionDecoder:
                         'payload': cmd['payload']
                     }
                     frame_commands.append(command)
-            
-            # Get frame delay
-            delay = self.mission_data['drones']['MCU']['frames'][frame_idx]['delay'] if frame_idx < len(self.mission_data['drones']['MCU']['frames']) else 1000
-            
+
             # Add frame commands and delay to queue
             self.commands_queue.append({
                 'frame_index': frame_idx,
                 'commands': frame_commands,
-                'delay': delay
+                'delay': delays[frame_idx]
             })
-    
+
+    def get_frame_delay(self, frame_idx):
+        """Delay after a frame in ms, preferring the mission-wide frameDelays list"""
+        frame_delays = self.mission_data.get('frameDelays') or []
+        if frame_idx < len(frame_delays) and frame_delays[frame_idx]:
+            return frame_delays[frame_idx]
+        lead = self.mission_data['drones'].get('MCU') or next(iter(self.mission_data['drones'].values()))
+        if frame_idx < len(lead['frames']):
+            return lead['frames'][frame_idx].get('delay', 1000)
+        return 1000
+
+    def get_frame_delays(self, count):
+        """``get_frame_delay`` of the first ``count`` frames, reading the lead drone's delays at once"""
+        if not count:
+            return []
+        frame_delays = self.mission_data.get('frameDelays') or []
+        lead = self.mission_data['drones'].get('MCU') or next(iter(self.mission_data['drones'].values()))
+        frames = lead['frames']
+        if isinstance(frames, FrameView):
+            lead_delays = [frames[k].get('delay', 1000) if delay is None else delay
+                           for k, delay in enumerate(frames.column_values('delay'))]
+        else:
+            lead_delays = [frame.get('delay', 1000) for frame in frames]
+        return [frame_delays[k] if k < len(frame_delays) and frame_delays[k]
+                else lead_delays[k] if k < len(lead_delays) else 1000
+                for k in range(count)]
+
     def get_next_frame_commands(self):
         """Get commands for next frame"""
         if self.current_frame < len(self.commands_queue):
@@ -87,8 +234,14 @@ class MissionDecoder:
     
     def format_command(self, cmd):
         """Format command into ESP-NOW protocol string"""
-        return f"{{T:{cmd['target']};C:{cmd['command']};P:{cmd['payload']}}}"
+        return format_command(cmd)
     
+    def get_compiled_mission(self):
+        """Send-ready plan of the loaded mission"""
+        if self.compiled is None and self.mission_data:
+            self.compiled = CompiledMission(self.mission_data, self.commands_queue)
+        return self.compiled
+
     def get_total_frames(self):
         """Get total number of frames in mission"""
         return len(self.commands_queue) if self.commands_queue else 0
@@ -122,11 +275,11 @@ class MissionDecoder:
     
     def get_available_missions(self):
         """Get list of available mission files from Missions directory"""
-        missions_dir = os.path.join(os.getcwd(), 'Missions')
+        missions_dir = MISSIONS_DIR
         missions = []
         if os.path.exists(missions_dir):
             for file in os.listdir(missions_dir):
-                if file.endswith('.json'):
+                if file.endswith(MISSION_EXTENSIONS):
                     missions.append({
                         'name': file,
                         'path': os.path.join(missions_dir, file)
@@ -0,0 +1,235 @@
+import time
+from collections import deque
+from threading import Thread, Condition, current_thread
+
+IDLE = 'idle'
+READY = 'ready'
+RUNNING = 'running'
+PAUSED = 'paused'
+COMPLETED = 'completed'
+STOPPED = 'stopped'
+
+
+class MissionExecutor:
+    """Play a decoded mission from a server thread on a drift-free schedule.
+
+    Frame ``k`` is due at ``start + sum(delay[0:k])`` on the monotonic clock,
+    so late frames never push the rest of the mission back. All commands of
+    a frame are handed to ``send`` as one batch. Pausing and seeking move the
+    schedule's origin instead of sleeping relative to the previous frame (the
+    first frame after a start or seek is sent in full), and
+    stopping wakes the thread at once so LAND goes out without waiting for
+    the current frame delay. The lateness of every frame is recorded.
+
+    With a ``TrajectoryResampler`` the keyframe MTLs are replaced by its
+    setpoint stream, which is pulled lazily and scheduled on the same clock
+    between the keyframes' other commands.
+    """
+
+    def __init__(self, send, history=1000):
+        self.send = send
+        self.decoder = None
+        self.mission_name = None
+        self.plan = None
+        self.frames = []
+        self.resync = False  # Next frame must be sent in full, not as a delta
+        self.offsets = []  # seconds from mission start to each frame, then to the end
+        self.state = IDLE
+        self.frame_index = 0
+        self.origin = 0.0
+        self.paused_at = None
+        self.last_commands = []
+        self.timing_errors = deque(maxlen=history)  # (frame_index, seconds late)
+        self.cond = Condition()
+        self.thread = None
+        self.generation = 0  # Lets a superseded playback thread notice and exit
+        self.resampler = None
+        self.frame_lines = []
+        self.setpoints = None  # Iterator of (seconds, lines) from the resampler
+        self.next_setpoint = None
+        self.setpoints_sent = 0
+
+    def load(self, decoder, mission_name=None, resampler=None):
+        """Prepare a loaded MissionDecoder for playback, optionally resampled"""
+        self.stop(land=False)
+        with self.cond:
+            self.decoder = decoder
+            self.mission_name = mission_name
+            self.plan = decoder.get_compiled_mission()
+            self.frames = self.plan.frames
+            self.resampler = resampler
+            self.frame_lines = [self._keyframe_lines(frame['lines']) for frame in self.frames]
+            self.setpoints = None
+            self.resync = True
+            self.offsets = []
+            elapsed = 0.0
+            for frame in self.frames:
+                self.offsets.append(elapsed)
+                elapsed += frame['delay'] / 1000.0
+            self.offsets.append(elapsed)
+            self.frame_index = 0
+            self.last_commands = []
+            self.timing_errors.clear()
+            self.state = READY
+
+    def start(self, frame_index=0):
+        """Start playing from ``frame_index``"""
+        with self.cond:
+            if self.decoder is None:
+                raise ValueError("No mission loaded")
+            if self.state in (RUNNING, PAUSED):
+                raise ValueError("Mission already running")
+            self._check_frame(frame_index)
+            self.frame_index = frame_index
+            self.origin = time.monotonic() - self.offsets[frame_index]
+            self.resync = True
+            self._restart_setpoints(frame_index)
+            self.setpoints_sent = 0
+            self.paused_at = None
+            self.timing_errors.clear()
+            self.state = RUNNING
+            self.generation += 1
+            self.thread = Thread(target=self._run, args=(self.generation,), name="mission-executor", daemon=True)
+            self.thread.start()
+
+    def pause(self):
+        """Hold the mission before its next frame"""
+        with self.cond:
+            if self.state != RUNNING:
+                raise ValueError("Mission is not running")
+            self.state = PAUSED
+            self.paused_at = time.monotonic()
+            self.cond.notify_all()
+
+    def resume(self):
+        """Continue a paused mission with the original frame spacing"""
+        with self.cond:
+            if self.state != PAUSED:
+                raise ValueError("Mission is not paused")
+            self.origin += time.monotonic() - self.paused_at
+            self.paused_at = None
+            self.state = RUNNING
+            self.cond.notify_all()
+
+    def seek(self, frame_index):
+        """Jump to ``frame_index``; it is sent immediately if the mission is running"""
+        with self.cond:
+            if self.decoder is None:
+                raise ValueError("No mission loaded")
+            self._check_frame(frame_index)
+            now = time.monotonic()
+            self.frame_index = frame_index
+            self.origin = now - self.offsets[frame_index]
+            self.resync = True
+            self._restart_setpoints(frame_index)
+            if self.state == PAUSED:
+                self.paused_at = now
+            self.cond.notify_all()
+
+    def stop(self, land=True):
+        """Stop playback and, if ``land`` is set, send LAND to every drone"""
+        with self.cond:
+            thread = self.thread
+            if self.state in (RUNNING, PAUSED):
+                self.state = STOPPED
+            self.cond.notify_all()
+        if thread and thread is not current_thread():
+            thread.join(timeout=2.0)
+        if land and self.decoder is not None:
+            land_commands = self.decoder.stop_mission()
+            self.send([self.decoder.format_command(cmd) for cmd in land_commands])
+
+    def _keyframe_lines(self, lines):
+        if self.resampler is None:
+            return tuple(lines)
+        # Motion comes from the resampled setpoints instead
+        return tuple(line for line in lines if ';C:MTL;' not in line)
+
+    def _restart_setpoints(self, frame_index):
+        self.next_setpoint = None
+        self.setpoints = self.resampler.commands(self.offsets[frame_index]) if self.resampler else None
+
+    def _peek_setpoint(self):
+        if self.next_setpoint is None and self.setpoints is not None:
+            self.next_setpoint = next(self.setpoints, None)
+            if self.next_setpoint is None:
+                self.setpoints = None
+        return self.next_setpoint
+
+    def _check_frame(self, frame_index):
+        if not 0 <= frame_index < len(self.frames):
+            raise ValueError(f"Frame {frame_index} out of range (0-{len(self.frames) - 1})")
+
+    def _run(self, generation):
+        while True:
+            with self.cond:
+                while self.state == PAUSED and self.generation == generation:
+                    self.cond.wait()
+                if self.state != RUNNING or self.generation != generation:
+                    return
+                index = self.frame_index
+                deadline = self.origin + self.offsets[index]
+                setpoint = self._peek_setpoint()
+                if setpoint and self.origin + setpoint[0] < deadline:
+                    deadline = self.origin + setpoint[0]
+                else:
+                    setpoint = None
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    # Woken early by pause/seek/stop; re-evaluate either way
+                    self.cond.wait(remaining)
+                    continue
+                if setpoint:
+                    self.next_setpoint = None
+                    self.setpoints_sent += 1
+                    lines = setpoint[1]
+                elif index >= len(self.frames):
+                    # The last frame's delay has run out
+                    self.state = COMPLETED
+                    return
+                else:
+                    self.frame_index = index + 1
+                    if self.resync:
+                        # Drones may not hold the targets the deltas assume
+                        lines = self._keyframe_lines(self.plan.full_lines(index))
+                        self.resync = False
+                    else:
+                        lines = list(self.frame_lines[index])
+
+            sent_at = time.monotonic()
+            if lines:
+                try:
+                    self.send(lines)
+                except Exception as e:
+                    print(f"Error sending mission frame {index}: {e}")
+            if setpoint:
+                continue
+            with self.cond:
+                self.last_commands = self.plan.commands_queue[index]['commands']
+                self.timing_errors.append((index, sent_at - deadline))
+
+    def status(self):
+        """Playback state and per-frame timing error (in milliseconds)"""
+        with self.cond:
+            errors = [error for _, error in self.timing_errors]
+            return {
+                'mission': self.mission_name,
+                'state': self.state,
+                'frame': self.frame_index,
+                'total_frames': len(self.frames),
+                'elapsed': (self.paused_at or time.monotonic()) - self.origin if self.state in (RUNNING, PAUSED) else None,
+                'duration': self.offsets[-1] if self.offsets else 0,
+                'commands': self.last_commands,
+                'resampling': {
+                    'method': self.resampler.method,
+                    'rate': self.resampler.rate,
+                    'setpoints_sent': self.setpoints_sent,
+                } if self.resampler else None,
+                'timing': {
+                    'frames': len(errors),
+                    'last_ms': errors[-1] * 1000 if errors else None,
+                    'mean_ms': sum(errors) / len(errors) * 1000 if errors else None,
+                    'max_ms': max(errors) * 1000 if errors else None,
+                    'recent': [(index, round(error * 1000, 3)) for index, error in list(self.timing_errors)[-20:]],
+                },
+            }
@@ -0,0 +1,306 @@
+import argparse
+import json
+import math
+import os
+import struct
+from collections.abc import Sequence
+
+import numpy as np
+
+# Binary missions: MAGIC, a little-endian uint32 header length, the JSON
+# header, padding to ALIGNMENT, then one (frames, columns) array per drone,
+# each starting on an 8-byte boundary
+MAGIC = b'MSNCOL01'
+EXTENSION = '.mbin'
+ALIGNMENT = 64
+VERSION = 2  # Version 1 had one dtype for the whole file
+COLUMNS = ('x', 'y', 'z', 'dx', 'dy', 'heading', 'delay')
+POSITION_COLUMNS = ('x', 'y', 'z')
+FRAME_COLUMNS = ('dx', 'dy', 'heading', 'delay')
+MISSION_EXTENSIONS = ('.json', EXTENSION)
+
+INT, FLOAT, AUTO = 'int', 'float', 'auto'
+NUMBER_TYPES = (int, float)  # bool is deliberately not one of them
+
+
+def is_binary_mission(path):
+    return path.endswith(EXTENSION)
+
+
+def _auto_number(value):
+    return int(value) if value.is_integer() else value
+
+
+# How a stored float turns back into the JSON number it came from
+RESTORE = {INT: int, FLOAT: float, AUTO: _auto_number}
+
+
+class FrameView(Sequence):
+    """Read-only list of a drone's frames backed by a memory-mapped array.
+
+    Frames are built as dicts only when indexed, so slicing a range reads
+    just those rows from disk. ``columns`` and ``column_values`` hand out
+    whole columns for vectorized consumers.
+    """
+
+    def __init__(self, rows, kinds, extras):
+        self.rows = rows
+        self.kinds = kinds  # column -> INT, FLOAT or AUTO
+        self.extras = extras  # frame index -> non-column data of that frame
+        self.position_restore = [(axis, RESTORE[kinds[axis]]) for axis in POSITION_COLUMNS]
+        self.frame_restore = [(name, RESTORE[kinds[name]]) for name in FRAME_COLUMNS]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self.rows))
+            values = self.rows[start:stop:step].tolist()
+            return [self._frame(k, row) for k, row in zip(range(start, stop, step), values)]
+        if index < 0:
+            index += len(self.rows)
+        if not 0 <= index < len(self.rows):
+            raise IndexError("frame index out of range")
+        return self._frame(index, self.rows[index].tolist())
+
+    def __iter__(self):
+        # Convert in blocks; one row at a time is slow and all at once defeats the map
+        for start in range(0, len(self.rows), 1024):
+            yield from self[start:start + 1024]
+
+    def _frame(self, index, row):
+        # NaN marks a value the frame did not have (NaN != NaN)
+        position = {axis: restore(value) for (axis, restore), value in zip(self.position_restore, row)
+                    if value == value}
+        frame = {}
+        extra = self.extras.get(str(index)) if self.extras else None
+        if extra is None:
+            if position:
+                frame['position'] = position
+            for (name, restore), value in zip(self.frame_restore, row[3:]):
+                if value == value:
+                    frame[name] = restore(value)
+            return frame
+        if 'position' in extra:
+            if isinstance(extra['position'], dict):
+                position.update(extra['position'])
+            else:
+                position = extra['position']
+        if position or 'position' in extra:
+            frame['position'] = position
+        for (name, restore), value in zip(self.frame_restore, row[3:]):
+            if value == value:
+                frame[name] = restore(value)
+        for key, value in extra.items():
+            if key != 'position':
+                frame[key] = value
+        return frame
+
+    def columns(self, names, start=0, stop=None):
+        """``(frames, len(names))`` float array of the given columns"""
+        indexes = [COLUMNS.index(name) for name in names]
+        return np.asarray(self.rows[start:stop, indexes], dtype=float)
+
+    def column_values(self, name):
+        """One column as the JSON numbers it came from; None where a frame keeps it elsewhere"""
+        restore = RESTORE[self.kinds[name]]
+        return [restore(value) if value == value else None
+                for value in self.rows[:, COLUMNS.index(name)].tolist()]
+
+
+def _split_frame(frame):
+    """Column values (NaN where absent) and the rest of a frame"""
+    try:
+        # Nearly every frame is exactly the columns, so try that first
+        position = frame['position']
+        values = [position['x'], position['y'], position['z'],
+                  frame['dx'], frame['dy'], frame['heading'], frame['delay']]
+        if (len(frame) == 5 and len(position) == 3
+                and all(type(value) in NUMBER_TYPES for value in values)):
+            return values, None
+    except (KeyError, TypeError):
+        pass
+    values = [math.nan] * len(COLUMNS)
+    extra = {}
+    position = frame.get('position')
+    if 'position' in frame:
+        if isinstance(position, dict):
+            other = {}
+            for key, value in position.items():
+                if key in POSITION_COLUMNS and type(value) in NUMBER_TYPES:
+                    values[COLUMNS.index(key)] = value
+                else:
+                    other[key] = value
+            if other or not position:
+                extra['position'] = other
+        else:
+            extra['position'] = position
+    for key, value in frame.items():
+        if key == 'position':
+            continue
+        if key in FRAME_COLUMNS and type(value) in NUMBER_TYPES:
+            values[COLUMNS.index(key)] = value
+        else:
+            extra[key] = value
+    return values, extra
+
+
+def _column_kinds(frames_values):
+    kinds = {}
+    for i, name in enumerate(COLUMNS):
+        types = {type(values[i]) for values in frames_values if not math.isnan(values[i])}
+        kinds[name] = INT if types == {int} else FLOAT if types == {float} else AUTO
+    return kinds
+
+
+def _fits_float32(array):
+    narrow = array.astype(np.float32).astype(np.float64)
+    return np.array_equal(narrow, array, equal_nan=True)
+
+
+def write_binary_mission(mission_data, path):
+    """Write ``mission_data`` as a binary mission.
+
+    A drone's columns are float32 when every one of its values survives the
+    round trip exactly, otherwise float64, so conversion never loses
+    precision and one precise drone does not double the size of the rest.
+    """
+    drones = mission_data['drones']
+    mission = {key: value for key, value in mission_data.items() if key != 'drones'}
+    mission['drones'] = {drone_id: {key: value for key, value in drone.items() if key != 'frames'}
+                         for drone_id, drone in drones.items()}
+
+    entries = []
+    arrays = []
+    for drone_id, drone in drones.items():
+        frames_values = []
+        extras = {}
+        for index, frame in enumerate(drone.get('frames', [])):
+            values, extra = _split_frame(frame)
+            frames_values.append(values)
+            if extra:
+                extras[str(index)] = extra
+        kinds = _column_kinds(frames_values)
+        for i, name in enumerate(COLUMNS):
+            if kinds[name] != AUTO:
+                continue
+            # Mixed columns restore whole numbers as ints; keep the floats among them aside
+            for index, values in enumerate(frames_values):
+                value = values[i]
+                if type(value) is float and value.is_integer():
+                    extra = extras.setdefault(str(index), {})
+                    if name in POSITION_COLUMNS:
+                        extra.setdefault('position', {})[name] = value
+                    else:
+                        extra[name] = value
+                    values[i] = math.nan
+        arrays.append(np.array(frames_values, dtype=np.float64).reshape(len(frames_values), len(COLUMNS)))
+        entries.append({'id': drone_id, 'frames': len(frames_values), 'has_frames': 'frames' in drone,
+                        'kinds': kinds, 'extras': extras})
+
+    offset = 0
+    for entry, array in zip(entries, arrays):
+        entry['dtype'] = '<f4' if _fits_float32(array) else '<f8'
+        entry['offset'] = offset = -(-offset // 8) * 8
+        offset += array.size * np.dtype(entry['dtype']).itemsize
+    header = json.dumps({'version': VERSION, 'columns': COLUMNS,
+                         'mission': mission, 'drones': entries}).encode('utf-8')
+    data_start = -(-(len(MAGIC) + 4 + len(header)) // ALIGNMENT) * ALIGNMENT
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        f.write(b'\0' * (data_start - len(MAGIC) - 4 - len(header)))
+        for entry, array in zip(entries, arrays):
+            f.write(b'\0' * (data_start + entry['offset'] - f.tell()))
+            f.write(array.astype(entry['dtype']).tobytes())
+    os.replace(tmp_path, path)
+
+
+def read_binary_mission(path):
+    """Mission data of a binary mission; each drone's ``frames`` is a memory-mapped ``FrameView``"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a binary mission: {path}")
+        header_length, = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(header_length).decode('utf-8'))
+    if header.get('version') not in (1, VERSION) or tuple(header['columns']) != COLUMNS:
+        raise ValueError(f"Unsupported binary mission format: {path}")
+    data_start = -(-(len(MAGIC) + 4 + header_length) // ALIGNMENT) * ALIGNMENT
+    size = os.path.getsize(path) - data_start
+    data = np.memmap(path, dtype=np.uint8, mode='r', offset=data_start, shape=(size,)) if size > 0 else None
+
+    mission_data = header['mission']
+    for entry in header['drones']:
+        drone = mission_data['drones'][entry['id']]
+        if not entry['has_frames']:
+            continue
+        if entry['frames']:
+            dtype = np.dtype(entry.get('dtype', header.get('dtype')))
+            end = entry['offset'] + entry['frames'] * len(COLUMNS) * dtype.itemsize
+            rows = data[entry['offset']:end].view(dtype).reshape(entry['frames'], len(COLUMNS))
+        else:
+            rows = np.zeros((0, len(COLUMNS)))
+        drone['frames'] = FrameView(rows, entry['kinds'], entry['extras'])
+    return mission_data
+
+
+def read_mission(path):
+    """Mission data of a JSON or binary mission file"""
+    if is_binary_mission(path):
+        return read_binary_mission(path)
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def materialize(mission_data):
+    """Plain JSON-ready copy of mission data, with every frame read"""
+    data = dict(mission_data)
+    data['drones'] = {}
+    for drone_id, drone in mission_data['drones'].items():
+        drone = dict(drone)
+        if 'frames' in drone:
+            drone['frames'] = list(drone['frames'])
+        data['drones'][drone_id] = drone
+    return data
+
+
+def convert(source, target=None):
+    """Convert a mission between JSON and binary and check nothing was lost; the target path"""
+    base, extension = os.path.splitext(source)
+    if target is None:
+        target = base + ('.json' if extension == EXTENSION else EXTENSION)
+    original = read_mission(source)
+    if is_binary_mission(target):
+        write_binary_mission(original, target)
+    else:
+        tmp_path = target + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(materialize(original), f, indent=2)
+        os.replace(tmp_path, target)
+
+    expected = json.dumps(materialize(original), sort_keys=True)
+    if json.dumps(materialize(read_mission(target)), sort_keys=True) != expected:
+        os.remove(target)
+        raise ValueError(f"Converting {source} would not be lossless")
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert missions between JSON and the binary columnar format")
+    parser.add_argument('missions', nargs='+', help="Mission files (.json or .mbin)")
+    parser.add_argument('--output', '-o', help="Target file (only with a single mission)")
+    args = parser.parse_args()
+    if args.output and len(args.missions) > 1:
+        parser.error("--output needs a single mission")
+
+    for source in args.missions:
+        target = convert(source, args.output)
+        print(f"{source} -> {target} ({os.path.getsize(source)} -> {os.path.getsize(target)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
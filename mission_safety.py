@@ -0,0 +1,229 @@
+import time
+
+import numpy as np
+
+from mission_decoder import MissionDecoder
+from mission_format import FrameView
+
+DEFAULT_LIMITS = {
+    'min_separation': 0.5,  # m, between any two drones at any time
+    'max_speed': 10.0,  # m/s
+    'max_accel': 10.0,  # m/s^2
+    'min_altitude': 0.0,  # m
+    'max_altitude': 120.0,  # m
+    'geofence_radius': None,  # m from the origin, horizontal
+    'geofence_box': None,  # {'x': [min, max], 'y': [min, max]}
+}
+
+# Elements per separation batch (pairs x segments); bounds peak memory
+CHUNK_ELEMENTS = 1 << 20
+# Segments per bounding box when culling far-apart pairs
+SEPARATION_CHUNK = 64
+# Slack on the box test for single precision rounding (m)
+CULL_MARGIN = 1e-3
+MAX_REPORTS = 200
+
+
+def mission_arrays(mission_data):
+    """Mission as ``(drone_ids, positions, active, delays)`` arrays.
+
+    ``positions`` has shape (drones, frames, 3). Drones with fewer frames
+    hold their last position; ``active`` marks the frames they really
+    have. ``delays`` holds the seconds from each frame to the next, as the
+    executor plays them.
+    """
+    drones = mission_data['drones']
+    drone_ids = list(drones)
+    frame_count = max((len(drone['frames']) for drone in drones.values()), default=0)
+    positions = np.zeros((len(drone_ids), frame_count, 3))
+    active = np.zeros((len(drone_ids), frame_count), dtype=bool)
+    for i, drone_id in enumerate(drone_ids):
+        frames = drones[drone_id]['frames']
+        if not frames:
+            continue
+        count = len(frames)
+        if isinstance(frames, FrameView):
+            positions[i, :count] = frames.columns(('x', 'y', 'z'))
+            positions[i, count:] = positions[i, count - 1]
+            active[i, :count] = True
+            continue
+        flat = np.fromiter(
+            (frame['position'][axis] for frame in frames for axis in ('x', 'y', 'z')),
+            dtype=float, count=count * 3)
+        positions[i, :count] = flat.reshape(count, 3)
+        positions[i, count:] = positions[i, count - 1]
+        active[i, :count] = True
+
+    decoder = MissionDecoder()
+    decoder.mission_data = mission_data
+    delays = np.array(decoder.get_frame_delays(frame_count), dtype=float) / 1000.0
+    return drone_ids, positions, active, delays
+
+
+def _number(value):
+    """JSON-safe float; infinity (a move with no time for it) becomes None"""
+    value = float(value)
+    return round(value, 3) if np.isfinite(value) else None
+
+
+def _report(kind, frames, values, label, limit):
+    """Violation count of one kind and the worst ``MAX_REPORTS`` of them.
+
+    ``label(k)`` names the drone or pair of the k-th violation; it is only
+    called for the ones reported.
+    """
+    order = np.argsort(values if kind == 'separation' else -values)[:MAX_REPORTS]
+    return {
+        'total': len(values),
+        'worst': [{'frame': int(frames[k]), 'drones': label(k), 'value': _number(values[k]), 'limit': limit}
+                  for k in order],
+    }
+
+
+def check_separation(drone_ids, positions, min_separation):
+    """Closest approach of every drone pair along the straight paths between frames.
+
+    Each pair's relative position moves linearly over a segment, so its
+    minimum distance has a closed form. Paths are boxed per chunk of
+    ``SEPARATION_CHUNK`` segments; only pairs whose boxes come within the
+    limit (or the closest approach found so far) are solved, so drones
+    that stay apart cost next to nothing. Returns ``(violations, closest)``.
+    """
+    drone_count, frame_count, _ = positions.shape
+    if drone_count < 2 or frame_count == 0:
+        return _report('separation', np.zeros(0), np.zeros(0), None, min_separation), None
+    # The final position is held, so it gets a segment of its own. Single
+    # precision is ample for metre-scale distances and halves memory traffic.
+    path = np.concatenate([positions, positions[:, -1:]], axis=1).astype(np.float32)
+    start = path[:, :-1]
+    motion = path[:, 1:] - start
+    first, second = np.triu_indices(drone_count, 1)
+
+    # Box of each drone's path over each chunk, end points included
+    chunk_starts = np.arange(0, frame_count, SEPARATION_CHUNK)
+    chunk_ends = np.minimum(chunk_starts + SEPARATION_CHUNK, frame_count)
+    low = np.minimum(np.minimum.reduceat(path, chunk_starts, axis=1), path[:, chunk_ends])
+    high = np.maximum(np.maximum.reduceat(path, chunk_starts, axis=1), path[:, chunk_ends])
+    pair_batch = max(1, CHUNK_ELEMENTS // SEPARATION_CHUNK)
+
+    hit_frames, hit_pairs, hit_values = [], [], []
+    best = (np.inf, 0, 0)
+    for c, (lo, hi) in enumerate(zip(chunk_starts, chunk_ends)):
+        # The gap between two boxes is a lower bound on the pair's distance
+        gap = np.maximum(np.maximum(low[first, c] - high[second, c], low[second, c] - high[first, c]), 0)
+        gap = np.sqrt(np.einsum('px,px->p', gap, gap))
+        near = np.nonzero(gap < max(min_separation, best[0]) + CULL_MARGIN)[0]
+        for batch in range(0, len(near), pair_batch):
+            candidates = near[batch:batch + pair_batch]
+            a, b = first[candidates], second[candidates]
+            offset = start[a, lo:hi] - start[b, lo:hi]  # (pairs, segments, 3)
+            relative = motion[a, lo:hi] - motion[b, lo:hi]
+            moved = np.einsum('psx,psx->ps', relative, relative)
+            along = -np.einsum('psx,psx->ps', offset, relative)
+            fraction = np.clip(np.divide(along, moved, out=np.zeros_like(along), where=moved > 0), 0.0, 1.0)
+            closest = offset + relative * fraction[..., None]
+            distance = np.sqrt(np.einsum('psx,psx->ps', closest, closest))
+
+            pair, segment = np.unravel_index(np.argmin(distance), distance.shape)
+            if distance[pair, segment] < best[0]:
+                best = (float(distance[pair, segment]), lo + segment, candidates[pair])
+            pairs, segments = np.nonzero(distance < min_separation)
+            hit_frames.append(segments + lo)
+            hit_pairs.append(candidates[pairs])
+            hit_values.append(distance[pairs, segments].astype(float))
+
+    frames = np.concatenate(hit_frames)
+    pairs = np.concatenate(hit_pairs)
+    closest = {'distance': round(best[0], 3), 'frame': int(best[1]),
+               'drones': [drone_ids[first[best[2]]], drone_ids[second[best[2]]]]}
+    label = lambda k: [drone_ids[first[pairs[k]]], drone_ids[second[pairs[k]]]]
+    return _report('separation', frames, np.concatenate(hit_values), label, min_separation), closest
+
+
+def check_kinematics(drone_ids, positions, delays, max_speed, max_accel):
+    """Speed of every drone over each segment and acceleration between segments"""
+    frame_count = positions.shape[1]
+    if frame_count < 2:
+        empty = np.zeros(0)
+        return (_report('speed', empty, empty, None, max_speed), _report('accel', empty, empty, None, max_accel),
+                0.0, 0.0)
+    seconds = delays[:frame_count - 1]
+    motion = np.diff(positions, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # A move with no time to make it is infinitely fast
+        velocity = motion / seconds[None, :, None]
+        velocity[:, seconds <= 0] = np.where(motion[:, seconds <= 0] == 0, 0.0, np.inf)
+        speed = np.linalg.norm(velocity, axis=2)
+        accel = np.linalg.norm(np.diff(velocity, axis=1), axis=2) / ((seconds[:-1] + seconds[1:]) / 2)[None, :]
+    accel = np.nan_to_num(accel, nan=0.0, posinf=np.inf)
+
+    drones, segments = np.nonzero(speed > max_speed)
+    speed_hits = _report('speed', segments, speed[drones, segments], lambda k, d=drones: drone_ids[d[k]], max_speed)
+    drones, segments = np.nonzero(accel > max_accel)
+    accel_hits = _report('accel', segments + 1, accel[drones, segments], lambda k, d=drones: drone_ids[d[k]],
+                         max_accel)
+    return speed_hits, accel_hits, _number(speed.max()), _number(accel.max()) if accel.size else 0.0
+
+
+def check_bounds(drone_ids, positions, active, limits):
+    """Altitude and geofence violations at the frames drones actually have"""
+    z = positions[:, :, 2]
+    altitude = active & ((z < limits['min_altitude']) | (z > limits['max_altitude']))
+    drones, frames = np.nonzero(altitude)
+    altitude_hits = _report('altitude', frames, z[drones, frames], lambda k, d=drones: drone_ids[d[k]],
+                            [limits['min_altitude'], limits['max_altitude']])
+
+    outside = np.zeros_like(active)
+    horizontal = np.hypot(positions[:, :, 0], positions[:, :, 1])
+    if limits.get('geofence_radius') is not None:
+        outside |= horizontal > limits['geofence_radius']
+    box = limits.get('geofence_box')
+    if box:
+        for axis, name in ((0, 'x'), (1, 'y')):
+            if name in box:
+                low, high = box[name]
+                outside |= (positions[:, :, axis] < low) | (positions[:, :, axis] > high)
+    drones, frames = np.nonzero(outside & active)
+    geofence_hits = _report('geofence', frames, horizontal[drones, frames], lambda k, d=drones: drone_ids[d[k]],
+                            limits.get('geofence_radius') or box)
+    return altitude_hits, geofence_hits
+
+
+def analyze_mission(mission_data, limits=None):
+    """Check a mission for separation, speed, acceleration, altitude and geofence violations.
+
+    Limits come from ``DEFAULT_LIMITS``, then the mission's
+    ``settings.safety``, then ``limits``. The report counts the violations
+    of each kind and lists the worst by frame and drone (or drone pair).
+    """
+    started = time.perf_counter()
+    merged = dict(DEFAULT_LIMITS)
+    merged.update((mission_data.get('settings') or {}).get('safety') or {})
+    merged.update(limits or {})
+
+    drone_ids, positions, active, delays = mission_arrays(mission_data)
+    separation, closest = check_separation(drone_ids, positions, merged['min_separation'])
+    speed, accel, top_speed, top_accel = check_kinematics(
+        drone_ids, positions, delays, merged['max_speed'], merged['max_accel'])
+    altitude, geofence = check_bounds(drone_ids, positions, active, merged)
+
+    violations = {
+        'separation': separation,
+        'speed': speed,
+        'accel': accel,
+        'altitude': altitude,
+        'geofence': geofence,
+    }
+    return {
+        'ok': not any(found['total'] for found in violations.values()),
+        'drones': len(drone_ids),
+        'frames': positions.shape[1],
+        'duration': float(delays.sum()),
+        'closest_approach': closest,
+        'max_speed': top_speed,
+        'max_accel': top_accel,
+        'counts': {kind: found['total'] for kind, found in violations.items()},
+        'violations': violations,
+        'limits': merged,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+    }
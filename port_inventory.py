@@ -0,0 +1,172 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, Lock, Event
+
+import serial
+import serial.tools.list_ports
+
+# USB-serial bridges found on ESP32 boards: CP210x, CH340/CH9102, FTDI and
+# the native USB of the S2/S3/C3
+ESP32_USB_IDS = {
+    (0x10C4, 0xEA60),
+    (0x1A86, 0x7523),
+    (0x1A86, 0x55D4),
+    (0x0403, 0x6001),
+    (0x0403, 0x6015),
+    (0x303A, 0x1001),
+    (0x303A, 0x0002),
+}
+
+VERIFY_COMMAND = "{T:GCS;C:SERIAL;P:HB}"
+
+
+def device_key(info):
+    """Identity of a physical device that survives it being re-enumerated"""
+    if info.serial_number:
+        return f"{info.vid}:{info.pid}:{info.serial_number}"
+    return info.hwid or info.device
+
+
+def handshake(port, command=VERIFY_COMMAND, timeout=1.0):
+    """Send ``command`` on an open port and wait for the dongle's OK.
+
+    Uses blocking reads bounded by the port timeout, so waiting costs no
+    CPU. Returns ``(verified, lines_received)``.
+    """
+    port.reset_input_buffer()
+    port.reset_output_buffer()
+    port.write(f"{command}\n".encode())
+    deadline = time.monotonic() + timeout
+    lines = []
+    while time.monotonic() < deadline:
+        line = port.readline().decode(errors='replace').strip()
+        if not line:
+            continue
+        lines.append(line)
+        if line == "OK":
+            return True, lines
+    return False, lines
+
+
+class PortInventory:
+    """Background list of serial ports with hotplug tracking.
+
+    A thread rescans the system ports every ``interval`` seconds and keeps
+    the result, so listing ports never touches the OS on a request.
+    ``on_change(added, removed)`` is called with device names whenever the
+    set of ports changes. Devices that have answered the handshake are
+    remembered by USB identity, so they are reported as verified again
+    when they come back, even under a different port name.
+    """
+
+    def __init__(self, on_change=None, interval=1.0, max_workers=8):
+        self.on_change = on_change
+        self.interval = interval
+        self.max_workers = max_workers
+        self.ports = {}  # device -> ListPortInfo
+        self.verified = set()  # device keys that answered OK
+        self.version = 0
+        self.scanned = False
+        self.lock = Lock()
+        self.thread = None
+        self._stop = Event()
+
+    def start(self):
+        """Start watching for port changes"""
+        if self.thread and self.thread.is_alive():
+            return
+        self._stop.clear()
+        self.thread = Thread(target=self._run, name="port-inventory", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=1.0):
+        """Stop watching"""
+        self._stop.set()
+        if self.thread:
+            self.thread.join(timeout=timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.scan()
+            except Exception as e:
+                print(f"Error scanning serial ports: {e}")
+            self._stop.wait(self.interval)
+
+    def scan(self):
+        """Rescan system ports; returns ``(added, removed)`` device names"""
+        current = {info.device: info for info in serial.tools.list_ports.comports()}
+        with self.lock:
+            added = sorted(set(current) - set(self.ports))
+            removed = sorted(set(self.ports) - set(current))
+            self.ports = current
+            self.scanned = True
+            if added or removed:
+                self.version += 1
+        if (added or removed) and self.on_change:
+            self.on_change(added, removed)
+        return added, removed
+
+    def list(self):
+        """JSON-ready description of every known port"""
+        if not self.scanned:
+            self.scan()
+        with self.lock:
+            return [self._describe(info) for _, info in sorted(self.ports.items())]
+
+    def _describe(self, info):
+        verified = device_key(info) in self.verified
+        return {
+            "port": info.device,
+            "description": info.description,
+            "hwid": info.hwid,
+            "vid": info.vid,
+            "pid": info.pid,
+            "serial_number": info.serial_number,
+            "is_esp32": verified or (info.vid, info.pid) in ESP32_USB_IDS,
+            "verified": verified,
+        }
+
+    def is_verified(self, device):
+        """Whether the device currently at ``device`` has answered before"""
+        with self.lock:
+            info = self.ports.get(device)
+            return (device_key(info) if info else device) in self.verified
+
+    def mark_verified(self, device, verified=True):
+        """Remember (or forget) the handshake result for ``device``"""
+        with self.lock:
+            info = self.ports.get(device)
+            key = device_key(info) if info else device
+            if verified:
+                self.verified.add(key)
+            else:
+                self.verified.discard(key)
+
+    def probe(self, device, command=VERIFY_COMMAND, timeout=1.0):
+        """Open ``device``, run the handshake and close it again"""
+        try:
+            with serial.Serial(device, 115200, timeout=min(0.1, timeout)) as port:
+                verified, _ = handshake(port, command, timeout)
+        except (serial.SerialException, OSError):
+            verified = False
+        self.mark_verified(device, verified)
+        return verified
+
+    def probe_all(self, devices=None, command=VERIFY_COMMAND, timeout=1.0, exclude=()):
+        """Probe many ports at once; returns ``{device: verified}``.
+
+        Without ``devices``, likely ESP32 bridges that are not verified yet
+        are probed. Ports in ``exclude`` (such as the connected one) are
+        left alone.
+        """
+        if devices is None:
+            candidates = [port for port in self.list()
+                          if port["is_esp32"] and not port["verified"]]
+            devices = [port["port"] for port in candidates]
+        devices = [device for device in devices if device not in exclude]
+        if not devices:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(devices))) as pool:
+            results = pool.map(lambda device: self.probe(device, command, timeout), devices)
+            return dict(zip(devices, results))
@@ -0,0 +1,215 @@
+import gzip
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from threading import Thread, Condition, current_thread
+
+from log_catalog import parse_time
+from log_index import LogIndex, TIMESTAMP_LEN, stamp_seconds
+
+PLAYING = 'playing'
+PAUSED = 'paused'
+FINISHED = 'finished'
+STOPPED = 'stopped'
+
+MIN_SPEED = 0.5
+MAX_SPEED = 50.0
+MAX_BATCH = 500  # Lines handed over at once when playback falls behind
+
+
+def check_speed(speed):
+    speed = float(speed)
+    if not MIN_SPEED <= speed <= MAX_SPEED:
+        raise ValueError(f"Speed must be between {MIN_SPEED}x and {MAX_SPEED}x")
+    return speed
+
+
+class ReplaySource:
+    """Play a recorded log back into the live pipeline in its original timing.
+
+    Stands in for the serial reader: lines are handed to
+    ``on_lines(lines, timestamp)`` in batches, stamped with the time they are
+    played. Line ``k`` is due at ``origin + (t[k] - t[0]) / speed`` on the
+    monotonic clock, so pausing, seeking and changing speed only move the
+    origin. Seeking goes through the log's ``LogIndex`` checkpoints, so
+    jumping deep into a long session reads at most one checkpoint's worth of
+    lines. Compressed logs are decompressed once into a temporary file so
+    they can be seeked as well.
+    """
+
+    def __init__(self, log_path, on_lines, speed=1.0):
+        self.log_path = log_path
+        self.on_lines = on_lines
+        self.speed = check_speed(speed)
+        self.spool_dir = None
+        path = log_path
+        if log_path.endswith('.gz'):
+            self.spool_dir = tempfile.mkdtemp(prefix='replay-')
+            path = os.path.join(self.spool_dir, os.path.basename(log_path)[:-3])
+            with gzip.open(log_path, 'rb') as src, open(path, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+        self.index = LogIndex(path)
+        self.index.refresh()
+        if not self.index.checkpoints:
+            self.close()
+            raise ValueError("Log has no timestamped lines")
+        self.dates = {}
+        self.start_time = stamp_seconds(self.index.checkpoints[0][2], self.dates)
+        self.duration = stamp_seconds(self.index.last_timestamp, self.dates) - self.start_time
+        self.file = open(path, 'rb')
+        self.state = PAUSED
+        self.position = 0.0  # log seconds of the last line played
+        self.pending = None  # (log seconds, line) read but not yet due
+        self.origin = 0.0
+        self.paused_at = time.monotonic()
+        self.lines_played = 0
+        self.cond = Condition()
+        self.thread = None
+        self.generation = 0
+
+    def start(self, position=0.0):
+        """Start playing from ``position`` seconds into the log"""
+        with self.cond:
+            if self.state == STOPPED:
+                raise ValueError("Replay has been stopped")
+            self._seek(position)
+            self.paused_at = None
+            self.state = PLAYING
+            self.generation += 1
+            self.thread = Thread(target=self._run, args=(self.generation,), name="log-replay", daemon=True)
+            self.thread.start()
+
+    def pause(self):
+        with self.cond:
+            if self.state != PLAYING:
+                raise ValueError("Replay is not playing")
+            self.state = PAUSED
+            self.paused_at = time.monotonic()
+            self.cond.notify_all()
+
+    def resume(self):
+        with self.cond:
+            if self.state != PAUSED:
+                raise ValueError("Replay is not paused")
+            self.origin += time.monotonic() - self.paused_at
+            self.paused_at = None
+            self.state = PLAYING
+            self.cond.notify_all()
+
+    def seek(self, position=None, timestamp=None):
+        """Jump to ``position`` seconds into the log or to a log ``timestamp``"""
+        with self.cond:
+            if self.state == STOPPED:
+                raise ValueError("Replay has been stopped")
+            if timestamp is not None:
+                position = parse_time(timestamp) - self.start_time
+            self._seek(float(position))
+            if self.state == FINISHED:
+                self.state = PAUSED
+            if self.state == PAUSED:
+                self.paused_at = time.monotonic()
+            self.cond.notify_all()
+
+    def set_speed(self, speed):
+        """Change speed without moving the playback position"""
+        with self.cond:
+            speed = check_speed(speed)
+            now = self.paused_at or time.monotonic()
+            self.origin = now - (now - self.origin) * self.speed / speed
+            self.speed = speed
+            self.cond.notify_all()
+
+    def stop(self):
+        """Stop playback and release the log"""
+        with self.cond:
+            thread = self.thread
+            self.state = STOPPED
+            self.cond.notify_all()
+        if thread and thread is not current_thread():
+            thread.join(timeout=2.0)
+        self.close()
+
+    def close(self):
+        if getattr(self, 'file', None):
+            self.file.close()
+            self.file = None
+        if self.spool_dir:
+            shutil.rmtree(self.spool_dir, ignore_errors=True)
+            self.spool_dir = None
+
+    def _seek(self, position):
+        if not 0 <= position <= self.duration:
+            raise ValueError(f"Position {position} out of range (0-{self.duration:.3f}s)")
+        stamp = datetime.fromtimestamp(self.start_time + position).strftime("%Y-%m-%d %H:%M:%S.%f")[:TIMESTAMP_LEN]
+        self.file.seek(self.index.offset_for_time(stamp))
+        self.pending = None
+        self.position = position
+        self.origin = time.monotonic() - position / self.speed
+
+    def _read_line(self):
+        """Next ``(log seconds, line)``, or None at the end of the log"""
+        while True:
+            raw = self.file.readline()
+            if not raw:
+                return None
+            if not raw.endswith(b'\n'):
+                # The log is still being written; leave the partial line for later
+                self.file.seek(-len(raw), os.SEEK_CUR)
+                return None
+            line = raw.decode('utf-8', errors='replace')
+            if line[:1] == '[' and line[TIMESTAMP_LEN + 1:TIMESTAMP_LEN + 3] == '] ':
+                try:
+                    seconds = stamp_seconds(line[1:TIMESTAMP_LEN + 1], self.dates) - self.start_time
+                except ValueError:
+                    continue
+                return seconds, line[TIMESTAMP_LEN + 3:].rstrip('\r\n')
+            # Headers such as "=== ESP Terminal Log Started ... ===" are not traffic
+
+    def _run(self, generation):
+        while True:
+            batch = []
+            with self.cond:
+                while True:
+                    while self.state in (PAUSED, FINISHED) and self.generation == generation:
+                        self.cond.wait()
+                    if self.state != PLAYING or self.generation != generation:
+                        return
+                    if self.pending is None:
+                        self.pending = self._read_line()
+                        if self.pending is None:
+                            self.state = FINISHED
+                            break
+                    seconds, line = self.pending
+                    remaining = self.origin + seconds / self.speed - time.monotonic()
+                    if remaining > 0:
+                        if batch:
+                            break
+                        # Woken early by pause/seek/speed/stop; re-evaluate either way
+                        self.cond.wait(remaining)
+                        continue
+                    batch.append(line)
+                    self.pending = None
+                    self.position = max(self.position, seconds)
+                    self.lines_played += 1
+                    if len(batch) >= MAX_BATCH:
+                        break
+            if batch:
+                try:
+                    self.on_lines(batch, datetime.now())
+                except Exception as e:
+                    print(f"Error replaying log lines: {e}")
+
+    def status(self):
+        with self.cond:
+            return {
+                'log': os.path.basename(self.log_path),
+                'state': self.state,
+                'speed': self.speed,
+                'position': round(self.position, 3),
+                'duration': round(self.duration, 3),
+                'timestamp': datetime.fromtimestamp(self.start_time + self.position)
+                                     .strftime("%Y-%m-%d %H:%M:%S.%f")[:TIMESTAMP_LEN],
+                'lines': self.lines_played,
+            }
@@ -2,274 +2,671 @@ import subprocess
 import time
 import serial
 import json
+import gzip
+from queue import Queue, Empty
 from threading import Thread, Lock
-from http.server import HTTPServer, SimpleHTTPRequestHandler
-import serial.tools.list_ports
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
 import os
+import sys
 from datetime import datetime
+from serial_io import PRIORITY_NAMES
+from connection_manager import ConnectionManager
+from port_inventory import PortInventory, handshake, VERIFY_COMMAND
+from telemetry_stream import TelemetryStream
+from static_cache import StaticCache
+from log_index import LogIndex
+from log_catalog import LogCatalog, compress_log, parse_time
+from telemetry import DroneStateTable, parse_frame
+from telemetry_poller import TelemetryPoller
+from mission_decoder import MissionDecoder
+from mission_executor import MissionExecutor
+from mission_catalog import MissionCatalog
+from mission_safety import analyze_mission
+from mission_format import is_binary_mission, read_binary_mission, materialize
+from metrics import REGISTRY
+from liveness import LivenessTable, heartbeat_sender, SUMMARY_PATTERN
+from replay import ReplaySource
+from trajectory import TrajectoryResampler, max_setpoint_rate, CUBIC
 
 # Get the directory containing run_app.py
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# Create logs directory if it doesn't exist
-LOGS_DIR = os.path.join(BASE_DIR, 'logs')
+# Create logs directory if it doesn't exist (ESP_LOGS_DIR moves it, e.g. for benchmarks)
+LOGS_DIR = os.environ.get('ESP_LOGS_DIR') or os.path.join(BASE_DIR, 'logs')
 os.makedirs(LOGS_DIR, exist_ok=True)
 
+LOG_LINES = REGISTRY.counter('gcs_log_lines_total', "Lines written to the session log")
+LOG_BYTES = REGISTRY.counter('gcs_log_bytes_total', "Bytes written to the session log")
+LOG_WRITE_SECONDS = REGISTRY.histogram('gcs_log_write_seconds', "Time to write (and flush) one batch to the log")
+LOG_QUEUE = REGISTRY.gauge('gcs_log_queue_depth', "Batches waiting for the log writer")
+LOG_FILES = REGISTRY.gauge('gcs_log_files', "Session logs kept outside the archive")
+LOG_DISK_BYTES = REGISTRY.gauge('gcs_log_disk_bytes', "Size of the session logs outside the archive")
+HTTP_SECONDS = REGISTRY.histogram('gcs_http_request_seconds', "HTTP request handling time", ['method', 'route'])
+COMMAND_QUEUE = REGISTRY.gauge('gcs_command_queue_depth', "Commands queued for a GCS link", ['port', 'priority'])
+TERMINAL_BUFFER = REGISTRY.gauge('gcs_terminal_buffer_lines', "Lines held for /esp-terminal clients")
+DRONES_SEEN = REGISTRY.gauge('gcs_drones_seen', "Drones that have sent anything")
+
+
 class LogbookManager:
-    def __init__(self):
+    """Write serial traffic to log files from a background writer thread.
+
+    ``log_data`` only timestamps lines and queues them, so disk latency never
+    stalls the serial reader. The writer drains the queue in batches through
+    one long-lived buffered handle, flushes on a size or time threshold and
+    rotates to a new file by size or age, gzip-compressing closed segments.
+    """
+
+    def __init__(self, flush_bytes=64 * 1024, flush_interval=1.0,
+                 max_log_bytes=50 * 1024 * 1024, max_log_seconds=6 * 3600):
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.max_log_bytes = max_log_bytes
+        self.max_log_seconds = max_log_seconds
         self.current_log_file = None
         self.log_lock = Lock()
+        self.log_queue = Queue()
+        self.log_handle = None
+        self.log_started = 0
+        self.log_bytes = 0
+        self.log_indexes = {}
+        self.index_lock = Lock()
+        self.catalog = LogCatalog(LOGS_DIR)
         self.start_new_log()
+        self.writer_thread = Thread(target=self._write_loop, name="log-writer", daemon=True)
+        self.writer_thread.start()
+        if self.catalog.retention_enabled():
+            Thread(target=self.enforce_retention, name="log-retention", daemon=True).start()
     
     def start_new_log(self):
         """Start a new log file with current timestamp"""
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        self.current_log_file = os.path.join(LOGS_DIR, f"esp_log_{timestamp}.txt")
-        with open(self.current_log_file, 'w') as f:
-            f.write(f"=== ESP Terminal Log Started at {timestamp} ===\n")
+        with self.log_lock:
+            if self.log_handle:
+                self.log_handle.close()
+            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            log_file = os.path.join(LOGS_DIR, f"esp_log_{timestamp}.txt")
+            suffix = 1
+            while os.path.exists(log_file) or os.path.exists(log_file + '.gz'):
+                log_file = os.path.join(LOGS_DIR, f"esp_log_{timestamp}_{suffix}.txt")
+                suffix += 1
+            self.current_log_file = log_file
+            self.log_handle = open(log_file, 'w', buffering=self.flush_bytes)
+            header = f"=== ESP Terminal Log Started at {timestamp} ===\n"
+            self.log_handle.write(header)
+            self.log_handle.flush()
+            self.log_started = time.monotonic()
+            self.log_bytes = len(header)
+            self.catalog.set_active(log_file)
     
-    def log_data(self, data):
-        """Log data with timestamp"""
+    def log_data(self, data, timestamp=None):
+        """Queue data for logging, stamped with the time it was read (defaults to now)"""
         if not data:
             return
-            
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-        with self.log_lock:
+        self.log_queue.put((timestamp or datetime.now(), data))
+
+    def close(self, timeout=2.0):
+        """Flush queued lines and close the current log file"""
+        self.log_queue.put(None)
+        self.writer_thread.join(timeout=timeout)
+
+    def _write_loop(self):
+        """Drain the log queue in batches until ``close`` is called"""
+        last_flush = time.monotonic()
+        unflushed = 0
+        running = True
+        while running:
             try:
-                with open(self.current_log_file, 'a') as f:
-                    if isinstance(data, list):
-                        for line in data:
-                            f.write(f"[{timestamp}] {line}\n")
-                    else:
-                        f.write(f"[{timestamp}] {data}\n")
+                items = [self.log_queue.get(timeout=self.flush_interval)]
+            except Empty:
+                items = []
+            # Take everything else that is already waiting in one go
+            while True:
+                try:
+                    items.append(self.log_queue.get_nowait())
+                except Empty:
+                    break
+
+            chunks = []
+            for item in items:
+                if item is None:
+                    running = False
+                    continue
+                timestamp, data = item
+                stamp = timestamp.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+                if isinstance(data, list):
+                    for line in data:
+                        chunks.append(f"[{stamp}] {line}\n")
+                else:
+                    chunks.append(f"[{stamp}] {data}\n")
+
+            try:
+                with self.log_lock:
+                    started = time.perf_counter()
+                    if chunks:
+                        text = ''.join(chunks)
+                        self.log_handle.write(text)
+                        self.log_bytes += len(text)
+                        unflushed += len(text)
+                        LOG_LINES.inc(len(chunks))
+                        LOG_BYTES.inc(len(text))
+                    now = time.monotonic()
+                    if unflushed and (not running or unflushed >= self.flush_bytes
+                                      or now - last_flush >= self.flush_interval):
+                        self.log_handle.flush()
+                        unflushed = 0
+                        last_flush = now
+                    if chunks:
+                        LOG_WRITE_SECONDS.observe(time.perf_counter() - started)
+                    rotate = running and (self.log_bytes >= self.max_log_bytes
+                                          or now - self.log_started >= self.max_log_seconds)
+                    if not running:
+                        self.log_handle.close()
+                        self.log_handle = None
             except Exception as e:
                 print(f"Error writing to log file: {e}")
-    
-    def get_log_files(self):
-        """Get list of all log files"""
-        try:
-            files = []
-            for file in os.listdir(LOGS_DIR):
-                if file.startswith("esp_log_") and file.endswith(".txt"):
-                    file_path = os.path.join(LOGS_DIR, file)
-                    files.append({
-                        "name": file,
-                        "path": file_path,
-                        "size": os.path.getsize(file_path),
-                        "date": datetime.fromtimestamp(os.path.getctime(file_path)).strftime("%Y-%m-%d %H:%M:%S")
-                    })
-            return sorted(files, key=lambda x: x["date"], reverse=True)
-        except Exception as e:
-            print(f"Error getting log files: {e}")
-            return []
+                continue
+
+            if rotate:
+                self.rotate_log()
+
+    def rotate_log(self):
+        """Close the current log, start a new one and compress the old segment"""
+        closed_log = self.current_log_file
+        self.start_new_log()
+        Thread(target=self._retire_log, args=(closed_log,), daemon=True).start()
+
+    def _retire_log(self, file_path):
+        """Compress a closed segment, then apply the retention policy if one is set"""
+        compress_log(file_path)
+        if self.catalog.retention_enabled():
+            self.enforce_retention()
+        else:
+            self.prune_log_indexes()
+
+    def enforce_retention(self):
+        """Apply the retention policy, then forget indexes of the logs it moved"""
+        result = self.catalog.enforce()
+        self.prune_log_indexes()
+        return result
+
+    def prune_log_indexes(self):
+        """Drop cached indexes of logs that were compressed, archived or deleted"""
+        with self.index_lock:
+            for file_path in [path for path in self.log_indexes if not os.path.exists(path)]:
+                del self.log_indexes[file_path]
     
     def get_log_content(self, file_name):
         """Get content of a specific log file"""
         try:
-            file_path = os.path.join(LOGS_DIR, file_name)
-            if not os.path.exists(file_path):
+            file_path = self.catalog.find(file_name)
+            if file_path is None:
                 return None
-            with open(file_path, 'r') as f:
+            opener = gzip.open if file_path.endswith('.gz') else open
+            with opener(file_path, 'rt') as f:
                 return f.read()
         except Exception as e:
             print(f"Error reading log file: {e}")
             return None
 
-def get_esp32_ports():
-    """List all available serial ports"""
-    print("Scanning for serial ports...")
-    ports = []
-    for port in serial.tools.list_ports.comports():
-        ports.append({
-            "port": port.device,
-            "description": port.description,
-            "hwid": port.hwid,
-            "is_esp32": False
-        })
-    return ports
+    def get_log_index(self, file_name):
+        """Get the (cached) index of a log file, or None if the log does not exist"""
+        file_path = self.catalog.find(file_name)
+        if file_path is None:
+            return None
+        with self.index_lock:
+            index = self.log_indexes.get(file_path)
+            if index is None:
+                index = self.log_indexes[file_path] = LogIndex(file_path)
+        return index
+
+# UI files may be cached by the browser but must be revalidated (ETag) on use
+STATIC_CACHE_CONTROL = 'no-cache'
+
+# Longest a request may keep its worker waiting (seconds)
+ENDPOINT_TIMEOUTS = {
+    '/esp-terminal': 25.0,  # ?wait= long polling
+    '/verify_port': 5.0,
+}
+
+# Routes request latency is reported by; other paths count as static files
+METRIC_ROUTES = {
+    '/esp-stream', '/esp-terminal', '/list_logs', '/drone_state', '/mission/status', '/telemetry_poller',
+    '/connections', '/liveness', '/list_missions', '/list_ports', '/metrics', '/send_command', '/send_commands',
+    '/probe_ports', '/verify_port', '/log_analytics', '/log_retention',
+}
+METRIC_ROUTE_PREFIXES = ('/get_log/', '/log_summary/', '/mission_info/', '/Missions/', '/mission/', '/replay/')
+
+
+def metric_route(path):
+    """Low-cardinality route label for a request path"""
+    path = urlsplit(path).path
+    if path in METRIC_ROUTES:
+        return path
+    for prefix in METRIC_ROUTE_PREFIXES:
+        if path.startswith(prefix):
+            return prefix
+    return 'static'
 
 class DroneSerialHandler(SimpleHTTPRequestHandler):
-    serial_port = None
-    verified_ports = set()  # Store verified port names
-    serial_listener_thread = None
-    serial_data = []
-    serial_data_lock = Lock()
+    protocol_version = 'HTTP/1.1'  # Keep-alive; every response sets Content-Length or closes
+    timeout = 60  # Drop keep-alive connections idle this long
+    disable_nagle_algorithm = True  # Headers and body go out as separate writes
+    connections = None  # Created below, once the handler methods exist
+    port_inventory = None
+    telemetry_stream = TelemetryStream()
+    drone_states = DroneStateTable()
+    telemetry_poller = None  # Created below, once the handler methods exist
+    mission_executor = None
+    mission_safety = None  # Safety report of the loaded mission
+    verify_lock = Lock()
+    terminal_cursor = 0  # Shared cursor for clients polling without one
+    terminal_cursor_lock = Lock()
     logbook_manager = LogbookManager()
+    static_cache = StaticCache(BASE_DIR)
+    mission_catalog = MissionCatalog(os.path.join(BASE_DIR, 'Missions'))
+    liveness = None  # Created below, once the handler methods exist
+    compact_heartbeats = True
+    replay = None  # ReplaySource while a recorded log is being played back
+    replay_requests = None  # Matches replayed RES lines to the REQs before them
+    replay_lock = Lock()
+    analytics_lock = Lock()
 
     @classmethod
-    def start_serial_listener(cls):
-        """Start listening on the serial port in a separate thread"""
-        if cls.serial_listener_thread and cls.serial_listener_thread.is_alive():
-            return
+    def collect_metrics(cls):
+        """Sample queue depths and buffer fill for /metrics"""
+        LOG_QUEUE.set(cls.logbook_manager.log_queue.qsize())
+        catalog = cls.logbook_manager.catalog
+        LOG_FILES.set(len(catalog.entries))
+        LOG_DISK_BYTES.set(catalog.total_bytes())
+        stream = cls.telemetry_stream
+        TERMINAL_BUFFER.set(min(stream.last_seq, stream.capacity))
+        DRONES_SEEN.set(len(cls.drone_states.drones))
+        for link in cls.connections.status()['links']:
+            for priority, depth in link['writer']['depth'].items():
+                COMMAND_QUEUE.labels(link['port'], priority).set(depth)
+
+    @classmethod
+    def handle_port_change(cls, added, removed):
+        """Drop the connections whose devices were unplugged"""
+        if added:
+            print(f"Serial ports added: {', '.join(added)}")
+        if removed:
+            print(f"Serial ports removed: {', '.join(removed)}")
+        for name in removed:
+            if cls.connections.remove(name):
+                print(f"GCS link on {name} closed")
+
+    @classmethod
+    def handle_serial_lines(cls, lines, timestamp, link=None):
+        """Store and log a batch of lines read from a GCS link"""
+        kept = cls.absorb_heartbeats(lines, timestamp)
+        cls.telemetry_stream.publish(kept)
+        frames = cls.drone_states.ingest(lines, timestamp)
+        if link:
+            cls.connections.learn_routes(link, frames)
+        cls.telemetry_poller.on_frames(frames, timestamp)
+        cls.logbook_manager.log_data(kept, timestamp)
+
+    @classmethod
+    def handle_replay_lines(cls, lines, timestamp):
+        """Feed recorded lines to the stream, parser and state table as if just read.
+
+        Replayed lines are not logged again and bypass the liveness table:
+        the recording already holds the link-down lines and its heartbeats
+        may be compacted into summary records, which the stream never saw.
+        """
+        cls.telemetry_stream.publish([line for line in lines if not SUMMARY_PATTERN.search(line)])
+        frames = cls.drone_states.ingest(lines, timestamp)
+        requests = cls.replay_requests
+        for frame in frames:
+            if frame.direction == 'T' and frame.command == 'REQ':
+                requests.note_request(frame.drone, frame.payload.strip())
+            elif frame.direction == 'S':
+                requests.on_frames([frame], timestamp)
+
+    @classmethod
+    def absorb_heartbeats(cls, lines, timestamp):
+        """Feed heartbeats to the liveness table; returns the lines to stream and log.
 
-        def listen():
+        With ``compact_heartbeats`` only the heartbeat that brings a drone
+        up is passed on; the rest reach the log as periodic summaries.
+        """
+        now = timestamp.timestamp() if timestamp else time.time()
+        kept = []
+        for line in lines:
+            drone_id = heartbeat_sender(line)
+            if drone_id is not None and not cls.liveness.heartbeat(drone_id, now) and cls.compact_heartbeats:
+                continue
+            kept.append(line)
+        return kept
+
+    @classmethod
+    def handle_liveness_change(cls, lines, timestamp):
+        """Tell stream clients and the log that a drone went silent"""
+        def publish(stamp):
+            cls.telemetry_stream.publish(lines)
+            cls.logbook_manager.log_data(lines, stamp)
+        cls.connections.in_order(publish, timestamp)
+
+    @classmethod
+    def log_heartbeat_summary(cls, line, timestamp):
+        if cls.compact_heartbeats:
+            cls.connections.in_order(lambda stamp: cls.logbook_manager.log_data(line, stamp), timestamp)
+
+    @classmethod
+    def handle_telemetry_value(cls, drone_id, data_type, payload, timestamp):
+        """Apply a RES reply matched to its request and pass it on typed"""
+        cls.drone_states.apply_telemetry(drone_id, data_type, payload, timestamp)
+        # The UI already understands typed frames such as {S:CD1;C:LOC;P:...}
+        cls.telemetry_stream.publish([f"{{S:{drone_id};C:{data_type};P:{payload}}}"])
+
+    @classmethod
+    def send_serial_commands(cls, commands, priority=None):
+        """Queue a batch of commands on the links their drones are routed to; the ones newly queued"""
+        return cls.connections.submit(commands, priority)
+
+    def stream_serial_data(self, query):
+        """Push serial lines to the client as Server-Sent Events"""
+        stream = DroneSerialHandler.telemetry_stream
+        # EventSource resends the last id it saw when it reconnects
+        cursor = self.headers.get('Last-Event-ID') or query.get('after', [None])[0]
+        try:
+            cursor = int(cursor)
+            if cursor < 0:
+                raise ValueError("negative cursor")
+        except (TypeError, ValueError):
+            cursor = stream.last_seq
+        if cursor > stream.last_seq:
+            # Cursor from before a server restart
+            cursor = stream.last_seq
+
+        self.send_stream_headers('text/event-stream')
+
+        try:
+            self.wfile.write(b"retry: 1000\n\n")
+            self.wfile.flush()
             while True:
-                if cls.serial_port and cls.serial_port.is_open:
-                    try:
-                        line = cls.serial_port.readline().decode().strip()
-                        if line:
-                            with cls.serial_data_lock:
-                                cls.serial_data.append(line)
-                                # Log the data
-                                cls.logbook_manager.log_data(line)
-                    except Exception as e:
-                        print(f"Error reading from serial port: {e}")
-
-        cls.serial_listener_thread = Thread(target=listen, daemon=True)
-        cls.serial_listener_thread.start()
-
-    def send_cors_headers(self):
+                lines, cursor, missed = stream.read_after(cursor, max_lines=256, timeout=15)
+                if missed:
+                    self.wfile.write(f"event: overrun\ndata: {missed}\n\n".encode())
+                if lines:
+                    self.wfile.write(f"id: {cursor}\ndata: {json.dumps(lines)}\n\n".encode())
+                else:
+                    # Keep idle connections from being dropped by proxies/timeouts
+                    self.wfile.write(b": keepalive\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError):
+            pass
+
+    def send_log_lines(self, file_name, query):
+        """Stream a log, or the slice of it selected by the query parameters.
+
+        Supported parameters: tail=N, start/end (timestamps, end exclusive),
+        offset/limit (line paging) and drone/command filters.
+        """
+        index = DroneSerialHandler.logbook_manager.get_log_index(file_name)
+        if index is None:
+            self.send_error(404, "Log file not found")
+            return
+
+        def param(name, cast=str):
+            value = query.get(name, [None])[0]
+            return cast(value) if value else None
+
+        try:
+            lines = index.query(
+                start=param('start'),
+                end=param('end'),
+                drone=param('drone'),
+                command=param('command'),
+                offset=param('offset', int) or 0,
+                limit=param('limit', int),
+                tail=param('tail', int),
+            )
+        except ValueError:
+            self.send_error(400, "Invalid log query")
+            return
+
+        self.send_stream_headers('text/plain')
+        try:
+            batch = []
+            for line in lines:
+                batch.append(line)
+                if len(batch) >= 1000:
+                    self.wfile.write(('\n'.join(batch) + '\n').encode())
+                    batch = []
+            if batch:
+                self.wfile.write(('\n'.join(batch) + '\n').encode())
+        except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError):
+            pass
+        except Exception as e:
+            print(f"Error reading log file: {e}")
+
+    def send_body(self, body, content_type=None, status=200):
+        """Send a complete response; Content-Length lets the connection be reused"""
+        self.send_response(status)
+        if content_type:
+            self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_cors_headers()
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, data, status=200):
+        """Send ``data`` as a JSON response"""
+        self.send_body(json.dumps(data).encode(), 'application/json', status)
+
+    def send_stream_headers(self, content_type):
+        """Start a response of unknown length that ends by closing the connection"""
+        self.send_response(200)
+        self.send_header('Content-type', content_type)
+        self.send_header('Connection', 'close')
+        self.send_cors_headers()
+        self.end_headers()
+        self.close_connection = True
+
+    def send_binary_mission(self, name):
+        """A binary mission from Missions/ as the JSON it was converted from"""
+        path = os.path.join(BASE_DIR, 'Missions', name)
+        if not os.path.isfile(path):
+            self.send_error(404, "Mission file not found")
+            return
+        try:
+            self.send_json(materialize(read_binary_mission(path)))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error reading binary mission: {e}")
+            self.send_error(500, str(e))
+
+    def send_static_file(self, url_path):
+        """Serve a UI file from the static cache with ETag revalidation"""
+        file_path = DroneSerialHandler.static_cache.resolve(url_path)
+        if file_path is None:
+            self.send_error(403, "Invalid path")
+            return
+        try:
+            asset = DroneSerialHandler.static_cache.get(file_path)
+        except OSError:
+            self.send_error(404, f"File not found: {url_path}")
+            return
+
+        use_gzip = asset.gzip_body is not None and 'gzip' in self.headers.get('Accept-Encoding', '')
+        etag = asset.gzip_etag if use_gzip else asset.etag
+        if etag in self.headers.get('If-None-Match', ''):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_cors_headers(STATIC_CACHE_CONTROL)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        if asset.content_type:
+            self.send_header('Content-type', asset.content_type)
+        self.send_header('ETag', etag)
+        if asset.gzip_body is not None:
+            self.send_header('Vary', 'Accept-Encoding')
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        body = asset.gzip_body if use_gzip else asset.body
+        self.send_header('Content-Length', str(len(body) if body is not None else asset.size))
+        self.send_cors_headers(STATIC_CACHE_CONTROL)
+        self.end_headers()
+        try:
+            if body is not None:
+                self.wfile.write(body)
+            else:
+                # Too large to cache; let the kernel copy it (sendfile where available)
+                with open(file_path, 'rb') as f:
+                    self.connection.sendfile(f, 0, asset.size)
+        except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError):
+            self.close_connection = True
+
+    def send_cors_headers(self, cache_control='no-store, no-cache, must-revalidate'):
         """Add CORS and cache control headers to response"""
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         self.send_header('Access-Control-Max-Age', '86400')  # 24 hours
-        self.send_header('Cache-Control', 'no-store, no-cache, must-revalidate')
+        self.send_header('Cache-Control', cache_control)
     
+    def parse_request(self):
+        self.request_started = time.perf_counter()
+        return super().parse_request()
+
+    def handle_one_request(self):
+        self.request_started = None
+        super().handle_one_request()
+        if self.request_started is not None and self.command:
+            HTTP_SECONDS.labels(self.command, metric_route(self.path)).observe(
+                time.perf_counter() - self.request_started)
+
     def do_OPTIONS(self):
         """Handle preflight requests"""
-        self.send_response(200)
-        self.send_cors_headers()
-        self.end_headers()
+        self.send_body(b'')
     
     def do_GET(self):
-        if self.path == '/esp-terminal':
-            with DroneSerialHandler.serial_data_lock:
-                data = DroneSerialHandler.serial_data.copy()
-                DroneSerialHandler.serial_data.clear()
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_cors_headers()
-            self.end_headers()
-            self.wfile.write(json.dumps(data).encode())
-        elif self.path == '/list_logs':
-            log_files = DroneSerialHandler.logbook_manager.get_log_files()
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_cors_headers()
-            self.end_headers()
-            self.wfile.write(json.dumps(log_files).encode())
-        elif self.path.startswith('/get_log/'):
-            file_name = self.path.split('/get_log/')[1]
-            log_content = DroneSerialHandler.logbook_manager.get_log_content(file_name)
-            if log_content is not None:
-                self.send_response(200)
-                self.send_header('Content-type', 'text/plain')
-                self.send_cors_headers()
-                self.end_headers()
-                self.wfile.write(log_content.encode())
+        url = urlsplit(self.path)
+        if url.path == '/esp-stream':
+            self.stream_serial_data(parse_qs(url.query))
+        elif url.path == '/esp-terminal':
+            stream = DroneSerialHandler.telemetry_stream
+            query = parse_qs(url.query)
+            if 'after' in query:
+                try:
+                    after = int(query['after'][0])
+                    limit = int(query.get('limit', [1000])[0])
+                    wait = min(float(query.get('wait', [0])[0]), ENDPOINT_TIMEOUTS['/esp-terminal'])
+                    if after < 0 or limit < 1:
+                        raise ValueError("after must not be negative and limit must be at least 1")
+                except ValueError:
+                    self.send_error(400, "Invalid cursor or limit")
+                    return
+                lines, cursor, missed = stream.read_after(after, max_lines=limit, timeout=max(0.0, wait))
+                data = {"lines": lines, "cursor": cursor, "missed": missed}
+            else:
+                # Legacy clients share one cursor, as they used to share one list
+                with DroneSerialHandler.terminal_cursor_lock:
+                    data, DroneSerialHandler.terminal_cursor, _ = stream.read_after(
+                        DroneSerialHandler.terminal_cursor, max_lines=stream.capacity, timeout=0)
+            self.send_json(data)
+        elif url.path == '/list_logs':
+            # Plain list for the UI; ?offset=&limit=&since=&until= returns a page with the total
+            query = parse_qs(url.query)
+            try:
+                offset = int(query.get('offset', [0])[0])
+                limit = int(query['limit'][0]) if 'limit' in query else None
+                since = parse_time(query.get('since', [None])[0])
+                until = parse_time(query.get('until', [None])[0], end=True)
+                total, logs = DroneSerialHandler.logbook_manager.catalog.list(offset, limit, since, until)
+            except ValueError:
+                self.send_error(400, "Invalid paging or date parameters")
+                return
+            if query.keys() & {'offset', 'limit', 'since', 'until'}:
+                self.send_json({"total": total, "offset": offset, "logs": logs})
+            else:
+                self.send_json(logs)
+        elif url.path == '/log_retention':
+            self.send_json(DroneSerialHandler.logbook_manager.catalog.status())
+        elif url.path == '/metrics':
+            self.send_body(REGISTRY.render().encode(), 'text/plain; version=0.0.4; charset=utf-8')
+        elif url.path == '/drone_state':
+            states = DroneSerialHandler.drone_states
+            since = parse_qs(url.query).get('since', [None])[0]
+            if since is not None and since == str(states.version):
+                data = {"version": states.version, "unchanged": True}
             else:
+                data = states.snapshot()
+            self.send_json(data)
+        elif url.path == '/mission/status':
+            self.send_json(self.mission_status())
+        elif url.path == '/replay/status':
+            replay = DroneSerialHandler.replay
+            self.send_json(replay.status() if replay else {"state": "idle"})
+        elif url.path == '/telemetry_poller':
+            self.send_json(DroneSerialHandler.telemetry_poller.status())
+        elif url.path == '/connections':
+            self.send_json(DroneSerialHandler.connections.status())
+        elif url.path == '/liveness':
+            self.send_json(self.liveness_status())
+        elif url.path == '/log_analytics':
+            self.send_log_analytics(parse_qs(url.query))
+        elif url.path.startswith('/get_log/'):
+            self.send_log_lines(url.path[len('/get_log/'):], parse_qs(url.query))
+        elif url.path.startswith('/log_summary/'):
+            index = DroneSerialHandler.logbook_manager.get_log_index(url.path[len('/log_summary/'):])
+            if index is None:
                 self.send_error(404, "Log file not found")
-        elif self.path == '/list_missions':
+                return
+            index.refresh()
+            self.send_json(index.summary())
+        elif url.path == '/list_missions':
+            # Plain list for the UI; ?offset=&limit=&search= returns a page with the total
+            query = parse_qs(url.query)
             try:
-                missions_dir = os.path.join(BASE_DIR, 'Missions')
-                missions = []
-                if os.path.exists(missions_dir):
-                    for file in os.listdir(missions_dir):
-                        if file.endswith('.json'):
-                            missions.append({
-                                'name': file,
-                                'path': f'/Missions/{file}'  # Use relative path
-                            })
-                
-                self.send_response(200)
-                self.send_header('Content-type', 'application/json')
-                self.send_cors_headers()
-                self.end_headers()
-                self.wfile.write(json.dumps(missions).encode())
+                offset = int(query.get('offset', [0])[0])
+                limit = int(query['limit'][0]) if 'limit' in query else None
+                total, missions = DroneSerialHandler.mission_catalog.list(
+                    offset, limit, query.get('search', [None])[0])
+            except ValueError:
+                self.send_error(400, "Invalid paging parameters")
+                return
             except Exception as e:
                 print(f"Error listing missions: {e}")
                 self.send_error(500, str(e))
+                return
+            if 'offset' in query or 'limit' in query:
+                self.send_json({"total": total, "offset": offset, "missions": missions})
+            else:
+                self.send_json(missions)
             return
-        elif self.path.startswith('/Missions/'):
-            try:
-                file_path = os.path.join(BASE_DIR, self.path.lstrip('/'))
-                if os.path.exists(file_path):
-                    with open(file_path, 'r') as f:
-                        mission_data = f.read()
-                    
-                    self.send_response(200)
-                    self.send_header('Content-type', 'application/json')
-                    self.send_cors_headers()
-                    self.end_headers()
-                    self.wfile.write(mission_data.encode())
-                else:
-                    self.send_error(404, "Mission file not found")
-            except Exception as e:
-                print(f"Error reading mission file: {e}")
-                self.send_error(500, str(e))
+        elif url.path.startswith('/mission_info/'):
+            summary = DroneSerialHandler.mission_catalog.get(os.path.basename(url.path[len('/mission_info/'):]))
+            if summary is None:
+                self.send_error(404, "Mission file not found")
+                return
+            self.send_json(summary)
+            return
+        elif url.path.startswith('/Missions/'):
+            if is_binary_mission(url.path):
+                # The UI only reads JSON, so binary missions are served converted
+                self.send_binary_mission(os.path.basename(url.path))
+                return
+            # Served from the mtime-keyed static cache, with ETag and gzip
+            self.send_static_file(url.path)
             return
         else:
             # Handle API endpoints
-            if self.path == '/list_ports':
+            if url.path == '/list_ports':
                 try:
-                    ports = get_esp32_ports()
-                    
-                    if not ports:
-                        ports = [{
-                            "port": port.device,
-                            "description": port.description,
-                            "hwid": port.hwid,
-                            "is_esp32": False
-                        } for port in serial.tools.list_ports.comports()]
-                    
-                    self.send_response(200)
-                    self.send_header('Content-type', 'application/json')
-                    self.send_cors_headers()
-                    self.end_headers()
-                    self.wfile.write(json.dumps(ports).encode())
-                    
+                    # ?refresh=1 rescans now instead of waiting for the watcher
+                    if parse_qs(url.query).get('refresh') == ['1']:
+                        DroneSerialHandler.port_inventory.scan()
+                    self.send_json(DroneSerialHandler.port_inventory.list())
                 except Exception as e:
                     print(f"Error listing ports: {e}")
-                    self.send_response(500)
-                    self.send_header('Content-type', 'application/json')
-                    self.send_cors_headers()
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": str(e)}).encode())
+                    self.send_json({"error": str(e)}, 500)
                 return
 
-            # Handle static files
-            try:
-                # Map the requested path to the actual file path
-                if self.path == '/':
-                    file_path = os.path.join(BASE_DIR, 'index.html')
-                else:
-                    # Remove leading slash and join with base directory
-                    clean_path = self.path.lstrip('/')
-                    file_path = os.path.join(BASE_DIR, clean_path)
-
-                # Validate the path is within BASE_DIR
-                if not os.path.abspath(file_path).startswith(BASE_DIR):
-                    raise Exception("Invalid path")
-                
-                # Map file extensions to content types
-                content_types = {
-                    '.html': 'text/html',
-                    '.js': 'application/javascript',
-                    '.css': 'text/css',
-                    '.png': 'image/png',
-                    '.jpg': 'image/jpeg',
-                    '.gif': 'image/gif',
-                    '.ico': 'image/x-icon'
-                }
-                
-                ext = os.path.splitext(file_path)[1]
-                
-                with open(file_path, 'rb') as f:
-                    self.send_response(200)
-                    if ext in content_types:
-                        self.send_header('Content-type', content_types[ext])
-                    self.send_cors_headers()
-                    self.end_headers()
-                    self.wfile.write(f.read())
-                    print(f"Served file: {file_path}")
-                    
-            except FileNotFoundError:
-                print(f"File not found: {self.path}")
-                self.send_error(404, f"File not found: {self.path}")
-            except Exception as e:
-                print(f"Error serving file: {e}")
-                self.send_error(500, f"Server error: {str(e)}")
+            self.send_static_file(url.path)
 
     def do_POST(self):
         content_length = int(self.headers.get('Content-Length', 0))
@@ -280,28 +677,143 @@ class DroneSerialHandler(SimpleHTTPRequestHandler):
         if self.path == '/send_command':
             try:
                 command = post_data.strip()  # Use the raw command string directly
+                self.note_requests(DroneSerialHandler.send_serial_commands([command]))
                 
-                if not DroneSerialHandler.serial_port or not DroneSerialHandler.serial_port.is_open:
-                    raise Exception("Serial port not connected")
-                    
-                # Add command terminator
-                command += "\n"
-                DroneSerialHandler.serial_port.write(command.encode())
-                DroneSerialHandler.serial_port.flush()
-                
-                self.send_response(200)
-                self.send_header('Content-type', 'text/plain')
-                self.send_cors_headers()
-                self.end_headers()
-                self.wfile.write(json.dumps({"status": "ok"}).encode())  # Send a simple JSON response
+                self.send_json({"status": "ok"})
                 
             except Exception as e:
                 print(f"Command error: {e}")
-                self.send_response(500)
-                self.send_header('Content-type', 'application/json')
-                self.send_cors_headers()
-                self.end_headers()
-                self.wfile.write(json.dumps({"error": str(e)}).encode())
+                self.send_json({"error": str(e)}, 500)
+            return
+
+        elif self.path == '/send_commands':
+            # {"commands": ["{T:CD1;C:ARM;P:GUIDED}", ...], "priority": "mission"}
+            try:
+                data = json.loads(post_data)
+                if isinstance(data, list):
+                    data = {"commands": data}
+                commands = [str(command).strip() for command in data.get('commands', [])]
+                priority = data.get('priority')
+                if priority is not None and priority not in PRIORITY_NAMES:
+                    raise ValueError(f"Unknown priority: {priority}")
+                queued = DroneSerialHandler.send_serial_commands(
+                    [command for command in commands if command],
+                    PRIORITY_NAMES.get(priority),
+                )
+                # A REQ that replaced a queued one is not a second request
+                self.note_requests(queued)
+                status = 200
+                response = {"status": "ok", "queued": len(commands)}
+            except (ValueError, TypeError, AttributeError) as e:
+                status = 400
+                response = {"error": str(e)}
+            except Exception as e:
+                print(f"Command error: {e}")
+                status = 500
+                response = {"error": str(e)}
+            self.send_json(response, status)
+            return
+
+        elif self.path == '/connections':
+            # {"strategy": "round_robin", "routes": {"CD1": "COM5"}, "disconnect": "COM6",
+            #  "rate": 200, "burst": 20, "drone_rate": 50, "drone_burst": 10}
+            try:
+                data = json.loads(post_data or '{}')
+                connections = DroneSerialHandler.connections
+                if data.get('disconnect'):
+                    connections.remove(data['disconnect'])
+                connections.configure(
+                    strategy=data.get('strategy'),
+                    routes=data.get('routes'),
+                    rate=data.get('rate'),
+                    burst=data.get('burst'),
+                    drone_rate=data.get('drone_rate'),
+                    drone_burst=data.get('drone_burst'),
+                )
+                self.send_json(connections.status())
+            except (ValueError, TypeError, AttributeError) as e:
+                self.send_json({"error": str(e)}, 400)
+            return
+
+        elif self.path == '/liveness':
+            # {"compact": true, "timeout": 3, "gap_threshold": 1.5, "summary_interval": 10}
+            try:
+                data = json.loads(post_data or '{}')
+                table = DroneSerialHandler.liveness
+                for key in ('timeout', 'gap_threshold', 'summary_interval'):
+                    if data.get(key) is not None:
+                        value = float(data[key])
+                        if value <= 0:
+                            raise ValueError(f"{key} must be positive")
+                        setattr(table, key, value)
+                if 'compact' in data:
+                    if not data['compact']:
+                        # Heartbeats from here on are logged as they come
+                        table.summarize()
+                    DroneSerialHandler.compact_heartbeats = bool(data['compact'])
+                self.send_json(self.liveness_status())
+            except (ValueError, TypeError, AttributeError) as e:
+                self.send_json({"error": str(e)}, 400)
+            return
+
+        elif self.path == '/log_retention':
+            # {"compress_after_days": 7, "archive_after_days": 90, "max_total_bytes": ..., "enforce": true}
+            try:
+                data = json.loads(post_data or '{}')
+                catalog = DroneSerialHandler.logbook_manager.catalog
+                enforce = data.pop('enforce', False)
+                catalog.set_policy(**data)
+                status = catalog.status()
+                if enforce:
+                    status['enforced'] = DroneSerialHandler.logbook_manager.enforce_retention()
+                self.send_json(status)
+            except (ValueError, TypeError, AttributeError) as e:
+                self.send_json({"error": str(e)}, 400)
+            return
+
+        elif self.path.startswith('/mission/'):
+            self.handle_mission_command(self.path[len('/mission/'):], post_data)
+            return
+
+        elif self.path.startswith('/replay/'):
+            self.handle_replay_command(self.path[len('/replay/'):], post_data)
+            return
+
+        elif self.path == '/telemetry_poller':
+            try:
+                data = json.loads(post_data or '{}')
+                poller = DroneSerialHandler.telemetry_poller
+                poller.configure(
+                    drones=data.get('drones'),
+                    rates=data.get('rates'),
+                    window=data.get('window'),
+                    timeout=data.get('timeout'),
+                )
+                poller.start()
+                self.send_json(poller.status())
+            except (ValueError, TypeError, AttributeError) as e:
+                self.send_json({"error": str(e)}, 400)
+            return
+
+        elif self.path == '/probe_ports':
+            try:
+                data = json.loads(post_data or '{}')
+                timeout = min(float(data.get('timeout', 1.0)), ENDPOINT_TIMEOUTS['/verify_port'])
+                if not DroneSerialHandler.verify_lock.acquire(timeout=timeout):
+                    self.send_json({"error": "Port verification already in progress"}, 409)
+                    return
+                try:
+                    results = DroneSerialHandler.port_inventory.probe_all(
+                        data.get('ports'),
+                        data.get('command') or VERIFY_COMMAND,
+                        timeout,
+                        exclude=set(DroneSerialHandler.connections.port_names()),
+                    )
+                finally:
+                    DroneSerialHandler.verify_lock.release()
+                self.send_json({"results": results, "ports": DroneSerialHandler.port_inventory.list()})
+            except (ValueError, TypeError) as e:
+                self.send_json({"error": str(e)}, 400)
             return
 
         elif self.path == "/verify_port":
@@ -313,106 +825,255 @@ class DroneSerialHandler(SimpleHTTPRequestHandler):
                 if not port:
                     raise ValueError("Port not specified")
 
-                # Pass the correct port to verify_esp32_response
-                is_verified = self.verify_esp32_response(port, command)
-                
-                if is_verified:
-                    DroneSerialHandler.verified_ports.add(port)  # Add to verified ports
-                    DroneSerialHandler.start_serial_listener()
-                else:
-                    if DroneSerialHandler.serial_port:
-                        DroneSerialHandler.serial_port.close()
-                        DroneSerialHandler.serial_port = None
-                
-                self.send_response(200)
-                self.send_header('Content-type', 'application/json')
-                self.send_cors_headers()
-                self.end_headers()
+                timeout = min(float(data.get('timeout', 1.0)), ENDPOINT_TIMEOUTS['/verify_port'])
+                # One probe at a time; a second request waits at most its own timeout
+                if not DroneSerialHandler.verify_lock.acquire(timeout=timeout):
+                    self.send_json({"error": "Port verification already in progress"}, 409)
+                    return
+                try:
+                    # A device that answered before is trusted without a new handshake
+                    cached = DroneSerialHandler.port_inventory.is_verified(port) and not data.get('force')
+                    is_verified = self.verify_esp32_response(port, command, timeout, skip_handshake=cached,
+                                                             replace=bool(data.get('replace')))
+                finally:
+                    DroneSerialHandler.verify_lock.release()
                 
                 response = {
                     "verified": is_verified,
+                    "cached": cached and is_verified,
                     "status": "connected" if is_verified else "invalid_device"
                 }
                 
-                self.wfile.write(json.dumps(response).encode())
+                self.send_json(response)
                 print(f"Port verification result: {response}")
                 
+            except (ValueError, TypeError) as e:
+                self.send_json({"error": str(e)}, 400)
             except Exception as e:
                 print(f"Port verification error: {e}")
-                if DroneSerialHandler.serial_port:
-                    DroneSerialHandler.serial_port.close()
-                    DroneSerialHandler.serial_port = None
-                self.send_response(500)
-                self.send_header('Content-type', 'application/json')
-                self.send_cors_headers()
-                self.end_headers()
-                self.wfile.write(json.dumps({"error": str(e)}).encode())
+                self.send_json({"error": str(e)}, 500)
             return
         
 
         # Add more paths as needed
         self.send_error(404)  # If the path is not recognized
 
-    def read_response(self, timeout=1.0):
-        """Read response from serial port for query commands"""
-        if not DroneSerialHandler.serial_port:
-            return {"error": "No serial connection"}
-            
-        start_time = time.time()
-        response = []
-        
-        while (time.time() - start_time) < timeout:
-            if DroneSerialHandler.serial_port.in_waiting:
-                line = DroneSerialHandler.serial_port.readline().decode().strip()
-                response.append(line)
-                if not DroneSerialHandler.serial_port.in_waiting:
-                    break
-                    
-        return {"response": response} if response else {"error": "No response"}
-    
-    def verify_esp32_response(self, port, command, timeout=1.0):
+    def note_requests(self, commands):
+        """Tell the poller about REQs sent by the UI so replies are matched"""
+        for command in commands:
+            frame = parse_frame(command)
+            if frame and frame.command == 'REQ':
+                DroneSerialHandler.telemetry_poller.note_request(frame.drone, frame.payload)
+
+    def load_mission_decoder(self, mission_name):
+        """MissionDecoder for a file in Missions/, or ValueError"""
+        mission_name = os.path.basename(mission_name or '')
+        decoder = MissionDecoder()
+        if not mission_name or not decoder.load_mission(os.path.join(BASE_DIR, 'Missions', mission_name)):
+            raise ValueError(f"Could not load mission: {mission_name}")
+        return decoder
+
+    def send_log_analytics(self, query):
+        """Link-quality report over the logs; ?log= (repeatable) picks sessions, ?totals=1 drops them"""
+        # Run as its own process so the worker pool never re-imports this module
+        command = [sys.executable, os.path.join(BASE_DIR, 'log_analytics.py'), '--logs-dir', LOGS_DIR]
+        for name in query.get('log', []):
+            command += ['--log', os.path.basename(name)]
+        if query.get('totals', ['0'])[0] not in ('0', 'false', ''):
+            command.append('--totals')
+        try:
+            # One run at a time keeps the shared cache file consistent
+            with DroneSerialHandler.analytics_lock:
+                result = subprocess.run(command, capture_output=True, timeout=300)
+        except subprocess.TimeoutExpired:
+            self.send_json({"error": "Log analytics timed out"}, 504)
+            return
+        if result.returncode != 0:
+            print(f"Error analysing logs: {result.stderr.decode(errors='replace').strip()}")
+            self.send_json({"error": "Log analytics failed"}, 500)
+            return
+        self.send_body(result.stdout, 'application/json')
+
+    def liveness_status(self):
+        """Heartbeat compaction settings and the liveness of every drone"""
+        table = DroneSerialHandler.liveness
+        return {
+            'compact': DroneSerialHandler.compact_heartbeats,
+            'timeout': table.timeout,
+            'gap_threshold': table.gap_threshold,
+            'summary_interval': table.summary_interval,
+            'drones': table.snapshot(),
+        }
+
+    def mission_status(self):
+        """Executor status plus the safety summary of the loaded mission"""
+        status = DroneSerialHandler.mission_executor.status()
+        safety = DroneSerialHandler.mission_safety
+        if safety:
+            status['safety'] = {key: safety[key] for key in ('ok', 'counts', 'closest_approach', 'max_speed')}
+        return status
+
+    def handle_mission_command(self, action, post_data):
+        """Control the server-side mission executor"""
+        executor = DroneSerialHandler.mission_executor
+        try:
+            data = json.loads(post_data or '{}')
+            if action == 'validate':
+                # Either a saved mission by name or the mission JSON being edited
+                mission_data = data.get('mission_data')
+                if mission_data is None:
+                    mission_data = self.load_mission_decoder(data.get('mission')).mission_data
+                self.send_json(analyze_mission(mission_data, data.get('limits')))
+                return
+            if action == 'load':
+                mission_name = os.path.basename(data.get('mission') or '')
+                decoder = self.load_mission_decoder(mission_name)
+                resampler = None
+                if data.get('resample'):
+                    # {"method": "cubic", "rate": 10}; the rate is capped by the writers' budget
+                    options = data['resample']
+                    link_share, drone_rate = DroneSerialHandler.connections.command_budget(
+                        list(decoder.mission_data['drones']))
+                    max_rate = max_setpoint_rate(link_share, drone_rate)
+                    resampler = TrajectoryResampler(decoder.mission_data, float(options.get('rate', 10)),
+                                                    options.get('method', CUBIC), max_rate)
+                executor.load(decoder, mission_name, resampler)
+                DroneSerialHandler.mission_safety = analyze_mission(decoder.mission_data, data.get('limits'))
+            elif action == 'start':
+                safety = DroneSerialHandler.mission_safety
+                if safety and not safety['ok'] and not data.get('force'):
+                    failed = ', '.join(f"{count} {kind}" for kind, count in safety['counts'].items() if count)
+                    raise ValueError(f"Mission failed safety checks ({failed}); start with force to override")
+                executor.start(int(data.get('frame', 0)))
+            elif action == 'pause':
+                executor.pause()
+            elif action == 'resume':
+                executor.resume()
+            elif action == 'seek':
+                executor.seek(int(data['frame']))
+            elif action == 'stop':
+                executor.stop(land=data.get('land', True))
+            else:
+                self.send_error(404)
+                return
+            status = 200
+            response = self.mission_status()
+        except (ValueError, KeyError, TypeError) as e:
+            status = 400
+            response = {"error": str(e)}
+        except Exception as e:
+            print(f"Mission command error: {e}")
+            status = 500
+            response = {"error": str(e)}
+
+        self.send_json(response, status)
+
+    def handle_replay_command(self, action, post_data):
+        """Control playback of a recorded log through the live pipeline"""
+        try:
+            data = json.loads(post_data or '{}')
+            with DroneSerialHandler.replay_lock:
+                replay = DroneSerialHandler.replay
+                if action == 'start':
+                    # {"log": "esp_log_....txt.gz", "speed": 10, "position": 2400}
+                    log_path = DroneSerialHandler.logbook_manager.catalog.find(data.get('log'))
+                    if log_path is None:
+                        raise ValueError(f"Log file not found: {data.get('log')}")
+                    if replay:
+                        replay.stop()
+                    DroneSerialHandler.replay = None
+                    DroneSerialHandler.replay_requests = TelemetryPoller(None, DroneSerialHandler.handle_telemetry_value)
+                    replay = ReplaySource(log_path, DroneSerialHandler.handle_replay_lines, data.get('speed', 1.0))
+                    DroneSerialHandler.replay = replay
+                    replay.start(float(data.get('position', 0)))
+                elif replay is None:
+                    raise ValueError("No replay loaded")
+                elif action == 'pause':
+                    replay.pause()
+                elif action == 'resume':
+                    replay.resume()
+                elif action == 'seek':
+                    replay.seek(data.get('position'), data.get('timestamp'))
+                elif action == 'speed':
+                    replay.set_speed(data['speed'])
+                elif action == 'stop':
+                    replay.stop()
+                    DroneSerialHandler.replay = None
+                    self.send_json({"state": "stopped"})
+                    return
+                else:
+                    self.send_error(404)
+                    return
+            status = 200
+            response = replay.status()
+        except (ValueError, KeyError, TypeError) as e:
+            status = 400
+            response = {"error": str(e)}
+        except Exception as e:
+            print(f"Replay command error: {e}")
+            status = 500
+            response = {"error": str(e)}
+
+        self.send_json(response, status)
+
+    def verify_esp32_response(self, port, command, timeout=1.0, skip_handshake=False, replace=False):
+        """Probe ``port`` for a GCS dongle and add it as a link.
+
+        The port is probed on its own handle while the links already
+        connected keep reading telemetry and sending commands. It is only
+        added once the dongle has answered OK (or, with ``skip_handshake``,
+        as soon as it opens). ``replace`` closes every other link.
+        """
+        inventory = DroneSerialHandler.port_inventory
+        connections = DroneSerialHandler.connections
+        # Re-verifying a connected port: its reader would eat the reply
+        connections.remove(port)
+
+        candidate = None
         try:
             print(f"Attempting to open serial port: {port}")
-            # Open the specified port
-            DroneSerialHandler.serial_port = serial.Serial(port, 115200)
-            
-            if not DroneSerialHandler.serial_port.is_open:
-                raise Exception("Failed to open serial port")
-            
-            # Clear buffers
-            DroneSerialHandler.serial_port.reset_input_buffer()
-            DroneSerialHandler.serial_port.reset_output_buffer()
-            
-            # Send command
-            command += "\n"
-            DroneSerialHandler.serial_port.write(command.encode())
-            start_time = time.time()
-            response_lines = []
-            
-            print("Waiting for ESP32 response...")
-            while (time.time() - start_time) < timeout:
-                if DroneSerialHandler.serial_port.in_waiting:
-                    line = DroneSerialHandler.serial_port.readline().decode().strip()
-                    print(f"Received line: '{line}'")
-                    response_lines.append(line)
-                    if line == "OK":
-                        print("Received OK response - Valid ESP32 GCS device")
-                        return True
-                    elif "ESP-GCS Ready" in line:
-                        print("ESP32 is still initializing...")
-            
-            print(f"No OK response received. Got: {response_lines}")
-            return False
+            candidate = serial.Serial(port, 115200, timeout=0.1)
+            if not skip_handshake:
+                verified, response_lines = handshake(candidate, command or VERIFY_COMMAND, timeout)
+                inventory.mark_verified(port, verified)
+                if not verified:
+                    print(f"No OK response received. Got: {response_lines}")
+                    candidate.close()
+                    return False
+                print("Received OK response - Valid ESP32 GCS device")
+
+            if replace:
+                connections.close_all()
+            connections.add(candidate)
+            return True
         except Exception as e:
             print(f"Error verifying ESP32 response: {e}")
+            inventory.mark_verified(port, False)
+            if candidate:
+                candidate.close()
             return False
 
+DroneSerialHandler.connections = ConnectionManager(DroneSerialHandler.handle_serial_lines)
+DroneSerialHandler.telemetry_poller = TelemetryPoller(
+    DroneSerialHandler.send_serial_commands,
+    DroneSerialHandler.handle_telemetry_value,
+)
+DroneSerialHandler.mission_executor = MissionExecutor(DroneSerialHandler.send_serial_commands)
+DroneSerialHandler.port_inventory = PortInventory(DroneSerialHandler.handle_port_change)
+DroneSerialHandler.liveness = LivenessTable(
+    DroneSerialHandler.handle_liveness_change,
+    DroneSerialHandler.log_heartbeat_summary,
+)
+REGISTRY.on_collect(DroneSerialHandler.collect_metrics)
+
 
 def start_http_server():
     try:
         # Change working directory to where run_app.py is located
         os.chdir(BASE_DIR)
-        server = HTTPServer(('127.0.0.1', 5000), DroneSerialHandler)
+        DroneSerialHandler.port_inventory.start()
+        DroneSerialHandler.liveness.start()
+        server = ThreadingHTTPServer(('127.0.0.1', 5000), DroneSerialHandler)
         print(f"HTTP server running on http://127.0.0.1:5000 from {BASE_DIR}")
         server.serve_forever()
     except Exception as e:
@@ -479,11 +1140,16 @@ class ApplicationManager:
         """Clean shutdown of all components"""
         self.running = False
         
-        if DroneSerialHandler.serial_port and DroneSerialHandler.serial_port.is_open:
-            print("Closing serial port...")
-            DroneSerialHandler.serial_port.close()
-            if DroneSerialHandler.serial_listener_thread:
-                DroneSerialHandler.serial_listener_thread.join(timeout=1)
+        DroneSerialHandler.telemetry_poller.stop()
+        DroneSerialHandler.mission_executor.stop(land=False)
+        if DroneSerialHandler.replay:
+            DroneSerialHandler.replay.stop()
+        DroneSerialHandler.port_inventory.stop()
+        if DroneSerialHandler.connections.port_names():
+            print("Closing serial ports...")
+        DroneSerialHandler.connections.close_all()
+        DroneSerialHandler.liveness.stop()
+        DroneSerialHandler.logbook_manager.close()
         
         if self.electron_process:
             self.electron_process.terminate()
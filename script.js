@@ -133,8 +133,8 @@ document.addEventListener('DOMContentLoaded', () => {
     initializeMap();
     initializeTerminalDrag();
     
-    // Start fetching serial data
-    setInterval(fetchSerialData, 500);
+    // Start receiving serial data
+    startSerialStream();
 });
 
 // Utility Functions
@@ -319,8 +319,8 @@ function handleProgramChange(e) {
     updateFormation();
 }
 
-// Add mission decoder instance
-let missionDecoder = null;
+// Mission playback state (the mission itself runs on the server)
+let missionStatusInterval = null;
 let isExecutingMission = false;
 let isPausedMission = false;
 
@@ -373,43 +373,6 @@ function clearMissionCache() {
     cachedMissions = null;
 }
 
-// Function to execute mission commands
-async function executeMissionCommands(commands) {
-    if (!commands || commands.length === 0) return;
-    
-    for (const cmd of commands) {
-        try {
-            const formattedCmd = `{T:${cmd.target};C:${cmd.command};P:${cmd.payload}}`;
-            console.log('Executing command:', formattedCmd);
-            
-            const response = await fetch('http://127.0.0.1:5000/send_command', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'text/plain'
-                },
-                body: formattedCmd
-            });
-            
-            if (!response.ok) {
-                const errorText = await response.text();
-                throw new Error(`Failed to send command: ${errorText}`);
-            }
-            
-            const responseText = await response.text();
-            if (responseText.includes('TargetInvalid')) {
-                throw new Error(`Invalid target: ${cmd.target}`);
-            }
-            
-            // Small delay between commands in the same frame
-            await new Promise(resolve => setTimeout(resolve, 100));
-        } catch (error) {
-            console.error('Error executing command:', error);
-            customAlert.error('Command execution failed: ' + error.message);
-            throw error;
-        }
-    }
-}
-
 // Add mission viewer class
 class MissionViewer {
     constructor() {
@@ -650,6 +613,39 @@ class MissionViewer {
 // Create mission viewer instance
 const missionViewer = new MissionViewer();
 
+// Send a control request to the server-side mission executor
+async function missionRequest(action, body = {}) {
+    const response = await fetch(`http://127.0.0.1:5000/mission/${action}`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body)
+    });
+    const status = await response.json();
+    if (!response.ok) {
+        throw new Error(status.error || `Mission ${action} failed`);
+    }
+    return status;
+}
+
+// Mirror the executor's progress in the mission viewer
+async function updateMissionStatus() {
+    try {
+        const response = await fetch('http://127.0.0.1:5000/mission/status');
+        if (!response.ok) throw new Error('Failed to fetch mission status');
+
+        const status = await response.json();
+        missionViewer.updateProgress(status.frame, status.total_frames);
+        missionViewer.showCommands(status.commands);
+
+        if (status.state === 'completed') {
+            customAlert.success('Mission completed successfully');
+            handleStop();
+        }
+    } catch (error) {
+        console.error('Error fetching mission status:', error);
+    }
+}
+
 // Update handleStart function to properly show mission progress
 async function handleStart() {
     const programSelect = document.querySelector('.program-select');
@@ -665,20 +661,19 @@ async function handleStart() {
         try {
             startButton.disabled = true;
             
-            // Initialize mission decoder if not already initialized
-            if (!missionDecoder) {
-                const response = await fetch(`http://127.0.0.1:5000${programSelect.value}`);
-                if (!response.ok) {
-                    throw new Error(`Failed to load mission: ${response.statusText}`);
-                }
-                const missionData = await response.json();
-                missionDecoder = new MissionDecoder();
-                await missionDecoder.load_mission(missionData);
-                
-                // Show mission viewer and set mission data
-                missionViewer.setMissionData(missionData);
-                missionViewer.show();
+            const response = await fetch(`http://127.0.0.1:5000${programSelect.value}`);
+            if (!response.ok) {
+                throw new Error(`Failed to load mission: ${response.statusText}`);
             }
+            const missionData = await response.json();
+            
+            // Show mission viewer and set mission data
+            missionViewer.setMissionData(missionData);
+            missionViewer.show();
+
+            // The server plays the frames so their timing does not depend on HTTP round trips
+            await missionRequest('load', { mission: programSelect.value });
+            await missionRequest('start');
             
             isExecutingMission = true;
             isPausedMission = false;
@@ -691,34 +686,7 @@ async function handleStart() {
             pauseButton.textContent = 'Pause';
             
             customAlert.success('Mission started');
-            
-            // Start mission execution loop
-            let frameIndex = 0;
-            const totalFrames = missionDecoder.frames.length;
-            
-            while (isExecutingMission && !isPausedMission && frameIndex < totalFrames) {
-                const frameData = missionDecoder.get_next_frame_commands();
-                if (!frameData) {
-                    break;
-                }
-                
-                // Update mission viewer with current frame data
-                frameIndex++;
-                missionViewer.updateProgress(frameIndex, totalFrames);
-                missionViewer.showCommands(frameData.commands);
-                
-                // Execute all commands for this frame
-                await executeMissionCommands(frameData.commands);
-                
-                // Wait for frame delay
-                await new Promise(resolve => setTimeout(resolve, frameData.delay));
-            }
-
-            // Mission complete or stopped
-            if (frameIndex >= totalFrames) {
-                customAlert.success('Mission completed successfully');
-                handleStop();
-            }
+            missionStatusInterval = setInterval(updateMissionStatus, 250);
 
         } catch (error) {
             console.error('Error executing mission:', error);
@@ -733,14 +701,21 @@ async function handleStart() {
 
 // Update handleStop to properly clean up the mission viewer
 async function handleStop() {
-    if (missionDecoder) {
-        const landCommands = missionDecoder.stop_mission();
-        await executeMissionCommands(landCommands);
+    clearInterval(missionStatusInterval);
+    missionStatusInterval = null;
+
+    if (isExecutingMission) {
+        try {
+            // Stops playback on the server and lands every drone in the mission
+            await missionRequest('stop', { land: true });
+        } catch (error) {
+            console.error('Error stopping mission:', error);
+            customAlert.error('Failed to stop mission: ' + error.message);
+        }
     }
     
     isExecutingMission = false;
     isPausedMission = false;
-    missionDecoder = null;
     
     const startButton = document.querySelector('.start');
     const pauseButton = document.querySelector('.pause');
@@ -757,22 +732,27 @@ async function handleStop() {
 }
 
 // Update handlePause function
-function handlePause() {
+async function handlePause() {
     const pauseButton = document.querySelector('.pause');
     
     if (isExecutingMission) {
-        if (!isPausedMission) {
-            // Pause mission
-            isPausedMission = true;
-            missionDecoder?.pause_mission();
-            pauseButton.textContent = 'Resume';
-            customAlert.success('Mission paused');
-        } else {
-            // Resume mission
-            isPausedMission = false;
-            missionDecoder?.resume_mission();
-            pauseButton.textContent = 'Pause';
-            customAlert.success('Mission resumed');
+        try {
+            if (!isPausedMission) {
+                // Pause mission
+                await missionRequest('pause');
+                isPausedMission = true;
+                pauseButton.textContent = 'Resume';
+                customAlert.success('Mission paused');
+            } else {
+                // Resume mission
+                await missionRequest('resume');
+                isPausedMission = false;
+                pauseButton.textContent = 'Pause';
+                customAlert.success('Mission resumed');
+            }
+        } catch (error) {
+            console.error('Error pausing mission:', error);
+            customAlert.error(error.message);
         }
     }
 }
@@ -1461,7 +1441,7 @@ class DroneCard {
         this.droneId = droneId;
         this.name = name;
         this.element = this.createCard();
-        this.attitudeInterval = null;
+        this.telemetryEnabled = false;
     }
 
     createCard() {
@@ -1594,14 +1574,21 @@ class DroneCard {
     }
 
     toggleSendingAttitudeRequests(droneId) {
-        if (!this.attitudeInterval) {
-            this.attitudeInterval = setInterval(() => {
-                this.handleAttitude(droneId);
-            }, 800);
-        } else {
-            clearInterval(this.attitudeInterval);
-            this.attitudeInterval = null;
-        }
+        // The server polls telemetry and matches the replies; we only switch it on or off
+        const enable = !this.telemetryEnabled;
+        fetch('http://127.0.0.1:5000/telemetry_poller', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ drones: { [droneId]: enable } })
+        })
+        .then(response => {
+            if (!response.ok) throw new Error('Failed to update telemetry polling');
+            this.telemetryEnabled = enable;
+        })
+        .catch(error => {
+            console.error('Error updating telemetry polling:', error);
+            customAlert.error('Failed to update telemetry polling');
+        });
     }
 
     handleAttitude(droneId) {
@@ -3642,38 +3629,70 @@ async function handleESPTerminalData(data) {
 // Function to fetch data from /esp-terminal
 async function fetchSerialData() {
     try {
-        const response = await fetch('http://127.0.0.1:5000/esp-terminal');
+        const cursor = window.serialCursor || 0;
+        const response = await fetch(`http://127.0.0.1:5000/esp-terminal?after=${cursor}`);
         if (!response.ok) throw new Error('Failed to fetch serial data');
         
         const data = await response.json();
-        const terminal = document.querySelector('.esp-terminal-content');
+        if (data.missed > 0) {
+            console.warn(`Serial buffer overrun, ${data.missed} lines dropped`);
+        }
+        window.serialCursor = data.cursor;
+        processSerialData(data.lines);
+    } catch (error) {
+        console.error('Error fetching serial data:', error);
+    }
+}
 
-        if (data && data.length > 0) {
-            console.log('Received serial data:', data);
-            displaySerialData(data);
-            data.forEach(line => {
-                handleESPTerminalData(line); // Handle each line of data
-            });
+// Function to receive data pushed from /esp-stream, falling back to polling
+function startSerialStream() {
+    if (!window.EventSource) {
+        window.telemetryInterval = setInterval(fetchSerialData, 500);
+        return;
+    }
+
+    // EventSource reconnects on its own and resumes from the last event id
+    const source = new EventSource('http://127.0.0.1:5000/esp-stream');
+    source.onmessage = (event) => {
+        try {
+            processSerialData(JSON.parse(event.data));
+        } catch (error) {
+            console.error('Error processing serial stream data:', error);
         }
-        
-        if (terminal && data.length > 0) {
-            // Add new messages with formatting
-            data.forEach(message => {
-                terminal.innerHTML += formatTerminalMessage(message);
-            });
+    };
+    source.addEventListener('overrun', (event) => {
+        console.warn(`Serial stream overrun, ${event.data} lines dropped`);
+    });
+    window.serialStream = source;
+}
 
-            
-            // Auto-scroll to bottom
-            terminal.scrollTop = terminal.scrollHeight;
-            
-            // Keep only last 100 lines to prevent excessive memory usage
-            const lines = terminal.getElementsByClassName('terminal-line');
-            while (lines.length > 100) {
-                lines[0].remove();
-            }
+// Function to handle a batch of serial lines
+function processSerialData(data) {
+    const terminal = document.querySelector('.esp-terminal-content');
+
+    if (data && data.length > 0) {
+        console.log('Received serial data:', data);
+        displaySerialData(data);
+        data.forEach(line => {
+            handleESPTerminalData(line); // Handle each line of data
+        });
+    }
+    
+    if (terminal && data.length > 0) {
+        // Add new messages with formatting
+        data.forEach(message => {
+            terminal.innerHTML += formatTerminalMessage(message);
+        });
+
+        
+        // Auto-scroll to bottom
+        terminal.scrollTop = terminal.scrollHeight;
+        
+        // Keep only last 100 lines to prevent excessive memory usage
+        const lines = terminal.getElementsByClassName('terminal-line');
+        while (lines.length > 100) {
+            lines[0].remove();
         }
-    } catch (error) {
-        console.error('Error fetching serial data:', error);
     }
 }
 
@@ -3907,6 +3926,14 @@ function handleDroneMessage(parsedMsg) {
                 handleDroneHeartbeat(source);
                 break;
 
+            case 'LINK':
+                // The backend forwards only liveness changes, not every heartbeat
+                if (payload === 'DOWN') {
+                    state.isConnected = false;
+                    updateDroneUI(source);
+                }
+                break;
+
             case 'RES':
                 // Handle response messages
                 if (fullPayload && fullPayload.includes(',')) {
@@ -4725,8 +4752,11 @@ class SettingsMenu {
         });
         
         // Apply Communication Settings
+        // Polling is only used when the push stream is unavailable
         clearInterval(window.telemetryInterval);
-        window.telemetryInterval = setInterval(fetchSerialData, this.currentSettings.communication.telemetryRate);
+        if (!window.serialStream) {
+            window.telemetryInterval = setInterval(fetchSerialData, this.currentSettings.communication.telemetryRate);
+        }
     }
 }
 
@@ -0,0 +1,389 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from telemetry import parse_frame
+
+
+class SerialReader:
+    """Read newline framed data from a serial port on a dedicated thread.
+
+    Bytes are pulled in bulk (everything in ``in_waiting`` per call) into a
+    reusable bytearray and split into frames incrementally. Frames are decoded
+    leniently so a single bad byte never discards a whole line. While no port
+    is attached the thread sleeps on an event instead of spinning.
+    """
+
+    def __init__(self, on_lines, name="serial-reader", read_timeout=0.1, max_frame=4096):
+        self.on_lines = on_lines
+        self.name = name
+        self.read_timeout = read_timeout
+        self.max_frame = max_frame
+        self.port = None
+        self.thread = None
+        self._port_ready = threading.Event()
+        self._stop = threading.Event()
+
+    def start(self):
+        """Start the reader thread if it is not already running"""
+        if self.thread and self.thread.is_alive():
+            return
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=1.0):
+        """Stop the reader thread"""
+        self._stop.set()
+        self._port_ready.set()
+        if self.thread:
+            self.thread.join(timeout=timeout)
+
+    def attach(self, port):
+        """Start reading from ``port``"""
+        # A blocking read without timeout would never notice detach/stop
+        if port.timeout is None:
+            port.timeout = self.read_timeout
+        self.port = port
+        self._port_ready.set()
+
+    def detach(self):
+        """Stop reading from the current port and go idle"""
+        self.port = None
+        self._port_ready.clear()
+
+    def _run(self):
+        buffer = bytearray()
+        while not self._stop.is_set():
+            port = self.port
+            if port is None or not port.is_open:
+                buffer.clear()
+                self._port_ready.wait(0.5)
+                continue
+
+            try:
+                chunk = port.read(port.in_waiting or 1)
+            except Exception as e:
+                if self.port is port:
+                    print(f"Error reading from serial port: {e}")
+                    self._stop.wait(0.5)
+                continue
+
+            if not chunk:
+                continue
+
+            read_time = datetime.now()
+            buffer += chunk
+            lines = self._split_frames(buffer)
+            if lines:
+                try:
+                    self.on_lines(lines, read_time)
+                except Exception as e:
+                    print(f"Error handling serial data: {e}")
+
+    def _split_frames(self, buffer):
+        """Remove all complete frames from ``buffer`` and return them decoded"""
+        lines = []
+        start = 0
+        while True:
+            end = buffer.find(b'\n', start)
+            if end < 0:
+                break
+            frame = buffer[start:end].strip()
+            if frame:
+                lines.append(frame.decode('utf-8', errors='replace'))
+            start = end + 1
+        if start:
+            del buffer[:start]
+
+        # Never let a missing terminator grow the buffer without bound
+        if len(buffer) > self.max_frame:
+            frame = bytes(buffer).strip()
+            if frame:
+                lines.append(frame.decode('utf-8', errors='replace'))
+            buffer.clear()
+        return lines
+
+
+# Command priorities, highest first
+EMERGENCY = 0
+MISSION = 1
+TELEMETRY = 2
+PRIORITY_NAMES = {'emergency': EMERGENCY, 'mission': MISSION, 'telemetry': TELEMETRY}
+
+# Default rate limits in commands per second, sized for an ESP-NOW link
+DEFAULT_RATE = 200.0
+DEFAULT_BURST = 20
+DEFAULT_DRONE_RATE = 50.0
+DEFAULT_DRONE_BURST = 10
+
+EMERGENCY_COMMANDS = {'LAND', 'DISARM', 'RTL', 'CLOSE'}
+EMERGENCY_MODES = {'LAND', 'RTL', 'SMART_RTL'}
+# Commands that end a drone's flight; anything still queued for it is void
+ABORT_COMMANDS = {'LAND', 'DISARM', 'RTL'}
+# Absolute setpoints where only the latest value matters. MTL and NED are
+# relative moves, so every one of them has to go out.
+SUPERSEDED_COMMANDS = {'YAW', 'RCOV'}
+
+
+def command_priority(frame):
+    """Default priority of a parsed command frame"""
+    if frame is None:
+        return MISSION
+    if frame.command in EMERGENCY_COMMANDS or (frame.command == 'SET_MODE' and frame.payload in EMERGENCY_MODES):
+        return EMERGENCY
+    if frame.command == 'REQ':
+        return TELEMETRY
+    return MISSION
+
+
+def aborts_flight(frame):
+    """Whether a parsed command frame lands, returns or disarms its drone"""
+    if frame is None or not frame.drone:
+        return False
+    return frame.command in ABORT_COMMANDS or (frame.command == 'SET_MODE' and frame.payload in EMERGENCY_MODES)
+
+
+def coalesce_key(frame):
+    """Key under which a newer command replaces a queued one, or None"""
+    if frame is None:
+        return None
+    if frame.command in SUPERSEDED_COMMANDS:
+        return (frame.drone, frame.command)
+    if frame.command == 'REQ':
+        return (frame.drone, frame.command, frame.payload)
+    return None
+
+
+class TokenBucket:
+    """Allow ``rate`` events per second with bursts of up to ``burst``"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+
+    def refill(self, now):
+        # A bucket made after ``now`` was read must not lose tokens
+        if now > self.stamp:
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+
+    def wait_time(self):
+        """Seconds until a whole token is available"""
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class CommandWriter:
+    """Own writes to a serial port and drain a prioritized command queue.
+
+    Commands are queued by priority (emergency, then mission and manual
+    commands, then telemetry requests) and written by a single thread, so
+    concurrent callers never interleave on the port and a LAND never waits
+    behind telemetry polls. A LAND, RTL or DISARM also drops whatever is
+    still queued for that drone, so no mission step follows it out. A
+    queued absolute setpoint (YAW, RCOV) or REQ that is superseded before
+    it goes out is replaced in place. Non-emergency
+    commands are held to a global and a per-drone rate so the radio link
+    is not flooded; everything that may go out at once is written in one
+    call. ``on_write(lines, monotonic_time)`` is told about every write.
+    """
+
+    def __init__(self, name="serial-writer", rate=DEFAULT_RATE, burst=DEFAULT_BURST,
+                 drone_rate=DEFAULT_DRONE_RATE, drone_burst=DEFAULT_DRONE_BURST, on_write=None):
+        self.name = name
+        self.on_write = on_write
+        self.port = None
+        self.queues = [deque() for _ in PRIORITY_NAMES]
+        self.pending = {}  # coalesce key -> queued entry
+        self.cond = threading.Condition()
+        self.thread = None
+        self.running = False
+        self.stats = {'queued': 0, 'written': 0, 'coalesced': 0, 'dropped': 0, 'errors': 0}
+        self.configure(rate=rate, burst=burst, drone_rate=drone_rate, drone_burst=drone_burst)
+
+    def configure(self, rate=None, burst=None, drone_rate=None, drone_burst=None):
+        """Change the rate limits (commands per second; 0 disables a limit)"""
+        with self.cond:
+            if rate is not None:
+                self.rate = float(rate)
+            if burst is not None:
+                self.burst = max(1, int(burst))
+            if drone_rate is not None:
+                self.drone_rate = float(drone_rate)
+            if drone_burst is not None:
+                self.drone_burst = max(1, int(drone_burst))
+            self.global_bucket = TokenBucket(self.rate, self.burst) if self.rate > 0 else None
+            self.drone_buckets = {}
+            self.cond.notify_all()
+
+    def start(self):
+        """Start the writer thread if it is not already running"""
+        if self.thread and self.thread.is_alive():
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=1.0):
+        """Stop the writer thread"""
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        if self.thread:
+            self.thread.join(timeout=timeout)
+
+    def attach(self, port):
+        """Start writing to ``port``"""
+        with self.cond:
+            self.port = port
+            self.cond.notify_all()
+
+    def detach(self):
+        """Stop writing and drop anything still queued for the old port"""
+        with self.cond:
+            self.port = None
+            self.stats['dropped'] += sum(len(queue) for queue in self.queues)
+            for queue in self.queues:
+                queue.clear()
+            self.pending.clear()
+
+    def submit(self, commands, priority=None):
+        """Queue command strings; ``priority`` overrides the per-command default.
+
+        Returns the commands that were queued as new entries, leaving out
+        those that only replaced a queued command.
+        """
+        queued = []
+        with self.cond:
+            if not self.port or not self.port.is_open:
+                raise Exception("Serial port not connected")
+            for line in commands:
+                frame = parse_frame(line)
+                key = coalesce_key(frame)
+                level = command_priority(frame) if priority is None else priority
+                entry = self.pending.get(key) if key else None
+                if entry is not None:
+                    # Send the newest value, from the queue of its own priority
+                    entry[1] = line
+                    if entry[3] != level:
+                        self.queues[entry[3]].remove(entry)
+                        self.queues[level].append(entry)
+                        entry[3] = level
+                    self.stats['coalesced'] += 1
+                    continue
+                entry = [key, line, frame.drone if frame else None, level]
+                if level == EMERGENCY and aborts_flight(frame):
+                    self._drop_drone(frame.drone)
+                self.queues[level].append(entry)
+                if key:
+                    self.pending[key] = entry
+                self.stats['queued'] += 1
+                queued.append(line)
+            self.cond.notify_all()
+        return queued
+
+    def _drop_drone(self, drone):
+        """Remove a drone's queued non-emergency commands"""
+        for level in (MISSION, TELEMETRY):
+            queue = self.queues[level]
+            kept = deque(entry for entry in queue if entry[2] != drone)
+            for entry in queue:
+                if entry[2] == drone and entry[0]:
+                    self.pending.pop(entry[0], None)
+            self.stats['dropped'] += len(queue) - len(kept)
+            self.queues[level] = kept
+
+    def status(self):
+        """Queue depths, limits and counters"""
+        with self.cond:
+            return {
+                'connected': bool(self.port and self.port.is_open),
+                'depth': {name: len(self.queues[level]) for name, level in PRIORITY_NAMES.items()},
+                'rate': self.rate,
+                'burst': self.burst,
+                'drone_rate': self.drone_rate,
+                'drone_burst': self.drone_burst,
+                **self.stats,
+            }
+
+    def _drone_bucket(self, drone):
+        bucket = self.drone_buckets.get(drone)
+        if bucket is None:
+            bucket = self.drone_buckets[drone] = TokenBucket(self.drone_rate, self.drone_burst)
+        return bucket
+
+    def _take_batch(self):
+        """Remove everything allowed out now; returns (lines, seconds to wait)"""
+        now = time.monotonic()
+        batch = [entry[1] for entry in self.queues[EMERGENCY]]
+        for entry in self.queues[EMERGENCY]:
+            if entry[0]:
+                self.pending.pop(entry[0], None)
+        self.queues[EMERGENCY].clear()
+
+        if self.global_bucket:
+            self.global_bucket.refill(now)
+        drone_ready = None  # soonest a held command's drone has a token again
+        for level in (MISSION, TELEMETRY):
+            queue = self.queues[level]
+            remaining = deque()
+            blocked = set()
+            while queue:
+                entry = queue.popleft()
+                key, line, drone, _ = entry
+                bucket = None
+                if drone and self.drone_rate > 0:
+                    bucket = self._drone_bucket(drone)
+                    if drone not in blocked:
+                        bucket.refill(now)
+                    if drone in blocked or bucket.tokens < 1:
+                        # Keep this drone's commands in order behind the blocked one
+                        blocked.add(drone)
+                        remaining.append(entry)
+                        drone_wait = bucket.wait_time()
+                        drone_ready = drone_wait if drone_ready is None else min(drone_ready, drone_wait)
+                        continue
+                if self.global_bucket and self.global_bucket.tokens < 1:
+                    # This one only waits for the global token, as may the rest
+                    drone_ready = 0.0
+                    remaining.append(entry)
+                    remaining.extend(queue)
+                    queue.clear()
+                    break
+                if self.global_bucket:
+                    self.global_bucket.tokens -= 1
+                if bucket:
+                    bucket.tokens -= 1
+                if key:
+                    self.pending.pop(key, None)
+                batch.append(line)
+            self.queues[level] = remaining
+        wait = None
+        if drone_ready is not None:
+            # A held command needs both its drone's token and a global one
+            wait = max(drone_ready, self.global_bucket.wait_time() if self.global_bucket else 0.0)
+        return batch, wait
+
+    def _run(self):
+        while True:
+            with self.cond:
+                if not self.running:
+                    return
+                port = self.port
+                batch, wait = self._take_batch() if port else ([], None)
+                if not batch:
+                    self.cond.wait(wait if wait is not None else 0.5)
+                    continue
+
+            try:
+                port.write(''.join(f"{line}\n" for line in batch).encode())
+                port.flush()
+                self.stats['written'] += len(batch)
+                if self.on_write:
+                    self.on_write(batch, time.monotonic())
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"Error writing to serial port: {e}")
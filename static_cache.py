@@ -0,0 +1,101 @@
+import gzip
+import os
+from collections import OrderedDict
+from threading import Lock
+from urllib.parse import unquote
+
+CONTENT_TYPES = {
+    '.html': 'text/html',
+    '.js': 'application/javascript',
+    '.css': 'text/css',
+    '.json': 'application/json',
+    '.svg': 'image/svg+xml',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.ico': 'image/x-icon',
+}
+COMPRESSIBLE_TYPES = {'text/html', 'application/javascript', 'text/css', 'application/json', 'image/svg+xml'}
+MIN_GZIP_BYTES = 1024
+
+
+class StaticAsset:
+    """One static file: its validators and, if cached, its bytes"""
+
+    def __init__(self, path, stat):
+        self.path = path
+        self.key = (stat.st_mtime_ns, stat.st_size)
+        self.size = stat.st_size
+        self.etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        self.gzip_etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}-gz"'
+        self.content_type = CONTENT_TYPES.get(os.path.splitext(path)[1].lower())
+        self.body = None  # None for files too large to keep in memory
+        self.gzip_body = None
+
+    def load(self):
+        with open(self.path, 'rb') as f:
+            self.body = f.read()
+        if self.content_type in COMPRESSIBLE_TYPES and len(self.body) >= MIN_GZIP_BYTES:
+            compressed = gzip.compress(self.body, compresslevel=9, mtime=0)
+            if len(compressed) < len(self.body):
+                self.gzip_body = compressed
+
+    @property
+    def cached_bytes(self):
+        return len(self.body or b'') + len(self.gzip_body or b'')
+
+
+class StaticCache:
+    """Serve static UI files from memory.
+
+    Files up to ``max_file_bytes`` are read once and kept, together with a
+    gzip variant for text types, until their mtime or size changes. The
+    least recently used files are dropped once the cache holds more than
+    ``max_total_bytes``. Larger files are only stat'ed so the caller can
+    stream them straight from disk.
+    """
+
+    def __init__(self, root, max_file_bytes=1024 * 1024, max_total_bytes=32 * 1024 * 1024):
+        self.root = os.path.abspath(root)
+        self.max_file_bytes = max_file_bytes
+        self.max_total_bytes = max_total_bytes
+        self.assets = OrderedDict()
+        self.total_bytes = 0
+        self.lock = Lock()
+
+    def resolve(self, url_path):
+        """Absolute file path for a URL path, or None if it leaves the root"""
+        relative = unquote(url_path).lstrip('/') or 'index.html'
+        path = os.path.abspath(os.path.join(self.root, relative))
+        if os.path.commonpath([path, self.root]) != self.root:
+            return None
+        return path
+
+    def get(self, path):
+        """Return the StaticAsset for ``path``; raises OSError if it is missing"""
+        stat = os.stat(path)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            asset = self.assets.get(path)
+            if asset is not None and asset.key == key:
+                self.assets.move_to_end(path)
+                return asset
+
+        asset = StaticAsset(path, stat)
+        if asset.size > self.max_file_bytes:
+            return asset
+        asset.load()
+
+        with self.lock:
+            old = self.assets.pop(path, None)
+            if old is not None:
+                self.total_bytes -= old.cached_bytes
+            self.assets[path] = asset
+            self.total_bytes += asset.cached_bytes
+            while self.total_bytes > self.max_total_bytes and len(self.assets) > 1:
+                _, evicted = self.assets.popitem(last=False)
+                self.total_bytes -= evicted.cached_bytes
+        return asset
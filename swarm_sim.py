@@ -0,0 +1,332 @@
+import argparse
+import heapq
+import http.client
+import itertools
+import json
+import math
+import random
+import time
+from threading import Thread, Lock, Event
+from urllib.parse import urlsplit
+
+from gcs_emulator import GcsEmulator
+from mission_format import read_mission
+from port_inventory import VERIFY_COMMAND
+from telemetry import parse_frame
+
+# Metres per degree of latitude, for turning local positions into LOC replies
+METRES_PER_DEGREE = 111320.0
+
+
+def default_drone_ids(count):
+    """MCU, CD1, CD2, ... like the real swarm"""
+    return ['MCU'] + [f'CD{i}' for i in range(1, count)]
+
+
+class SimulatedDrone:
+    """Kinematic state of one simulated drone.
+
+    Commands set a target that ``step`` flies towards at ``max_speed``;
+    ``telemetry`` formats the current state as a RES payload.
+    """
+
+    def __init__(self, drone_id, x=0.0, y=0.0, heading=0.0):
+        self.drone_id = drone_id
+        self.home = (x, y)
+        self.position = [x, y, 0.0]
+        self.target = [x, y, 0.0]
+        self.velocity = [0.0, 0.0, 0.0]
+        self.heading = heading
+        self.armed = False
+        self.mode = 'STABILIZE'
+        self.battery = 16.8
+
+    def apply(self, command, payload):
+        """Act on a command; returns False if it was not understood"""
+        values = payload.split(',') if payload else []
+        try:
+            if command == 'ARM':
+                self.armed = True
+                self.mode = payload or self.mode
+            elif command in ('DISARM', 'CLOSE'):
+                self.armed = False
+            elif command == 'SET_MODE':
+                self.mode = payload
+                if payload in ('RTL', 'SMART_RTL'):
+                    self.target = [self.home[0], self.home[1], self.target[2]]
+                elif payload == 'LAND':
+                    self.target[2] = 0.0
+            elif command == 'LAUNCH':
+                self.target[2] = float(values[0]) if values else 2.0
+            elif command == 'LAND':
+                self.mode = 'LAND'
+                self.target = [self.position[0], self.position[1], 0.0]
+            elif command == 'RTL':
+                self.mode = 'RTL'
+                self.target = [self.home[0], self.home[1], self.target[2]]
+            elif command == 'MTL':
+                # Distance along a heading from the current target, at an altitude
+                distance, altitude, heading = (float(v) for v in values[:3])
+                angle = math.radians(heading)
+                self.target = [self.target[0] + distance * math.cos(angle),
+                               self.target[1] + distance * math.sin(angle), altitude]
+                self.heading = heading % 360
+            elif command == 'NED':
+                north, east, down = (float(v) for v in values[:3])
+                self.target = [self.target[0] + north, self.target[1] + east, self.target[2] - down]
+            elif command == 'YAW':
+                self.heading = float(values[0]) % 360
+            elif command in ('RCOV', 'INIT', 'REQ'):
+                pass
+            else:
+                return False
+        except (ValueError, IndexError):
+            return False
+        return True
+
+    def step(self, dt, max_speed):
+        """Fly towards the target for ``dt`` seconds"""
+        if not self.armed and self.position[2] <= 0:
+            self.velocity = [0.0, 0.0, 0.0]
+            return
+        delta = [t - p for t, p in zip(self.target, self.position)]
+        distance = math.sqrt(sum(d * d for d in delta))
+        reach = max_speed * dt
+        if distance <= reach or distance == 0:
+            moved = delta
+        else:
+            moved = [d * reach / distance for d in delta]
+        self.position = [p + m for p, m in zip(self.position, moved)]
+        self.velocity = [m / dt for m in moved] if dt > 0 else [0.0, 0.0, 0.0]
+        if self.mode == 'LAND' and self.position[2] <= 0.05:
+            self.position[2] = 0.0
+            self.armed = False
+        self.battery = max(13.2, self.battery - (0.0005 if self.armed else 0.00001) * dt)
+
+    def telemetry(self, data_type, home_lat=0.0, home_lon=0.0):
+        """RES payload for a REQ, or None for an unknown data type"""
+        x, y, z = self.position
+        if data_type == 'LOC':
+            lat = home_lat + y / METRES_PER_DEGREE
+            lon = home_lon + x / (METRES_PER_DEGREE * max(0.01, math.cos(math.radians(home_lat))))
+            return f"{lat:.7f},{lon:.7f},{z:.3f}"
+        if data_type == 'GPS':
+            return "3,12"
+        if data_type == 'BATT':
+            level = round(100 * (self.battery - 13.2) / (16.8 - 13.2))
+            return f"{self.battery:.3f},{(8.0 if self.armed else 0.4):.2f},{level}"
+        if data_type == 'ATTITUDE':
+            yaw = math.radians((self.heading + 180) % 360 - 180)
+            return f"0.0,0.0,{yaw:.4f},{self.heading:.0f}"
+        if data_type == 'SPEED':
+            vx, vy, vz = self.velocity
+            ground = math.hypot(vx, vy)
+            return f"{ground:.3f},{ground:.3f},[{vx:.2f}, {vy:.2f}, {vz:.2f}]"
+        if data_type in ('MODE', 'GET_MODE'):
+            return self.mode
+        if data_type in ('ARMED', 'IS_ARMED'):
+            return str(self.armed)
+        if data_type == 'IS_CONNECTED':
+            return "1"
+        return None
+
+
+class SwarmSimulator(GcsEmulator):
+    """A GCS dongle with a simulated swarm behind it, on a pty.
+
+    Behaves like the ESP32_GCS firmware: every line from the backend is
+    echoed, the verify command is answered with OK and other commands get
+    "Last Packet Send Status: Delivery Success" (or "Delivery Fail" when the
+    simulated link drops them). Drones send ``HB`` at ``hb_rate``, answer
+    ``REQ`` with ``RES`` after ``latency`` plus up to ``jitter`` seconds and
+    fly ``MTL``/``NED``/``LAUNCH``/``LAND`` moves at ``max_speed``. ``loss``
+    is the chance of dropping each packet in either direction.
+    """
+
+    def __init__(self, drones, hb_rate=1.0, loss=0.0, jitter=0.0, latency=0.005,
+                 max_speed=5.0, tick=0.05, home=(0.0, 0.0), seed=None):
+        super().__init__()
+        self.drones = {drone.drone_id: drone for drone in drones}
+        self.hb_rate = hb_rate
+        self.loss = loss
+        self.jitter = jitter
+        self.latency = latency
+        self.max_speed = max_speed
+        self.tick = tick
+        self.home = home
+        self.random = random.Random(seed)
+        self.events = []  # heap of (due, seq, lines)
+        self.event_lock = Lock()
+        self._seq = itertools.count()
+        self._wake = Event()
+        self.sim_thread = None
+        self.stats = {'commands': 0, 'delivered': 0, 'lost_up': 0, 'lost_down': 0,
+                      'replies': 0, 'heartbeats': 0, 'unknown': 0}
+
+    def start(self):
+        super().start()
+        if self.sim_thread and self.sim_thread.is_alive():
+            return
+        self.sim_thread = Thread(target=self._sim_loop, name="swarm-sim", daemon=True)
+        self.sim_thread.start()
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self.sim_thread:
+            self.sim_thread.join(timeout=1.0)
+        super().close()
+
+    def _schedule(self, delay, lines):
+        with self.event_lock:
+            heapq.heappush(self.events, (time.monotonic() + delay, next(self._seq), lines))
+        self._wake.set()
+
+    def _dropped(self):
+        return self.loss > 0 and self.random.random() < self.loss
+
+    def _reply_delay(self):
+        return self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def handle_command(self, line):
+        self.stats['commands'] += 1
+        if line == VERIFY_COMMAND:
+            self.write_lines([line, "OK"])
+            return
+        frame = parse_frame(line)
+        drone = self.drones.get(frame.drone) if frame else None
+        if drone is None:
+            self.stats['unknown'] += 1
+            self.write_lines([line, f"Target{frame.drone if frame else ''}Invalid target specified"])
+            return
+        if self._dropped():
+            self.stats['lost_up'] += 1
+            self.write_lines([line])
+            self._schedule(self._reply_delay(), ["Last Packet Send Status: Delivery Fail"])
+            return
+        self.stats['delivered'] += 1
+        self.write_lines([line])
+        self._schedule(self._reply_delay(), ["Last Packet Send Status: Delivery Success"])
+        if frame.command == 'REQ':
+            payload = drone.telemetry(frame.payload, *self.home)
+            if payload is not None:
+                self._send_from(drone, 'RES', payload, self._reply_delay() * 2)
+        else:
+            drone.apply(frame.command, frame.payload)
+
+    def _send_from(self, drone, command, payload, delay=0.0):
+        """Queue a frame from a drone, subject to loss on the way back"""
+        if self._dropped():
+            self.stats['lost_down'] += 1
+            return
+        if command == 'HB':
+            self.stats['heartbeats'] += 1
+        else:
+            self.stats['replies'] += 1
+        self._schedule(delay, [f"{{S:{drone.drone_id};C:{command};P:{payload}}}"])
+
+    def _sim_loop(self):
+        now = time.monotonic()
+        interval = 1.0 / self.hb_rate if self.hb_rate else None
+        # Spread the heartbeats so the swarm does not beat in lockstep
+        next_hb = {drone_id: now + self.random.uniform(0, interval or 0) for drone_id in self.drones}
+        last_step = now
+        next_step = now + self.tick
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now >= next_step:
+                dt = now - last_step
+                for drone in self.drones.values():
+                    drone.step(dt, self.max_speed)
+                last_step = now
+                next_step = now + self.tick
+            if interval:
+                for drone_id, due in next_hb.items():
+                    if now >= due:
+                        self._send_from(self.drones[drone_id], 'HB', '1', self._reply_delay())
+                        next_hb[drone_id] = due + interval if due + interval > now else now + interval
+
+            due_lines = []
+            with self.event_lock:
+                while self.events and self.events[0][0] <= now:
+                    due_lines.extend(heapq.heappop(self.events)[2])
+                upcoming = self.events[0][0] if self.events else next_step
+            if due_lines:
+                try:
+                    self.write_lines(due_lines)
+                except OSError:
+                    pass
+            wake_at = min([upcoming, next_step] + ([min(next_hb.values())] if interval else []))
+            self._wake.wait(max(0.0, wake_at - time.monotonic()))
+            self._wake.clear()
+
+    def status(self):
+        return {
+            'device': self.device,
+            'drones': len(self.drones),
+            'stats': dict(self.stats),
+            'positions': {drone_id: [round(v, 2) for v in drone.position]
+                          for drone_id, drone in self.drones.items()},
+        }
+
+
+def drones_from_mission(path):
+    """Drones named and placed as in the first frame of a mission file"""
+    mission = read_mission(path)
+    drones = []
+    for drone_id, drone in mission['drones'].items():
+        frames = drone.get('frames') or [{}]
+        position = frames[0].get('position') or {}
+        drones.append(SimulatedDrone(drone_id, position.get('x', 0.0), position.get('y', 0.0),
+                                     frames[0].get('heading', 0.0)))
+    return drones
+
+
+def connect_backend(url, device):
+    """Ask a running backend to verify and connect to the simulator"""
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+    try:
+        connection.request('POST', '/verify_port', json.dumps({'port': device}),
+                           {'Content-Type': 'application/json'})
+        return json.loads(connection.getresponse().read())
+    finally:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a GCS dongle and a drone swarm on a pty")
+    parser.add_argument('--drones', type=int, default=5, help="Number of drones (MCU, CD1, ...)")
+    parser.add_argument('--mission', help="Take drone IDs and start positions from a mission file")
+    parser.add_argument('--hb-rate', type=float, default=1.0, help="Heartbeats per second per drone")
+    parser.add_argument('--loss', type=float, default=0.0, help="Packet loss probability, each direction")
+    parser.add_argument('--latency', type=float, default=0.005, help="Link latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Extra random latency up to this many seconds")
+    parser.add_argument('--max-speed', type=float, default=5.0, help="Drone speed in m/s")
+    parser.add_argument('--seed', type=int, help="Random seed for reproducible loss and jitter")
+    parser.add_argument('--connect', metavar='URL', help="Backend to connect, e.g. http://127.0.0.1:5000")
+    parser.add_argument('--report-interval', type=float, default=5.0)
+    args = parser.parse_args()
+
+    if args.mission:
+        drones = drones_from_mission(args.mission)
+    else:
+        drones = [SimulatedDrone(drone_id, x=2.0 * i) for i, drone_id in enumerate(default_drone_ids(args.drones))]
+    simulator = SwarmSimulator(drones, args.hb_rate, args.loss, args.jitter, args.latency,
+                               args.max_speed, seed=args.seed)
+    simulator.start()
+    print(f"Simulated GCS with {len(drones)} drones on {simulator.device}")
+    try:
+        if args.connect:
+            print(f"Backend: {connect_backend(args.connect, simulator.device)}")
+        while True:
+            time.sleep(args.report_interval)
+            print(json.dumps(simulator.stats))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.close()
+
+
+if __name__ == "__main__":
+    main()
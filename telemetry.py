@@ -0,0 +1,187 @@
+import re
+import time
+from collections import namedtuple
+from threading import Lock
+
+from metrics import REGISTRY
+
+# {T:MCU;C:ARM;P:GUIDED} (to a drone) or {S:CD1;C:RES;P:1,0} (from a drone).
+# Whitespace around separators is tolerated and the payload is optional.
+# search() rather than match() so frames glued to other text are still found.
+FRAME_PATTERN = re.compile(
+    r'\{\s*([TS])\s*:\s*([^;{}]*?)\s*;\s*C\s*:\s*([^;{}]*?)\s*(?:;\s*P\s*:\s*([^{}]*?)\s*)?\}'
+)
+MODE_PATTERN = re.compile(r'[A-Z][A-Z_]*')
+NUMBER_PATTERN = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+
+Frame = namedtuple('Frame', ['direction', 'drone', 'command', 'payload'])
+
+TELEMETRY_TYPES = ('LOC', 'GPS', 'BATT', 'ATTITUDE', 'SPEED', 'MODE', 'ARMED')
+
+FRAMES_PARSED = REGISTRY.counter('gcs_frames_parsed_total', "Protocol frames parsed from serial lines")
+PARSE_FAILURES = REGISTRY.counter('gcs_parse_failures_total', "Serial lines or payloads that failed to parse")
+HEARTBEAT_INTERVAL = REGISTRY.histogram('gcs_heartbeat_interval_seconds', "Time between heartbeats of a drone",
+                                        ['drone'], buckets=(0.1, 0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 2.0, 3.0, 5.0, 10.0))
+HEARTBEAT_JITTER = REGISTRY.gauge('gcs_heartbeat_jitter_seconds',
+                                  "Smoothed variation of a drone's heartbeat interval", ['drone'])
+
+
+def parse_frames(line):
+    """Return every well-formed frame in ``line`` (possibly none)"""
+    return [Frame(m.group(1), m.group(2), m.group(3), m.group(4) or '')
+            for m in FRAME_PATTERN.finditer(line)]
+
+
+def parse_frame(line):
+    """Return the first well-formed frame in ``line``, or None"""
+    match = FRAME_PATTERN.search(line)
+    if not match:
+        return None
+    return Frame(match.group(1), match.group(2), match.group(3), match.group(4) or '')
+
+
+def _numbers(payload, *counts):
+    values = [float(v) for v in NUMBER_PATTERN.findall(payload)]
+    if len(values) not in counts:
+        raise ValueError(f"expected {' or '.join(map(str, counts))} values in {payload!r}")
+    return values
+
+
+def decode_telemetry(data_type, payload):
+    """Decode a telemetry payload into a dict of state fields.
+
+    Raises ValueError when the payload does not fit the data type. Value
+    counts are checked exactly so an untyped reply can be told apart from
+    the other types as far as the protocol allows.
+    """
+    if data_type == 'LOC':
+        lat, lon, alt = _numbers(payload, 3)
+        return {'location': {'lat': lat, 'lon': lon, 'alt': alt}}
+    if data_type == 'GPS':
+        fix_type, satellites = _numbers(payload, 2)
+        if not (fix_type.is_integer() and satellites.is_integer()):
+            raise ValueError(f"expected integer GPS values in {payload!r}")
+        return {'gps': {'fix_type': int(fix_type), 'satellites': int(satellites)}}
+    if data_type == 'BATT':
+        voltage, current, level = _numbers(payload, 3)
+        return {'battery': {'voltage': voltage, 'current': current, 'level': level}}
+    if data_type == 'ATTITUDE':
+        pitch, roll, yaw, heading = _numbers(payload, 4)
+        return {'attitude': {'pitch': pitch, 'roll': roll, 'yaw': yaw, 'heading': heading}}
+    if data_type == 'SPEED':
+        values = _numbers(payload, 2, 5)
+        return {'speed': {'airspeed': values[0], 'groundspeed': values[1], 'velocity': values[2:]}}
+    if data_type == 'MODE':
+        if not MODE_PATTERN.fullmatch(payload):
+            raise ValueError(f"unexpected mode {payload!r}")
+        return {'mode': payload}
+    if data_type == 'ARMED':
+        value = payload.strip().lower()
+        if value not in ('1', '0', 'true', 'false'):
+            raise ValueError(f"unexpected armed state {payload!r}")
+        return {'armed': value in ('1', 'true')}
+    raise ValueError(f"unknown telemetry type {data_type!r}")
+
+
+class DroneStateTable:
+    """Live per-drone state built from frames read off the serial port.
+
+    Keeps the latest heartbeat, location, GPS, battery, attitude, speed,
+    mode and armed state for each drone, with the time each field was last
+    updated, and hands out a JSON-ready snapshot.
+    """
+
+    def __init__(self):
+        self.drones = {}
+        self.lock = Lock()
+        self.version = 0
+        self.frames_parsed = 0
+        self.parse_failures = 0
+
+    def _state(self, drone_id):
+        state = self.drones.get(drone_id)
+        if state is None:
+            state = self.drones[drone_id] = {'updated': {}}
+        return state
+
+    def ingest(self, lines, timestamp=None):
+        """Parse a batch of serial lines and apply every drone frame"""
+        now = timestamp.timestamp() if timestamp else time.time()
+        frames = []
+        failures = 0
+        for line in lines:
+            found = parse_frames(line)
+            if not found and '{' in line:
+                failures += 1
+            frames.extend(found)
+        if failures:
+            PARSE_FAILURES.inc(failures)
+        FRAMES_PARSED.inc(len(frames))
+
+        with self.lock:
+            self.parse_failures += failures
+            self.frames_parsed += len(frames)
+            for frame in frames:
+                if frame.direction == 'S':
+                    self._apply_frame(frame, now)
+        return frames
+
+    def _apply_frame(self, frame, now):
+        state = self._state(frame.drone)
+        if frame.command == 'HB':
+            last = state.get('last_heartbeat')
+            if last is not None and now > last:
+                self._heartbeat_interval(state, frame.drone, now - last)
+            state['last_heartbeat'] = now
+            state['updated']['heartbeat'] = now
+            self.version += 1
+        elif frame.command in TELEMETRY_TYPES:
+            self._apply_telemetry(state, frame.command, frame.payload, now)
+        elif frame.command == 'RES':
+            # Untyped reply; kept raw until something can tell what it answers
+            state['last_response'] = frame.payload
+            state['updated']['last_response'] = now
+            self.version += 1
+
+    def _heartbeat_interval(self, state, drone_id, interval):
+        # Interarrival jitter as in RFC 3550: a running mean of how much
+        # consecutive intervals differ
+        previous = state.get('heartbeat_interval')
+        jitter = state.get('heartbeat_jitter', 0.0)
+        if previous is not None:
+            jitter += (abs(interval - previous) - jitter) / 16
+        state['heartbeat_interval'] = interval
+        state['heartbeat_jitter'] = jitter
+        HEARTBEAT_INTERVAL.labels(drone_id).observe(interval)
+        HEARTBEAT_JITTER.labels(drone_id).set(jitter)
+
+    def _apply_telemetry(self, state, data_type, payload, now):
+        try:
+            fields = decode_telemetry(data_type, payload)
+        except ValueError:
+            self.parse_failures += 1
+            PARSE_FAILURES.inc()
+            return False
+        state.update(fields)
+        for key in fields:
+            state['updated'][key] = now
+        self.version += 1
+        return True
+
+    def apply_telemetry(self, drone_id, data_type, payload, timestamp=None):
+        """Apply a decoded telemetry value whose type is known from elsewhere"""
+        now = timestamp if timestamp is not None else time.time()
+        with self.lock:
+            return self._apply_telemetry(self._state(drone_id), data_type, payload, now)
+
+    def snapshot(self):
+        """Return a copy of the whole table as a JSON-ready dict"""
+        with self.lock:
+            return {
+                'version': self.version,
+                'time': time.time(),
+                'drones': {
+                    drone_id: {**state, 'updated': dict(state['updated'])}
+                    for drone_id, state in self.drones.items()
+                },
+            }
@@ -0,0 +1,239 @@
+import re
+import time
+from collections import deque
+from threading import Thread, Lock, Event
+
+from telemetry import TELEMETRY_TYPES, decode_telemetry
+
+# Some firmware confirms a typed reply with "{S:MCU;C:RES;P:Sent LOC data to GCS}"
+ACK_PATTERN = re.compile(r'Sent \w+ data')
+
+# Requests per second for each data type when polling a drone
+DEFAULT_RATES = {
+    'LOC': 1.0,
+    'GPS': 0.2,
+    'BATT': 0.2,
+    'ATTITUDE': 2.0,
+    'SPEED': 1.0,
+    'MODE': 0.5,
+    'ARMED': 0.5,
+}
+
+
+class TelemetryPoller:
+    """Poll drones for telemetry from the server instead of the UI.
+
+    Each drone gets ``REQ`` frames for every data type at its configured rate.
+    Up to ``window`` requests per drone are kept in flight and everything due
+    at the same moment goes out in a single serial write. ``RES`` replies carry
+    no type tag, so they are matched to the oldest outstanding request of that
+    drone whose type the payload decodes as; typed replies such as ``LOC``
+    resolve the oldest request of their type. Requests skipped over that way or
+    left unanswered after ``timeout`` seconds count as lost. Decoded values
+    are passed to ``on_value(drone_id, data_type, payload, timestamp)``.
+    """
+
+    def __init__(self, send, on_value, rates=None, window=4, timeout=1.0):
+        self.send = send
+        self.on_value = on_value
+        self.rates = dict(DEFAULT_RATES if rates is None else rates)
+        self.window = window
+        self.timeout = timeout
+        self.drones = set()
+        self.pending = {}  # drone_id -> deque of [data_type, sent_at]
+        self.next_due = {}  # (drone_id, data_type) -> monotonic deadline
+        self.stats = {}
+        self.lock = Lock()
+        self.thread = None
+        self.running = False
+        self.send_error = None
+        self._wake = Event()
+
+    def _drone_stats(self, drone_id):
+        stats = self.stats.get(drone_id)
+        if stats is None:
+            stats = self.stats[drone_id] = {
+                'sent': 0, 'answered': 0, 'lost': 0, 'invalid': 0, 'unsolicited': 0,
+                'rtt_last': None, 'rtt_avg': None,
+            }
+        return stats
+
+    def start(self):
+        """Start the polling thread"""
+        if self.thread and self.thread.is_alive():
+            return
+        self.running = True
+        self.thread = Thread(target=self._run, name="telemetry-poller", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=1.0):
+        """Stop the polling thread"""
+        self.running = False
+        self._wake.set()
+        if self.thread:
+            self.thread.join(timeout=timeout)
+
+    def configure(self, drones=None, rates=None, window=None, timeout=None):
+        """Update which drones are polled and how often"""
+        with self.lock:
+            if drones is not None:
+                for drone_id, enabled in drones.items():
+                    if enabled:
+                        self.drones.add(drone_id)
+                    else:
+                        self.drones.discard(drone_id)
+                        self.pending.pop(drone_id, None)
+            if rates is not None:
+                for data_type, rate in rates.items():
+                    if data_type not in TELEMETRY_TYPES:
+                        raise ValueError(f"Unknown telemetry type: {data_type}")
+                    self.rates[data_type] = float(rate)
+            if window is not None:
+                self.window = max(1, int(window))
+            if timeout is not None:
+                self.timeout = float(timeout)
+        self._wake.set()
+
+    def status(self):
+        """Current configuration and per-drone statistics"""
+        with self.lock:
+            return {
+                'running': self.running,
+                'drones': sorted(self.drones),
+                'rates': dict(self.rates),
+                'window': self.window,
+                'timeout': self.timeout,
+                'in_flight': {drone_id: len(queue) for drone_id, queue in self.pending.items()},
+                'stats': {drone_id: dict(stats) for drone_id, stats in self.stats.items()},
+            }
+
+    def note_request(self, drone_id, data_type):
+        """Track a REQ sent by someone else so its reply is not misattributed"""
+        if data_type not in TELEMETRY_TYPES:
+            return
+        with self.lock:
+            self.pending.setdefault(drone_id, deque()).append([data_type, time.monotonic()])
+            self._drone_stats(drone_id)['sent'] += 1
+
+    def on_frames(self, frames, timestamp=None):
+        """Correlate RES frames read from the serial port with pending requests"""
+        now = time.monotonic()
+        wall = timestamp.timestamp() if timestamp else time.time()
+        decoded = []
+        with self.lock:
+            for frame in frames:
+                if frame.direction != 'S':
+                    continue
+                if frame.command in TELEMETRY_TYPES:
+                    # Firmware that tags its replies needs no guessing
+                    self._match_typed(frame.drone, frame.command, now)
+                elif frame.command == 'RES' and not ACK_PATTERN.match(frame.payload):
+                    data_type = self._match_response(frame.drone, frame.payload, now)
+                    if data_type:
+                        decoded.append((frame.drone, data_type, frame.payload))
+        if decoded:
+            self._wake.set()
+        for drone_id, data_type, payload in decoded:
+            self.on_value(drone_id, data_type, payload, wall)
+
+    def _match_typed(self, drone_id, data_type, now):
+        queue = self.pending.get(drone_id)
+        stats = self._drone_stats(drone_id)
+        self._expire(drone_id, now)
+        for i, (pending_type, sent_at) in enumerate(queue or ()):
+            if pending_type == data_type:
+                del queue[i]
+                self._record_answer(stats, now - sent_at)
+                return
+        stats['unsolicited'] += 1
+
+    def _record_answer(self, stats, rtt):
+        stats['answered'] += 1
+        stats['rtt_last'] = rtt
+        stats['rtt_avg'] = rtt if stats['rtt_avg'] is None else 0.9 * stats['rtt_avg'] + 0.1 * rtt
+
+    def _match_response(self, drone_id, payload, now):
+        queue = self.pending.get(drone_id)
+        stats = self._drone_stats(drone_id)
+        self._expire(drone_id, now)
+        if not queue:
+            stats['unsolicited'] += 1
+            return None
+
+        for i, (data_type, sent_at) in enumerate(queue):
+            try:
+                decode_telemetry(data_type, payload)
+            except ValueError:
+                continue
+            # Replies arrive in order, so anything before this one was lost
+            for _ in range(i):
+                queue.popleft()
+                stats['lost'] += 1
+            queue.popleft()
+            self._record_answer(stats, now - sent_at)
+            return data_type
+
+        # Nothing fits; assume it answered the oldest request with junk
+        queue.popleft()
+        stats['invalid'] += 1
+        return None
+
+    def _expire(self, drone_id, now):
+        queue = self.pending.get(drone_id)
+        while queue and now - queue[0][1] > self.timeout:
+            queue.popleft()
+            self._drone_stats(drone_id)['lost'] += 1
+
+    def _run(self):
+        while self.running:
+            now = time.monotonic()
+            batch = []
+            sent = []
+            wake_at = now + 0.5
+            with self.lock:
+                for drone_id in self.drones:
+                    self._expire(drone_id, now)
+                    queue = self.pending.setdefault(drone_id, deque())
+                    for data_type, rate in self.rates.items():
+                        if rate <= 0:
+                            continue
+                        key = (drone_id, data_type)
+                        due = self.next_due.setdefault(key, now)
+                        if due <= now and len(queue) < self.window:
+                            line = f"{{T:{drone_id};C:REQ;P:{data_type}}}"
+                            request = [data_type, now]
+                            batch.append(line)
+                            queue.append(request)
+                            sent.append((drone_id, request, line))
+                            self._drone_stats(drone_id)['sent'] += 1
+                            due += 1.0 / rate
+                            # Skip slots that were missed rather than bursting to catch up
+                            self.next_due[key] = due if due > now else now + 1.0 / rate
+                        if self.next_due[key] > now:
+                            wake_at = min(wake_at, self.next_due[key])
+                    if queue:
+                        wake_at = min(wake_at, queue[0][1] + self.timeout)
+
+            if batch:
+                try:
+                    queued = self.send(batch)
+                    self.send_error = None
+                except Exception as e:
+                    if str(e) != self.send_error:
+                        print(f"Error sending telemetry requests: {e}")
+                        self.send_error = str(e)
+                    queued = []
+                if queued is not None:
+                    # Requests that did not go out (or only replaced a queued
+                    # one) must not time out as lost
+                    queued = set(queued)
+                    with self.lock:
+                        for drone_id, request, line in sent:
+                            queue = self.pending.get(drone_id)
+                            if line not in queued and queue and request in queue:
+                                queue.remove(request)
+                                self._drone_stats(drone_id)['sent'] -= 1
+
+            # Replies wake us early so a full window refills immediately
+            self._wake.wait(max(0.005, wake_at - time.monotonic()))
+            self._wake.clear()
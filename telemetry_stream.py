@@ -0,0 +1,70 @@
+from threading import Condition
+
+
+class TelemetryStream:
+    """Fixed-capacity, sequence-numbered ring buffer of serial lines.
+
+    Every published line gets a monotonic sequence number and is stored in
+    slot ``seq % capacity``, so memory stays constant however long the
+    session runs and a read of "everything after seq N" touches only the
+    slots it returns. Consumers keep their own cursor (the last sequence
+    number they have seen) and block in ``read_after`` until newer lines
+    arrive, so any number of readers can follow the same stream and a
+    client that reconnects with its cursor picks up where it left off.
+    Publishing never waits on consumers; a consumer that falls further
+    behind than the capacity is told how many lines it missed.
+    """
+
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self._slots = [None] * capacity
+        self._last_seq = 0
+        self._cond = Condition()
+
+    @property
+    def last_seq(self):
+        return self._last_seq
+
+    @property
+    def first_seq(self):
+        """Oldest sequence number still held in the buffer"""
+        return max(1, self._last_seq - self.capacity + 1)
+
+    def publish(self, lines):
+        """Append a batch of lines and wake up all waiting consumers"""
+        if not lines:
+            return
+        with self._cond:
+            for line in lines:
+                self._last_seq += 1
+                self._slots[self._last_seq % self.capacity] = line
+            self._cond.notify_all()
+
+    def read_after(self, seq, max_lines=500, timeout=None):
+        """Return ``(lines, cursor, missed)`` for lines newer than ``seq``.
+
+        Blocks for up to ``timeout`` seconds when nothing newer is available
+        (pass 0 to return immediately). ``cursor`` is the sequence number of
+        the last returned line and ``missed`` counts lines that were
+        overwritten before they could be read. ``seq`` must not be negative
+        and ``max_lines`` must be at least 1, otherwise the cursor and the
+        missed count would be wrong.
+        """
+        if seq < 0:
+            raise ValueError("seq must not be negative")
+        if max_lines < 1:
+            raise ValueError("max_lines must be at least 1")
+        with self._cond:
+            if self._last_seq <= seq and timeout != 0:
+                self._cond.wait_for(lambda: self._last_seq > seq, timeout)
+            if self._last_seq <= seq:
+                return [], seq, 0
+
+            first_seq = self.first_seq
+            missed = max(0, first_seq - seq - 1)
+            start = max(seq + 1, first_seq)
+            end = min(start + max_lines - 1, self._last_seq)
+            slots = self._slots
+            capacity = self.capacity
+            lines = [slots[s % capacity] for s in range(start, end + 1)]
+            return lines, end, missed
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from connection_manager import DELIVERIES, DELIVERY_TIMEOUT, ConnectionManager, GcsLink
+
+
+class FakePort:
+    port = 'COM-TEST'
+    is_open = True
+
+
+def deliveries(drone_id, result):
+    return DELIVERIES.labels(drone_id, result).value
+
+
+def test_delivery_status_matches_sends_in_order():
+    link = GcsLink(FakePort(), lambda *args: None, {})
+    before = {result: deliveries('CD7', result) for result in ('success', 'fail', 'invalid', 'timeout')}
+    link._sent(["{T:CD7;C:ARM;P:1}", "{T:CD7;C:MTL;P:1.00,2.00,0.0}", "{T:GCS;C:PING;P:1}"], 100.0)
+    link.delivery_status(["Last Packet Send Status: Delivery Success",
+                          "Last Packet Send Status: Delivery Fail"], 100.1)
+    assert deliveries('CD7', 'success') == before['success'] + 1
+    assert deliveries('CD7', 'fail') == before['fail'] + 1
+    assert not link.in_flight
+
+    # An unknown target is answered at once instead of with a status line
+    link._sent(["{T:CD7;C:ARM;P:1}", "{T:CD70;C:ARM;P:1}"], 101.0)
+    link.delivery_status(["{T:CD70;C:ARM;P:1}", "TargetCD70Invalid target specified"], 101.1)
+    assert deliveries('CD70', 'invalid') == 1
+    assert list(link.in_flight) == [('CD7', 101.0)]
+
+    link.delivery_status([], 101.0 + DELIVERY_TIMEOUT + 1)
+    assert deliveries('CD7', 'timeout') == before['timeout'] + 1
+    assert deliveries('CD7', 'invalid') == before['invalid']
+
+
+def test_records_outside_the_readers_join_the_feed_in_order():
+    fed = []
+    manager = ConnectionManager(lambda lines, timestamp, link: fed.append((lines, timestamp)))
+    manager.in_order(lambda timestamp: manager.on_lines(['batch'], timestamp, None), datetime(2025, 1, 23, 17, 0, 5))
+    manager.in_order(lambda timestamp: fed.append(('summary', timestamp)), datetime(2025, 1, 23, 17, 0, 4))
+    assert [timestamp.second for _, timestamp in fed] == [5, 5]
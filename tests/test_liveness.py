@@ -0,0 +1,45 @@
+from liveness import LivenessTable, heartbeat_sender
+from log_analytics import analyze_log
+
+
+def test_heartbeat_sender():
+    assert heartbeat_sender("{S:CD1;C:HB;P:1}") == 'CD1'
+    assert heartbeat_sender("{S:CD1;C:HB;P:1} x3 over 2.00s, max gap 1.00s") is None
+    assert heartbeat_sender("{S:CD1;C:LOC;P:1,2,3}") is None
+
+
+def test_heartbeats_are_summarized_and_silence_goes_down():
+    changes, summaries = [], []
+    table = LivenessTable(on_change=lambda lines, timestamp: changes.extend(lines),
+                          on_summary=lambda line, timestamp: summaries.append((line, timestamp.timestamp())),
+                          timeout=3.0, gap_threshold=1.5)
+    assert table.heartbeat('CD1', 100.0) is True
+    for now in (101.0, 102.0, 104.0):
+        assert table.heartbeat('CD1', now) is False
+
+    table.summarize()
+    assert summaries == [("{S:CD1;C:HB;P:1} x3 over 4.00s, max gap 2.00s", 104.0)]
+    table.summarize()
+    assert len(summaries) == 1
+
+    assert table.check(106.0) == []
+    assert table.check(107.5) == ['CD1']
+    assert changes == ["{S:CD1;C:LINK;P:DOWN}"]
+    assert table.heartbeat('CD1', 110.0) is True
+
+    state = table.snapshot()['CD1']
+    assert state['heartbeats'] == 5
+    assert state['gaps'] == 2
+    assert state['max_gap'] == 6.0
+    assert state['downs'] == 1
+
+
+def test_analytics_counts_summarized_heartbeats_as_messages(tmp_path):
+    path = str(tmp_path / "esp_log_2025-01-23_17-00-00.txt")
+    with open(path, 'w') as f:
+        f.write("[2025-01-23 17:00:00.000] {S:CD1;C:HB;P:1}\n"
+                "[2025-01-23 17:00:10.000] {S:CD1;C:HB;P:1} x9 over 9.00s, max gap 1.20s\n"
+                "[2025-01-23 17:00:10.500] {S:CD1;C:LOC;P:1,2,3}\n")
+    stats = analyze_log(path)['drones']['CD1']
+    assert stats['heartbeats'] == 10
+    assert stats['messages'] == 11
@@ -0,0 +1,67 @@
+import gzip
+import os
+import time
+
+from log_catalog import ARCHIVE_DIR, LogCatalog
+
+
+def write_log(logs_dir, stamp, text="[2025-01-21 12:52:43.000] {S:CD1;C:HB;P:1}\n"):
+    path = os.path.join(logs_dir, f"esp_log_{stamp}.txt")
+    with open(path, 'w') as f:
+        f.write(text)
+    return path
+
+
+def test_default_policy_keeps_every_log(tmp_path):
+    old = write_log(str(tmp_path), "2020-01-01_00-00-00")
+    catalog = LogCatalog(str(tmp_path))
+    assert not catalog.retention_enabled()
+
+    result = catalog.enforce()
+    assert result == {'compressed': 0, 'archived': 0, 'deleted': 0}
+    assert os.path.exists(old)
+
+
+def test_enforce_compresses_and_archives_old_logs(tmp_path):
+    logs_dir = str(tmp_path)
+    oldest = write_log(logs_dir, "2020-01-01_00-00-00")
+    old = write_log(logs_dir, "2020-06-01_00-00-00")
+    active = write_log(logs_dir, "2020-07-01_00-00-00")
+    catalog = LogCatalog(logs_dir)
+    catalog.set_active(active)
+    catalog.set_policy(compress_after_days=7, archive_after_days=30)
+
+    now = time.mktime((2020, 6, 15, 0, 0, 0, 0, 0, -1))
+    result = catalog.enforce(now)
+    assert result == {'compressed': 2, 'archived': 1, 'deleted': 0}
+    assert os.path.exists(old + '.gz')
+    assert os.path.exists(os.path.join(logs_dir, ARCHIVE_DIR, os.path.basename(oldest) + '.gz'))
+    assert os.path.exists(active)
+
+    # Archived logs stay readable by name
+    path = catalog.find(os.path.basename(oldest) + '.gz')
+    assert path == os.path.join(logs_dir, ARCHIVE_DIR, os.path.basename(oldest) + '.gz')
+    with gzip.open(path, 'rt') as f:
+        assert 'C:HB' in f.read()
+    total, page = catalog.list()
+    assert total == 2
+    assert [entry['name'] for entry in page] == [os.path.basename(active), os.path.basename(old) + '.gz']
+
+
+def test_max_archive_bytes_deletes_oldest_archived(tmp_path):
+    logs_dir = str(tmp_path)
+    write_log(logs_dir, "2020-01-01_00-00-00")
+    write_log(logs_dir, "2020-02-01_00-00-00")
+    catalog = LogCatalog(logs_dir)
+    catalog.set_policy(max_total_bytes=0, max_archive_bytes=0)
+
+    result = catalog.enforce()
+    assert result == {'compressed': 0, 'archived': 2, 'deleted': 2}
+    assert catalog.list() == (0, [])
+
+
+def test_policy_is_persisted(tmp_path):
+    LogCatalog(str(tmp_path)).set_policy(archive_after_days=30)
+    catalog = LogCatalog(str(tmp_path))
+    assert catalog.policy['archive_after_days'] == 30
+    assert catalog.retention_enabled()
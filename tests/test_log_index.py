@@ -0,0 +1,89 @@
+import gzip
+import os
+from datetime import datetime
+
+from log_index import CHECKPOINT_LINES, LogIndex, index_path_for, stamp_seconds
+
+
+def log_lines(count, start=0):
+    return [f"[2025-01-23 17:{(start + i) // 60 % 60:02d}:{(start + i) % 60:02d}.000] "
+            f"{{S:CD{(start + i) % 3 + 1};C:{'HB' if i % 2 else 'LOC'};P:{start + i}}}\n" for i in range(count)]
+
+
+def write(path, lines, mode='w'):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, mode + 't') as f:
+        f.writelines(lines)
+
+
+def test_queries_use_the_index(tmp_path):
+    path = str(tmp_path / "esp_log_2025-01-23_17-00-00.txt")
+    lines = log_lines(600)
+    write(path, lines)
+    index = LogIndex(path)
+
+    assert list(index.query(limit=2)) == [line.rstrip('\n') for line in lines[:2]]
+    assert list(index.query(tail=1)) == [lines[-1].rstrip('\n')]
+    assert list(index.query(offset=CHECKPOINT_LINES + 5, limit=1)) == [lines[CHECKPOINT_LINES + 5].rstrip('\n')]
+    assert list(index.query(drone='CD2', command='HB', limit=1)) == [lines[1].rstrip('\n')]
+    assert list(index.query(start='2025-01-23T17:01:00', end='2025-01-23 17:01:02')) == \
+        [line.rstrip('\n') for line in lines[60:62]]
+    assert index.summary()['lines'] == 600
+    assert index.summary()['commands'] == {'LOC': 300, 'HB': 300}
+
+
+def test_growing_log_is_indexed_incrementally(tmp_path):
+    path = str(tmp_path / "esp_log_2025-01-23_17-00-00.txt")
+    write(path, log_lines(10))
+    with open(path, 'a') as f:
+        f.write("[2025-01-23 17:00:10.000] {S:CD1;C:H")  # still being written
+    index = LogIndex(path)
+    index.refresh()
+    assert index.lines == 10
+
+    with open(path, 'a') as f:
+        f.write("B;P:1}\n")
+    index.refresh()
+    assert index.lines == 11
+    assert list(index.query(tail=1)) == ["[2025-01-23 17:00:10.000] {S:CD1;C:HB;P:1}"]
+
+    # The saved index is picked up by a new instance
+    assert LogIndex(path).lines == 11
+
+
+def test_compressed_log_is_not_reindexed(tmp_path, monkeypatch):
+    path = str(tmp_path / "esp_log_2025-01-23_17-00-00.txt.gz")
+    lines = log_lines(300)
+    write(path, lines)
+    index = LogIndex(path)
+    index.refresh()
+    assert index.lines == 300
+    assert os.path.exists(index_path_for(path))
+
+    def fail():
+        raise AssertionError("compressed log was read again")
+    monkeypatch.setattr(index, '_reset', fail)
+    index.refresh()
+    monkeypatch.setattr(LogIndex, '_reset', lambda self: fail())
+    reloaded = LogIndex(path)
+    reloaded.refresh()
+    assert reloaded.lines == 300
+    assert index.offset_for_time('2025-01-23 17:04:00') == sum(len(line) for line in lines[:240])
+
+
+def test_stamp_seconds():
+    dates = {}
+    expected = datetime(2025, 1, 23, 17, 32, 49, 263000).timestamp()
+    assert abs(stamp_seconds('2025-01-23 17:32:49.263', dates) - expected) < 1e-6
+    assert list(dates) == ['2025-01-23']
+
+
+def test_index_of_a_removed_log_is_not_saved(tmp_path):
+    path = str(tmp_path / "esp_log_2025-01-23_17-00-00.txt")
+    write(path, log_lines(5))
+    index = LogIndex(path)
+    index.refresh()
+    os.remove(path)
+    os.remove(index_path_for(path))
+    index._save()
+    assert not os.path.exists(index_path_for(path))
@@ -0,0 +1,49 @@
+import json
+import os
+
+import mission_decoder
+from mission_catalog import MissionCatalog
+from mission_decoder import compile_mission
+
+
+def write_mission(path, frames=3):
+    drones = {'CD1': {'frames': [{'position': {'x': i, 'y': 0, 'z': 2}, 'dx': 1, 'dy': 0, 'heading': 0,
+                                  'delay': 500} for i in range(frames)]}}
+    with open(path, 'w') as f:
+        json.dump({'version': '1.0', 'drones': drones}, f)
+
+
+def test_catalog_summaries_do_not_fill_the_plan_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(mission_decoder, '_compiled_missions', mission_decoder.OrderedDict())
+    write_mission(str(tmp_path / "a.json"))
+    write_mission(str(tmp_path / "b.json"), frames=5)
+    catalog = MissionCatalog(str(tmp_path))
+
+    total, missions = catalog.list()
+    assert total == 2
+    assert [(mission['name'], mission['frames'], mission['duration']) for mission in missions] == \
+        [('a.json', 3, 1.5), ('b.json', 5, 2.5)]
+    assert missions[0]['bounds'] == {'min': {'x': 0, 'y': 0, 'z': 2}, 'max': {'x': 2, 'y': 0, 'z': 2}}
+    assert len(mission_decoder._compiled_missions) == 0
+
+    # A loaded mission is cached until its file goes away
+    compile_mission(str(tmp_path / "a.json"))
+    assert len(mission_decoder._compiled_missions) == 1
+    os.remove(tmp_path / "a.json")
+    catalog.refresh(force=True)
+    assert catalog.get('a.json') is None
+    assert len(mission_decoder._compiled_missions) == 0
+
+
+def test_plan_cache_keeps_the_most_recent_missions(tmp_path, monkeypatch):
+    monkeypatch.setattr(mission_decoder, '_compiled_missions', mission_decoder.OrderedDict())
+    paths = [str(tmp_path / f"m{i}.json") for i in range(mission_decoder.MAX_COMPILED_MISSIONS + 2)]
+    for path in paths:
+        write_mission(path)
+    first = compile_mission(paths[0])
+    for path in paths[1:]:
+        compile_mission(path)
+        compile_mission(paths[0])  # keep the first one in use
+    assert len(mission_decoder._compiled_missions) == mission_decoder.MAX_COMPILED_MISSIONS
+    assert compile_mission(paths[0]) is first
+    assert os.path.abspath(paths[1]) not in mission_decoder._compiled_missions
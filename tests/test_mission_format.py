@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from mission_catalog import mission_bounds
+from mission_decoder import MissionDecoder
+from mission_format import FrameView, convert, materialize, read_mission, write_binary_mission
+
+
+def sample_mission():
+    frames = [{'position': {'x': i * 0.5, 'y': -i, 'z': 2.0}, 'dx': 0.5, 'dy': -1, 'heading': 90, 'delay': 500}
+              for i in range(5)]
+    # Whole-number floats among ints, a missing value and extra data
+    frames[1]['heading'] = 90.0
+    del frames[2]['dx']
+    frames[3]['position']['label'] = 'gate'
+    frames[4]['lights'] = [255, 0, 0]
+    return {
+        'version': '1.0',
+        'frameDelays': [0, 0, 250],
+        'customCommands': [[1, [{'droneId': 'CD1', 'command': 'ARM', 'payload': '1'}]]],
+        'drones': {
+            'CD1': {'frames': frames, 'color': 'red'},
+            'CD2': {'frames': [{'position': {'x': 1e-7, 'y': 3, 'z': 1}, 'dx': 0, 'dy': 0, 'heading': 0,
+                                'delay': 1000}]},
+            'CD3': {'frames': []},
+            'CD4': {},
+        },
+    }
+
+
+def test_binary_round_trip_is_lossless(tmp_path):
+    mission = sample_mission()
+    path = str(tmp_path / "mission.mbin")
+    write_binary_mission(mission, path)
+
+    loaded = read_mission(path)
+    assert isinstance(loaded['drones']['CD1']['frames'], FrameView)
+    assert json.dumps(materialize(loaded), sort_keys=True) == json.dumps(mission, sort_keys=True)
+    assert type(loaded['drones']['CD1']['frames'][1]['heading']) is float
+    assert type(loaded['drones']['CD1']['frames'][0]['heading']) is int
+    assert loaded['drones']['CD1']['frames'][-1] == mission['drones']['CD1']['frames'][-1]
+    with pytest.raises(IndexError):
+        loaded['drones']['CD2']['frames'][1]
+
+
+def test_each_drone_gets_its_own_precision(tmp_path):
+    path = str(tmp_path / "mission.mbin")
+    write_binary_mission(sample_mission(), path)
+    loaded = read_mission(path)
+    # 1e-7 needs float64 for CD2 alone
+    assert loaded['drones']['CD1']['frames'].rows.dtype == '<f4'
+    assert loaded['drones']['CD2']['frames'].rows.dtype == '<f8'
+    assert loaded['drones']['CD2']['frames'][0]['position']['x'] == 1e-7
+
+
+def test_convert_checks_the_result(tmp_path):
+    source = tmp_path / "mission.json"
+    source.write_text(json.dumps(sample_mission()))
+    target = convert(str(source))
+    assert target == str(tmp_path / "mission.mbin")
+    back = convert(target, str(tmp_path / "back.json"))
+    assert json.loads(open(back).read()) == sample_mission()
+
+
+def test_binary_and_json_missions_compile_alike(tmp_path):
+    mission = sample_mission()
+    del mission['drones']['CD1']['frames'][2]  # MTL needs dx
+    del mission['drones']['CD4']  # and every drone needs frames
+    path = str(tmp_path / "mission.mbin")
+    write_binary_mission(mission, path)
+
+    queues = []
+    for data in (mission, read_mission(path)):
+        decoder = MissionDecoder()
+        decoder.mission_data = data
+        decoder.organize_commands_by_keyframe()
+        queues.append(decoder.commands_queue)
+    assert queues[0] == queues[1]
+    assert [frame['delay'] for frame in queues[0]] == [500, 500, 250, 500]
+    assert queues[0][1]['commands'][0]['payload'] == '1.12,2.00,90.0'
+    assert mission_bounds(read_mission(path)['drones']) == mission_bounds(mission['drones'])
@@ -0,0 +1,44 @@
+import numpy as np
+
+from mission_safety import check_separation
+
+
+def closest_distances(positions):
+    """Every pair's closest approach per segment, without any culling"""
+    path = np.concatenate([positions, positions[:, -1:]], axis=1)
+    start, motion = path[:, :-1], np.diff(path, axis=1)
+    result = {}
+    for i in range(len(positions)):
+        for j in range(i + 1, len(positions)):
+            offset, relative = start[i] - start[j], motion[i] - motion[j]
+            moved = (relative * relative).sum(axis=1)
+            along = -(offset * relative).sum(axis=1)
+            fraction = np.clip(np.divide(along, moved, out=np.zeros_like(along), where=moved > 0), 0, 1)
+            result[i, j] = np.linalg.norm(offset + relative * fraction[:, None], axis=1)
+    return result
+
+
+def test_culled_separation_matches_every_pair():
+    rng = np.random.default_rng(7)
+    drones, frames = 12, 300
+    # Random walks in a small box, so some pairs pass close and most do not
+    positions = np.cumsum(rng.normal(0, 0.3, (drones, frames, 3)), axis=1) + rng.uniform(-5, 5, (drones, 1, 3))
+    drone_ids = [f"CD{i}" for i in range(drones)]
+    violations, closest = check_separation(drone_ids, positions, 1.0)
+
+    expected = closest_distances(positions)
+    hits = sum(int((distances < 1.0).sum()) for distances in expected.values())
+    assert violations['total'] == hits
+    (i, j), distances = min(expected.items(), key=lambda item: item[1].min())
+    assert closest['drones'] == [drone_ids[i], drone_ids[j]]
+    assert closest['frame'] == int(distances.argmin())
+    assert abs(closest['distance'] - distances.min()) < 1e-3
+
+
+def test_separation_of_crossing_drones():
+    # Two drones swap places through the same point between frames 0 and 1
+    positions = np.array([[[0, 0, 5], [10, 0, 5]], [[10, 0, 5], [0, 0, 5]]], dtype=float)
+    violations, closest = check_separation(['A', 'B'], positions, 0.5)
+    assert violations['total'] == 1
+    assert violations['worst'][0]['drones'] == ['A', 'B']
+    assert closest == {'distance': 0.0, 'frame': 0, 'drones': ['A', 'B']}
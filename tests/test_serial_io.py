@@ -0,0 +1,115 @@
+import time
+
+from serial_io import CommandWriter
+
+
+class FakePort:
+    is_open = True
+
+    def __init__(self):
+        self.written = []
+
+    def write(self, data):
+        self.written.append(data)
+
+    def flush(self):
+        pass
+
+
+def make_writer(**limits):
+    writer = CommandWriter(**dict({'rate': 0, 'drone_rate': 0}, **limits))
+    writer.attach(FakePort())
+    return writer
+
+
+def take(writer):
+    with writer.cond:
+        return writer._take_batch()[0]
+
+
+def test_priority_order():
+    writer = make_writer()
+    writer.submit(["{T:CD1;C:REQ;P:LOC}", "{T:CD1;C:MTL;P:1.00,2.00,90.0}", "{T:CD2;C:LAND;P:1}"])
+    assert take(writer) == ["{T:CD2;C:LAND;P:1}", "{T:CD1;C:MTL;P:1.00,2.00,90.0}", "{T:CD1;C:REQ;P:LOC}"]
+
+
+def test_absolute_setpoints_and_requests_are_coalesced():
+    writer = make_writer()
+    writer.submit(["{T:CD1;C:YAW;P:10}", "{T:CD1;C:REQ;P:LOC}", "{T:CD1;C:YAW;P:20}",
+                   "{T:CD2;C:YAW;P:30}", "{T:CD1;C:REQ;P:LOC}", "{T:CD1;C:REQ;P:BAT}"])
+    assert take(writer) == ["{T:CD1;C:YAW;P:20}", "{T:CD2;C:YAW;P:30}",
+                            "{T:CD1;C:REQ;P:LOC}", "{T:CD1;C:REQ;P:BAT}"]
+    assert writer.stats['coalesced'] == 2
+
+
+def test_relative_moves_are_never_coalesced():
+    writer = make_writer()
+    moves = ["{T:CD1;C:MTL;P:1.00,2.00,90.0}", "{T:CD1;C:MTL;P:1.00,2.00,90.0}", "{T:CD1;C:NED;P:1,0,0}"]
+    writer.submit(moves)
+    assert take(writer) == moves
+    assert writer.stats['coalesced'] == 0
+
+
+def test_emergency_drops_queued_commands_for_that_drone():
+    writer = make_writer()
+    writer.submit(["{T:CD1;C:MTL;P:1.00,2.00,90.0}", "{T:CD1;C:YAW;P:10}", "{T:CD1;C:REQ;P:LOC}",
+                   "{T:CD2;C:MTL;P:3.00,4.00,0.0}"])
+    writer.submit(["{T:CD1;C:LAND;P:1}"])
+    assert writer.stats['dropped'] == 3
+    assert writer.pending.keys() == set()
+    assert take(writer) == ["{T:CD1;C:LAND;P:1}", "{T:CD2;C:MTL;P:3.00,4.00,0.0}"]
+
+    # A later setpoint queues afresh instead of updating a dropped entry
+    writer.submit(["{T:CD1;C:YAW;P:20}"])
+    assert take(writer) == ["{T:CD1;C:YAW;P:20}"]
+
+
+def test_per_drone_rate_keeps_order():
+    writer = make_writer(drone_rate=1, drone_burst=1)
+    writer.submit(["{T:CD1;C:MTL;P:1.00,0.00,0.0}", "{T:CD1;C:MTL;P:2.00,0.00,0.0}",
+                   "{T:CD2;C:MTL;P:3.00,0.00,0.0}"])
+    with writer.cond:
+        batch, wait = writer._take_batch()
+    assert batch == ["{T:CD1;C:MTL;P:1.00,0.00,0.0}", "{T:CD2;C:MTL;P:3.00,0.00,0.0}"]
+    assert 0 < wait <= 1
+    assert [entry[1] for entry in writer.queues[1]] == ["{T:CD1;C:MTL;P:2.00,0.00,0.0}"]
+
+
+def test_writer_thread_writes_to_port():
+    writer = make_writer()
+    port = writer.port
+    writer.start()
+    try:
+        writer.submit(["{T:CD1;C:ARM;P:1}"])
+        for _ in range(100):
+            if port.written:
+                break
+            time.sleep(0.01)
+    finally:
+        writer.stop()
+    assert port.written == [b"{T:CD1;C:ARM;P:1}\n"]
+
+
+def test_submit_returns_only_new_entries():
+    writer = make_writer()
+    assert writer.submit(["{T:CD1;C:REQ;P:LOC}", "{T:CD1;C:REQ;P:LOC}", "{T:CD1;C:ARM;P:1}"]) == \
+        ["{T:CD1;C:REQ;P:LOC}", "{T:CD1;C:ARM;P:1}"]
+
+
+def test_coalesced_command_moves_to_its_new_priority():
+    writer = make_writer()
+    writer.submit(["{T:CD1;C:REQ;P:LOC}", "{T:CD2;C:REQ;P:BAT}"])
+    writer.submit(["{T:CD2;C:REQ;P:BAT}"], priority=0)
+    assert [len(queue) for queue in writer.queues] == [1, 0, 1]
+    assert take(writer) == ["{T:CD2;C:REQ;P:BAT}", "{T:CD1;C:REQ;P:LOC}"]
+    assert writer.pending == {}
+
+
+def test_wait_covers_both_the_drone_and_the_global_token():
+    writer = make_writer(rate=10, burst=1, drone_rate=1, drone_burst=1)
+    writer.submit(["{T:CD1;C:MTL;P:1.00,0.00,0.0}", "{T:CD1;C:MTL;P:2.00,0.00,0.0}"])
+    with writer.cond:
+        batch, wait = writer._take_batch()
+    # The global token is back in 0.1 s, but CD1 has to wait about a second
+    assert batch == ["{T:CD1;C:MTL;P:1.00,0.00,0.0}"]
+    assert wait > 0.5
@@ -0,0 +1,29 @@
+import pytest
+
+from telemetry_stream import TelemetryStream
+
+
+def test_read_after_pages_and_reports_missed_lines():
+    stream = TelemetryStream(capacity=4)
+    stream.publish(['a', 'b', 'c'])
+    assert stream.read_after(0, max_lines=2, timeout=0) == (['a', 'b'], 2, 0)
+    assert stream.read_after(2, timeout=0) == (['c'], 3, 0)
+    assert stream.read_after(3, timeout=0) == ([], 3, 0)
+
+    stream.publish(['d', 'e', 'f'])
+    assert stream.read_after(1, timeout=0) == (['c', 'd', 'e', 'f'], 6, 1)
+
+
+def test_read_after_rejects_limits_below_one():
+    stream = TelemetryStream()
+    stream.publish(['a', 'b'])
+    for limit in (0, -5):
+        with pytest.raises(ValueError):
+            stream.read_after(1, max_lines=limit, timeout=0)
+
+
+def test_read_after_rejects_negative_cursors():
+    stream = TelemetryStream()
+    stream.publish(['a'])
+    with pytest.raises(ValueError):
+        stream.read_after(-1, timeout=0)
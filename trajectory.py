@@ -0,0 +1,163 @@
+import math
+
+import numpy as np
+
+from mission_format import FrameView
+from mission_safety import mission_arrays
+
+LINEAR = 'linear'
+CUBIC = 'cubic'
+MINIMUM_JERK = 'minimum_jerk'
+METHODS = (LINEAR, CUBIC, MINIMUM_JERK)
+
+# Share of the command budget setpoints may use; the rest is left for
+# telemetry requests and manual commands
+BUDGET_SHARE = 0.8
+
+
+def max_setpoint_rate(*drone_rates):
+    """Highest setpoint rate (Hz) within per-drone command rates (0 = unlimited)"""
+    limits = [rate for rate in drone_rates if rate and rate > 0]
+    return BUDGET_SHARE * min(limits) if limits else None
+
+
+def natural_cubic_second_derivatives(times, values):
+    """Second derivatives of the natural cubic spline through every column of ``values``.
+
+    Solves the tridiagonal system with the Thomas algorithm, vectorized
+    over columns, so all drones and axes are fitted at once.
+    """
+    count = len(times)
+    second = np.zeros_like(values)
+    if count < 3:
+        return second
+    h = np.maximum(np.diff(times), 1e-6)
+    slope = np.diff(values, axis=0) / h[:, None]
+    rhs = 6 * (slope[1:] - slope[:-1])
+    diagonal = 2 * (h[:-1] + h[1:])
+    upper = h[1:-1].copy()
+    # Forward sweep
+    for i in range(1, count - 2):
+        factor = h[i] / diagonal[i - 1]
+        diagonal[i] -= factor * upper[i - 1]
+        rhs[i] -= factor * rhs[i - 1]
+    # Back substitution
+    inner = np.empty_like(rhs)
+    inner[-1] = rhs[-1] / diagonal[-1]
+    for i in range(count - 4, -1, -1):
+        inner[i] = (rhs[i] - upper[i] * inner[i + 1]) / diagonal[i]
+    second[1:-1] = inner
+    return second
+
+
+class TrajectoryResampler:
+    """Intermediate setpoints between a mission's keyframes.
+
+    Positions are interpolated linearly, with a natural cubic spline or
+    with a minimum-jerk profile (rest to rest on every segment); headings
+    are unwrapped first so they turn the short way through 0/360 degrees.
+    Setpoints are computed in batches of ``chunk_seconds`` and yielded one
+    by one, so the resampled mission never exists in memory as a whole.
+    ``rate`` is capped at ``max_rate`` (see ``max_setpoint_rate``).
+    """
+
+    def __init__(self, mission_data, rate=10.0, method=CUBIC, max_rate=None, chunk_seconds=10.0):
+        if method not in METHODS:
+            raise ValueError(f"Unknown interpolation method: {method}")
+        self.method = method
+        self.rate = min(rate, max_rate) if max_rate else rate
+        if self.rate <= 0:
+            raise ValueError("Setpoint rate must be positive")
+        self.chunk_seconds = chunk_seconds
+
+        self.drone_ids, positions, _, delays = mission_arrays(mission_data)
+        drone_count, frame_count, _ = positions.shape
+        if frame_count == 0:
+            raise ValueError("Mission has no frames")
+        headings = np.zeros((drone_count, frame_count))
+        for i, drone_id in enumerate(self.drone_ids):
+            frames = mission_data['drones'][drone_id]['frames']
+            if isinstance(frames, FrameView):
+                headings[i, :len(frames)] = np.nan_to_num(frames.columns(('heading',))[:, 0])
+            else:
+                headings[i, :len(frames)] = [frame.get('heading', 0) for frame in frames]
+            headings[i, len(frames):] = headings[i, len(frames) - 1] if frames else 0
+
+        self.times = np.concatenate([[0.0], np.cumsum(delays)[:-1]])
+        self.duration = float(delays.sum())
+        # Columns: x, y, z per drone, then unwrapped heading (radians) per drone
+        self.values = np.concatenate([
+            positions.transpose(1, 0, 2).reshape(frame_count, drone_count * 3),
+            np.unwrap(np.radians(headings), axis=1).T,
+        ], axis=1)
+        self.second = natural_cubic_second_derivatives(self.times, self.values) if method == CUBIC else None
+
+    def sample(self, times):
+        """Interpolated ``(positions, headings)`` at ``times``: shapes (n, drones, 3) and (n, drones) degrees"""
+        times = np.clip(np.asarray(times, dtype=float), self.times[0], self.times[-1])
+        segment = np.clip(np.searchsorted(self.times, times, side='right') - 1, 0, max(0, len(self.times) - 2))
+        if len(self.times) < 2:
+            values = np.repeat(self.values[:1], len(times), axis=0)
+        else:
+            t0 = self.times[segment]
+            h = self.times[segment + 1] - t0
+            u = np.divide(times - t0, h, out=np.zeros_like(times), where=h > 0)[:, None]
+            y0 = self.values[segment]
+            y1 = self.values[segment + 1]
+            if self.method == LINEAR:
+                values = y0 + (y1 - y0) * u
+            elif self.method == MINIMUM_JERK:
+                values = y0 + (y1 - y0) * (u ** 3 * (10 - 15 * u + 6 * u ** 2))
+            else:
+                m0 = self.second[segment]
+                m1 = self.second[segment + 1]
+                h = h[:, None]
+                values = (y0 * (1 - u) + y1 * u
+                          + (h ** 2 / 6) * (m0 * ((1 - u) ** 3 - (1 - u)) + m1 * (u ** 3 - u)))
+
+        drone_count = len(self.drone_ids)
+        positions = values[:, :drone_count * 3].reshape(len(times), drone_count, 3)
+        headings = np.degrees(values[:, drone_count * 3:]) % 360
+        return positions, headings
+
+    def setpoints(self, start=0.0):
+        """Yield ``(time, positions, headings)`` from ``start`` seconds to the end"""
+        step = 1.0 / self.rate
+        index = math.ceil(start * self.rate - 1e-9)
+        per_chunk = max(1, int(self.chunk_seconds * self.rate))
+        while index * step <= self.duration:
+            times = (index + np.arange(per_chunk)) * step
+            times = times[times <= self.duration]
+            positions, headings = self.sample(times)
+            for k, t in enumerate(times):
+                yield float(t), positions[k], headings[k]
+            index += len(times)
+
+    def commands(self, start=0.0):
+        """Yield ``(time, lines)`` of MTL setpoints from ``start`` seconds.
+
+        Each MTL moves a drone from its previous setpoint (distance along
+        the direction of travel, altitude, heading), matching the keyframe
+        MTLs. Drones that do not move in a step get no command.
+        """
+        sent, _ = self.sample([start])
+        sent = sent[0].copy()  # Where each drone was last told to be
+        last_payload = {}
+        for t, positions, headings in self.setpoints(start):
+            lines = []
+            step = positions - sent
+            distances = np.hypot(step[:, 0], step[:, 1])
+            for i, drone_id in enumerate(self.drone_ids):
+                # Moves too small to show in the payload accumulate until they do
+                moving = distances[i] >= 0.005
+                heading = math.degrees(math.atan2(step[i, 1], step[i, 0])) % 360 if moving else headings[i]
+                payload = f"{distances[i] if moving else 0:.2f},{positions[i, 2]:.2f},{heading:.1f}"
+                if not moving and last_payload.get(drone_id) == payload:
+                    continue
+                last_payload[drone_id] = payload
+                lines.append(f"{{T:{drone_id};C:MTL;P:{payload}}}")
+                sent[i, 2] = positions[i, 2]
+                if moving:
+                    sent[i, :2] = positions[i, :2]
+            if lines:
+                yield t, lines